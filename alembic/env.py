@@ -29,6 +29,8 @@ from database.session import Base  # Import Base from our session module
 # Import models to ensure they are registered with Base
 import models.user_model
 import models.otp_model
+import models.invalidated_token_model
+import models.email_outbox_model
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -0,0 +1,47 @@
+"""case_insensitive_email_index
+
+Revision ID: 69b1dd815a0f
+Revises: 6db5f52e1210
+Create Date: 2026-10-19 11:26:52.871305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '69b1dd815a0f'
+down_revision: Union[str, None] = '6db5f52e1210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    
+    # Accounts that differ only by case can't be merged automatically
+    duplicates = conn.execute(sa.text(
+        "SELECT lower(trim(email)) AS email, count(*) FROM users "
+        "GROUP BY lower(trim(email)) HAVING count(*) > 1"
+    )).fetchall()
+    if duplicates:
+        emails = ", ".join(row.email for row in duplicates)
+        raise RuntimeError(
+            f"Cannot add case-insensitive email index, merge these accounts first: {emails}"
+        )
+    
+    # Normalize rows created before every entry path lower-cased emails
+    op.execute("UPDATE users SET email = lower(trim(email)) WHERE email <> lower(trim(email))")
+    
+    # lower(email) uniqueness implies email uniqueness, so the plain unique index goes
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+    op.drop_index('ix_users_email', table_name='users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.drop_index('ix_users_email_lower', table_name='users')
@@ -0,0 +1,46 @@
+"""drop_duplicate_indexes
+
+Revision ID: 6db5f52e1210
+Revises: 980bf3852ecd
+Create Date: 2026-10-19 10:03:17.224690
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6db5f52e1210'
+down_revision: Union[str, None] = '980bf3852ecd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) of B-trees that duplicate another index on the
+# same columns. The survivors are the primary keys, the unique ix_users_email,
+# ix_users_google_id and ix_invalidated_tokens_jti indexes. jti is unique, so
+# idx_jti_expires never narrows a lookup further than ix_invalidated_tokens_jti.
+DUPLICATE_INDEXES = [
+    ('idx_user_email', 'users', ['email']),
+    ('idx_user_google_id', 'users', ['google_id']),
+    ('ix_users_id', 'users', ['id']),
+    ('ix_invalidated_tokens_id', 'invalidated_tokens', ['id']),
+    ('idx_jti_expires', 'invalidated_tokens', ['jti', 'expires_at']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Not every database has all of them (create_all and hand-fixed schemas differ)
+    for index_name, table_name, _ in DUPLICATE_INDEXES:
+        op.drop_index(index_name, table_name=table_name, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Restore the indexes the earlier revisions' downgrades expect to drop,
+    # leaving alone any that were never dropped
+    for index_name, table_name, columns in DUPLICATE_INDEXES:
+        op.create_index(index_name, table_name, columns, unique=False, if_not_exists=True)
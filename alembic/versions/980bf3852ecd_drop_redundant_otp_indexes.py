@@ -0,0 +1,48 @@
+"""drop_redundant_otp_indexes
+
+Revision ID: 980bf3852ecd
+Revises: 1f85d57b8e52
+Create Date: 2026-10-19 09:12:41.508113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '980bf3852ecd'
+down_revision: Union[str, None] = '1f85d57b8e52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# OTP lookups and deletes always go through (user_id, purpose), and cleanup
+# goes through expires_at. Everything else only adds write amplification:
+# the primary key already covers id, idx_otp_user_purpose covers user_id
+# (including the foreign key check on users deletes), and nothing queries
+# otps by email.
+REDUNDANT_OTP_INDEXES = [
+    ('ix_otps_id', ['id']),
+    ('idx_otp_user_id', ['user_id']),
+    ('ix_otps_user_id', ['user_id']),
+    ('idx_otp_email', ['email']),
+    ('ix_otps_email', ['email']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Earlier revisions didn't create all of these on every database
+    # (create_all and hand-fixed schemas differ), hence IF EXISTS
+    for index_name, _ in REDUNDANT_OTP_INDEXES:
+        op.drop_index(index_name, table_name='otps', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Restore the indexes the earlier revisions' downgrades expect to drop,
+    # leaving alone any that survived (or were recreated) by hand
+    for index_name, columns in REDUNDANT_OTP_INDEXES:
+        op.create_index(index_name, 'otps', columns, unique=False, if_not_exists=True)
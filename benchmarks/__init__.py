@@ -0,0 +1,5 @@
+"""
+Standalone benchmarks for the auth service.
+
+Run from the service root, e.g. ``python -m benchmarks.otp_wal_volume``.
+"""
@@ -0,0 +1,124 @@
+"""
+Per-lookup Python overhead of UserCRUD versus the database round trip.
+
+Times three ways of fetching a user by id and by email:
+
+- ``orm_query``: the previous ``db.query(User).filter(...).first()`` form
+- ``crud``: UserCRUD with its prebuilt, cache-keyed select() statements
+- ``driver``: the same SQL through the raw DBAPI cursor, i.e. DB time only
+
+Subtracting ``driver`` from the other two gives the Python-side cost
+(statement construction, compilation cache lookup, ORM row processing).
+Defaults to in-memory SQLite so the DB share is as small as possible:
+
+    python -m benchmarks.crud_lookup_overhead --lookups 20000
+    python -m benchmarks.crud_lookup_overhead --url postgresql+psycopg://...
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.session import Base
+from models.user_model import User
+from crud.user_crud import UserCRUD
+
+
+def time_per_call(fn, ids) -> float:
+    """Average microseconds per call of fn over ids."""
+    start = time.perf_counter()
+    for value in ids:
+        fn(value)
+    return (time.perf_counter() - start) / len(ids) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    engine_kwargs = {}
+    if args.url.startswith("sqlite"):
+        engine_kwargs = {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    engine = create_engine(args.url, **engine_kwargs)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with Session() as db:
+        db.add_all(User(email=f"bench{i}@example.com", full_name="Bench") for i in range(args.users))
+        db.commit()
+        user_ids = [row[0] for row in db.query(User.id).all()]
+
+    ids = [user_ids[i % len(user_ids)] for i in range(args.lookups)]
+    emails = [f"bench{i % args.users}@example.com" for i in range(args.lookups)]
+
+    by_id_sql = "SELECT * FROM users WHERE users.id = {}"
+    by_email_sql = "SELECT * FROM users WHERE lower(users.email) = {}"
+    paramstyle = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+
+    results = {}
+    with Session() as db:
+        crud = UserCRUD(db)
+        raw = db.connection().connection.dbapi_connection
+        cursor = raw.cursor()
+
+        def driver_by_id(user_id):
+            cursor.execute(by_id_sql.format(paramstyle), (user_id,))
+            cursor.fetchone()
+
+        def driver_by_email(email):
+            cursor.execute(by_email_sql.format(paramstyle), (email,))
+            cursor.fetchone()
+
+        # Expire the identity map between lookups like a fresh request session would
+        def orm_by_id(user_id):
+            db.query(User).filter(User.id == user_id).first()
+            db.expunge_all()
+
+        def orm_by_email(email):
+            db.query(User).filter(func.lower(User.email) == email).first()
+            db.expunge_all()
+
+        def crud_by_id(user_id):
+            crud.get_by_id(user_id)
+            db.expunge_all()
+
+        def crud_by_email(email):
+            crud.get_by_email(email)
+            db.expunge_all()
+
+        # Warm up compilation caches and prepared statements
+        for fn, values in ((driver_by_id, ids), (orm_by_id, ids), (crud_by_id, ids),
+                           (driver_by_email, emails), (orm_by_email, emails), (crud_by_email, emails)):
+            time_per_call(fn, values[:100])
+
+        results["get_by_id"] = {
+            "driver": time_per_call(driver_by_id, ids),
+            "orm_query": time_per_call(orm_by_id, ids),
+            "crud": time_per_call(crud_by_id, ids),
+        }
+        results["get_by_email"] = {
+            "driver": time_per_call(driver_by_email, emails),
+            "orm_query": time_per_call(orm_by_email, emails),
+            "crud": time_per_call(crud_by_email, emails),
+        }
+    engine.dispose()
+
+    print(f"{'lookup':<14} {'path':<10} {'us/call':>9} {'python us':>10}")
+    for lookup, timings in results.items():
+        for path, micros in timings.items():
+            overhead = micros - timings["driver"]
+            print(f"{lookup:<14} {path:<10} {micros:>9.1f} {overhead if path != 'driver' else 0.0:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
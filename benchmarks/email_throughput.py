@@ -0,0 +1,169 @@
+"""
+OTP email throughput and end-to-end latency under concurrent /auth/request-otp load.
+
+Mounts the auth router on a bare FastAPI app (no global rate limiting) with
+its own database, points EmailService at a local SMTP sink
+(tests.fakes.SMTPSink) and fires request-otp calls for distinct users from
+concurrent clients. Reports request latency, delivered emails per second
+and the end-to-end latency from the request being sent to the sink
+accepting the message. ``--fail-every`` makes the sink reject every Nth
+message with a 451 to show retry behaviour, and ``--greylist`` spreads
+recipients over ``--domains`` domains and greylists that many of them to
+show that a throttled domain doesn't hold up the others:
+
+    python -m benchmarks.email_throughput --requests 100 --concurrency 10
+    python -m benchmarks.email_throughput --mode inline
+    python -m benchmarks.email_throughput --fail-every 5 --delay 0.005
+    python -m benchmarks.email_throughput --domains 4 --greylist 1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: F401 - registers tables on Base.metadata
+from core.config import settings
+from core.security import hash_password
+from crud.email_outbox_crud import EmailOutboxCRUD
+from database.session import Base, SessionLocal, get_db
+from models.user_model import User
+from routers.auth_router import router
+from services.email_outbox import email_outbox
+from services.email_service import email_service
+from tests.fakes import SMTPSink
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(label: str, seconds):
+    if not seconds:
+        print(f"{label:<22} {'-':>8} {'-':>8} {'-':>8}")
+        return
+    ms = [s * 1000 for s in seconds]
+    print(f"{label:<22} {statistics.mean(ms):>8.1f} {percentile(ms, 0.5):>8.1f} {percentile(ms, 0.95):>8.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mode", choices=["outbox", "inline"], default="outbox")
+    parser.add_argument("--workers", type=int, default=4, help="Outbox sender tasks")
+    parser.add_argument("--delay", type=float, default=0.002, help="Sink reply delay in seconds")
+    parser.add_argument("--fail-every", type=int, default=0, help="Sink rejects every Nth message")
+    parser.add_argument("--domains", type=int, default=1, help="Recipient domains")
+    parser.add_argument("--greylist", type=int, default=0, help="Recipient domains the sink greylists")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for deliveries")
+    args = parser.parse_args()
+
+    domains = [f"d{i}.example.com" for i in range(args.domains)]
+    sink = SMTPSink(command_delay=args.delay, fail_every=args.fail_every, greylist_domains=domains[:args.greylist])
+    await sink.start()
+
+    settings.EMAIL_HOST = sink.host
+    settings.EMAIL_PORT = sink.port
+    settings.EMAIL_USERNAME = "bench"
+    settings.EMAIL_PASSWORD = "bench"
+    settings.EMAIL_FROM = "noreply@example.com"
+    settings.EMAIL_STARTTLS = False
+    settings.EMAIL_DELIVERY_MODE = args.mode
+    settings.EMAIL_OUTBOX_WORKERS = args.workers
+    settings.EMAIL_OUTBOX_BASE_BACKOFF_SECONDS = 0.05
+    settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS = 0.05
+
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(db_fd)
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    # Same session configuration as the app, bound to the benchmark database
+    session_factory = sessionmaker(**{**SessionLocal.kw, "bind": engine})
+
+    emails = [f"mail{i}@{domains[i % len(domains)]}" for i in range(args.requests)]
+    password_hash = hash_password("Bench!Passw0rd")
+    with session_factory() as db:
+        db.add_all(
+            User(email=email, hashed_password=password_hash, full_name=f"User {i}", is_active=True)
+            for i, email in enumerate(emails)
+        )
+        db.commit()
+
+    async def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    email_outbox.session_factory = session_factory
+    email_outbox.start()
+
+    sent_at = {}
+    request_latency = []
+    statuses = Counter()
+    pending = list(reversed(emails))
+
+    async def client_loop(client: httpx.AsyncClient):
+        while pending:
+            email = pending.pop()
+            sent_at[email] = time.monotonic()
+            response = await client.post("/auth/request-otp", json={"email": email, "purpose": "login"})
+            request_latency.append(time.monotonic() - sent_at[email])
+            statuses[response.status_code] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.monotonic()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        requests_done = time.monotonic()
+
+    expected = statuses[200] - sum(1 for email in emails if email.rpartition("@")[2] in sink.greylist_domains)
+    deadline = time.monotonic() + args.timeout
+    while len(sink.messages) < expected and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+    await email_outbox.stop()
+    await email_service.close()
+    await sink.stop()
+
+    with session_factory() as db:
+        outbox = EmailOutboxCRUD(db)
+        dead = outbox.count_by_status("dead")
+        undelivered = outbox.count_by_status("pending") + outbox.count_by_status("sending")
+    engine.dispose()
+    os.unlink(db_path)
+
+    end_to_end = [received - sent_at[message["To"]] for message, received in zip(sink.messages, sink.received_at)]
+    delivered_window = (sink.received_at[-1] - start) if sink.received_at else 0
+
+    print(f"mode={args.mode} requests={args.requests} concurrency={args.concurrency} "
+          f"delay={args.delay}s fail_every={args.fail_every}")
+    print(f"responses: {dict(statuses)}")
+    print(f"requests/s: {args.requests / (requests_done - start):.1f}")
+    print(f"delivered: {len(sink.messages)}  emails/s: {len(sink.messages) / delivered_window if delivered_window else 0:.1f}")
+    print(f"sink rejections: {sink.rejected}  greylisted: {sink.greylisted}  "
+          f"dead letters: {dead}  undelivered: {undelivered}")
+    print(f"{'latency (ms)':<22} {'mean':>8} {'p50':>8} {'p95':>8}")
+    summarize("request-otp response", request_latency)
+    summarize("request -> delivered", end_to_end)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
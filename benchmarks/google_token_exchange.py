@@ -0,0 +1,150 @@
+"""
+Latency of the Google token exchange: a client per callback versus the shared client.
+
+Runs a local HTTPS stand-in for oauth2.googleapis.com/token (self-signed
+certificate, HTTP/1.1 keep-alive) and times the token POST the way
+google_oauth_callback made it before (``httpx.AsyncClient()`` per call, so
+TCP and TLS setup every time) and through services.http_client's shared,
+pooled client. ``--connect-delay`` adds a delay to every new connection to
+stand in for the extra round trips a TCP + TLS handshake costs against the
+real endpoint:
+
+    python -m benchmarks.google_token_exchange --calls 200
+    python -m benchmarks.google_token_exchange --connect-delay 0.03
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.http_client import SharedHTTPClient
+
+
+def self_signed_certificate(directory: str):
+    """Write a localhost certificate and key; returns (cert_path, key_path)."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+def start_token_endpoint(cert_path: str, key_path: str, connect_delay: float):
+    """Start the HTTPS stand-in on a thread; returns (server, counters)."""
+    counters = {"connections": 0, "requests": 0}
+    body = json.dumps({"access_token": "ya29.stand-in", "id_token": "a.b.c", "expires_in": 3599}).encode()
+
+    class TokenHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; avoid Nagle + delayed ACK stalls
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            counters["connections"] += 1
+            if connect_delay:
+                time.sleep(connect_delay)
+            super().setup()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            counters["requests"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("localhost", 0), TokenHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+async def time_calls(post, calls: int):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        response = await post()
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="Seconds added to each new connection")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = self_signed_certificate(directory)
+        server, counters = start_token_endpoint(cert_path, key_path, args.connect_delay)
+        url = f"https://localhost:{server.server_address[1]}/token"
+        verify = ssl.create_default_context(cafile=cert_path)
+        form = {"code": "stand-in", "grant_type": "authorization_code"}
+
+        async def per_callback_client():
+            async with httpx.AsyncClient(verify=verify) as client:
+                return await client.post(url, data=form)
+
+        shared = SharedHTTPClient(verify=verify)
+
+        async def shared_client():
+            return await shared.client.post(url, data=form)
+
+        print(f"{'client':<14} {'mean ms':>8} {'p95 ms':>8} {'connections':>12}")
+        for label, post in (("per-callback", per_callback_client), ("shared", shared_client)):
+            before = counters["connections"]
+            samples = sorted(await time_calls(post, args.calls))
+            p95 = samples[int(len(samples) * 0.95) - 1] * 1000
+            print(f"{label:<14} {statistics.mean(samples) * 1000:>8.2f} {p95:>8.2f} "
+                  f"{counters['connections'] - before:>12}")
+
+        await shared.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
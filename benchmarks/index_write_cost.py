@@ -0,0 +1,128 @@
+"""
+Insert and update throughput on ``users`` with the old and the deduplicated index set.
+
+Builds two scratch copies of the users table, one with the indexes the
+schema had before the duplicate-index migration and one with the indexes
+it keeps, then times registrations (INSERT) and verifications
+(UPDATE is_verified, updated_at) on each. Variants alternate order across
+``--repeat`` runs and the median is reported, since the first table built
+warms caches for the second. ``--batch`` commits every N rows instead of
+every row, taking commit (WAL flush) cost out so index maintenance is
+what is measured.
+
+Requires PostgreSQL at DATABASE_URL:
+
+    python -m benchmarks.index_write_cost --rows 20000 --repeat 5
+    python -m benchmarks.index_write_cost --rows 50000 --batch 1000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import settings
+
+COMMON_INDEXES = [
+    "CREATE UNIQUE INDEX {table}_email_key ON {table} (email)",
+    "CREATE UNIQUE INDEX {table}_google_id_key ON {table} (google_id)",
+    "CREATE INDEX {table}_active_verified ON {table} (is_active, is_verified)",
+]
+
+# Dropped by the duplicate-index migration
+DUPLICATE_INDEXES = [
+    "CREATE INDEX {table}_idx_email ON {table} (email)",
+    "CREATE INDEX {table}_idx_google_id ON {table} (google_id)",
+    "CREATE INDEX {table}_ix_id ON {table} (id)",
+]
+
+
+def run_variant(engine, table: str, indexes: list, rows: int, batch: int = 1) -> dict:
+    """Time inserts and updates against one scratch users table."""
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        conn.execute(text(f"CREATE TABLE {table} (LIKE users INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id)"))
+        for ddl in indexes:
+            conn.execute(text(ddl.format(table=table)))
+
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for i in range(rows):
+            conn.execute(
+                text(
+                    f"INSERT INTO {table} (id, email, google_id, full_name, is_active, is_verified, created_at, updated_at) "
+                    f"VALUES (:id, :email, :google_id, 'Bench User', true, false, now(), now())"
+                ),
+                {"id": i + 1, "email": f"bench{i}@example.com", "google_id": f"g{i}"}
+            )
+            if (i + 1) % batch == 0:
+                conn.commit()
+        conn.commit()
+        insert_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(rows):
+            conn.execute(
+                text(f"UPDATE {table} SET is_verified = true, updated_at = now() WHERE id = :id"),
+                {"id": i + 1}
+            )
+            if (i + 1) % batch == 0:
+                conn.commit()
+        conn.commit()
+        update_elapsed = time.perf_counter() - start
+
+        index_bytes = conn.execute(
+            text("SELECT pg_indexes_size(CAST(:table AS regclass))"), {"table": table}
+        ).scalar()
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+    return {
+        "inserts_per_second": rows / insert_elapsed,
+        "updates_per_second": rows / update_elapsed,
+        "index_kb": index_bytes / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per variant; the median is reported")
+    parser.add_argument("--batch", type=int, default=1, help="rows per commit")
+    args = parser.parse_args()
+
+    variants = {
+        "before": ("bench_users_before", COMMON_INDEXES + DUPLICATE_INDEXES),
+        "after": ("bench_users_after", COMMON_INDEXES),
+    }
+    runs = {name: [] for name in variants}
+    engine = create_engine(settings.DATABASE_URL)
+    for attempt in range(args.repeat):
+        order = list(variants) if attempt % 2 == 0 else list(reversed(variants))
+        for name in order:
+            table, indexes = variants[name]
+            runs[name].append(run_variant(engine, table, indexes, args.rows, args.batch))
+    engine.dispose()
+
+    results = {
+        name: {metric: statistics.median(run[metric] for run in results_) for metric in results_[0]}
+        for name, results_ in runs.items()
+    }
+
+    print(f"{'index set':<10} {'inserts/s':>10} {'updates/s':>10} {'index kB':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['inserts_per_second']:>10.1f} "
+            f"{result['updates_per_second']:>10.1f} {result['index_kb']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+SMTP throughput: a new connection per message versus the connection pool.
+
+Sends OTP-sized messages to a local SMTP sink (tests.fakes.SMTPSink) with a
+fixed number of concurrent senders and reports messages per second and SMTP
+connections opened. ``per_message`` opens, greets and quits a session for
+every message, which is what EmailService did through FastMail;
+``pooled`` sends through SMTPConnectionPool. ``--delay`` adds a per-reply
+delay to the sink to stand in for the round trip to a real relay:
+
+    python -m benchmarks.smtp_throughput --messages 500 --concurrency 8
+    python -m benchmarks.smtp_throughput --delay 0.005
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.smtp_pool import SMTPConnectionPool
+from tests.fakes import SMTPSink
+
+
+def build_message(i: int) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = "Your Login Code - AI EdTech Platform"
+    message["From"] = "noreply@example.com"
+    message["To"] = f"user{i}@example.com"
+    message.set_content(f"<p>Your One-Time Password (OTP) is:</p><h1>{i:06d}</h1>", subtype="html")
+    return message
+
+
+async def send_per_message(port: int, message: EmailMessage):
+    await aiosmtplib.send(message, hostname="127.0.0.1", port=port, start_tls=False)
+
+
+async def run(sender, messages: int, concurrency: int) -> float:
+    """Send ``messages`` messages with ``concurrency`` workers; returns seconds."""
+    queue = asyncio.Queue()
+    for i in range(messages):
+        queue.put_nowait(build_message(i))
+
+    async def worker():
+        while not queue.empty():
+            await sender(queue.get_nowait())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.001, help="Sink reply delay in seconds")
+    args = parser.parse_args()
+
+    print(f"{'mode':<12} {'msgs/s':>9} {'connections':>12}")
+    for mode in ("per_message", "pooled"):
+        sink = SMTPSink(command_delay=args.delay)
+        await sink.start()
+        if mode == "pooled":
+            pool = SMTPConnectionPool(hostname="127.0.0.1", port=sink.port, start_tls=False, max_size=args.concurrency)
+            elapsed = await run(pool.send_message, args.messages, args.concurrency)
+            await pool.close()
+        else:
+            elapsed = await run(lambda m: send_per_message(sink.port, m), args.messages, args.concurrency)
+        await sink.stop()
+        assert len(sink.messages) == args.messages
+        print(f"{mode:<12} {args.messages / elapsed:>9.1f} {sink.connections:>12}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+SQL round trips and latency for /auth/register and /auth/verify-otp.
+
+Mounts the auth router on a bare FastAPI app (no global rate limiting) with
+its own database, counts every statement and commit the driver executes per request
+and reports the mean latency. Email delivery is stubbed out.
+
+    python -m benchmarks.write_round_trips --users 200
+    python -m benchmarks.write_round_trips --url postgresql+psycopg://...
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: F401 - registers tables on Base.metadata
+from database.session import Base, SessionLocal, get_db
+from core.config import settings
+from routers.auth_router import router, email_service
+
+
+class RoundTripCounter:
+    """Counts statements and commits executed on an engine."""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args, **kwargs):
+        self.statements += 1
+
+    def _on_commit(self, *args, **kwargs):
+        self.commits += 1
+
+
+def measure(client, counter, method, path, payload):
+    """Run one request and return (response, statements, commits, seconds)."""
+    statements, commits = counter.statements, counter.commits
+    start = time.perf_counter()
+    response = client.request(method, path, json=payload)
+    elapsed = time.perf_counter() - start
+    return response, counter.statements - statements, counter.commits - commits, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    db_path = None
+    url = args.url
+    if url is None:
+        db_fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(db_fd)
+        url = f"sqlite:///{db_path}"
+
+    engine = create_engine(url, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {})
+    Base.metadata.create_all(bind=engine)
+    # Same session configuration as the app, bound to the benchmark database
+    session_factory = sessionmaker(**{**SessionLocal.kw, "bind": engine})
+    counter = RoundTripCounter(engine)
+
+    async def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    sent_codes = {}
+
+    async def capture_otp_email(email, otp_code, user_name=None, purpose="verification", locale=None):
+        sent_codes[email] = otp_code
+
+    email_service.send_otp_email = capture_otp_email
+    # The bare app has no lifespan to run outbox workers; send during the request
+    settings.EMAIL_DELIVERY_MODE = "inline"
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+
+    results = {"register": [], "verify-otp": []}
+    with TestClient(app) as client:
+        for i in range(args.users):
+            email = f"bench{i}-{int(time.time())}@example.com"
+            response, *sample = measure(client, counter, "POST", "/auth/register", {
+                "email": email, "password": "Bench!Passw0rd", "full_name": "Bench User"
+            })
+            assert response.status_code == 201, response.text
+            results["register"].append(sample)
+
+            client.post("/auth/request-otp", json={"email": email, "purpose": "verification"})
+            response, *sample = measure(client, counter, "POST", "/auth/verify-otp", {
+                "email": email, "otp_code": sent_codes[email], "purpose": "verification"
+            })
+            assert response.status_code == 200, response.text
+            results["verify-otp"].append(sample)
+
+    engine.dispose()
+    if db_path:
+        os.unlink(db_path)
+
+    print(f"{'endpoint':<12} {'statements':>10} {'commits':>8} {'mean ms':>9}")
+    for endpoint, samples in results.items():
+        print(
+            f"{endpoint:<12} {statistics.mean(s for s, _, _ in samples):>10.1f} "
+            f"{statistics.mean(c for _, c, _ in samples):>8.1f} "
+            f"{statistics.mean(t for _, _, t in samples) * 1000:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
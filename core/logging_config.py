@@ -0,0 +1,124 @@
+"""
+Logging setup: records are queued on the calling thread and formatted and
+written by a QueueListener thread, so log I/O never blocks the event loop.
+
+Message arguments are kept on the record and only interpolated by the
+listener, and only for records that passed the level and sampling filters.
+Call sites should pass arguments (``logger.info("x=%s", x)``) rather than
+building f-strings, and can attach structured fields with ``extra=``; the
+JSON formatter emits them as top-level keys, along with the trace_id and
+span_id of the active span when tracing is on.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from .config import settings
+from .tracing import TraceContextFilter
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: Fraction of INFO/DEBUG records kept, between 0 and 1
+        """
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener.
+
+    The stock prepare() interpolates the message and formats any traceback
+    on the calling thread so the record can cross a process boundary; this
+    queue stays in-process, so the record is handed over untouched.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging():
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Uses LOG_LEVEL, LOG_FORMAT (json or text) and LOG_ACCESS_SAMPLE_RATE for
+    successful-request logs. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if settings.LOG_FORMAT.lower() == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    queue_handler = _DeferredQueueHandler(log_queue)
+    # Handler filters run on the calling thread, where the request's span is current
+    queue_handler.addFilter(TraceContextFilter())
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, settings.LOG_LEVEL.upper()))
+
+    # Sampled on the calling thread, before anything is queued
+    access_logger = logging.getLogger("auth_service.access")
+    if settings.LOG_ACCESS_SAMPLE_RATE < 1.0:
+        access_logger.addFilter(SamplingFilter(settings.LOG_ACCESS_SAMPLE_RATE))
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,248 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Hot paths record into pre-bound children: ``FAMILY.labels(...)`` is looked
+up once (at import, or cached per label set) and recording is a plain
+attribute increment, with no lock. Under the GIL an
+increment racing with one from another thread can very rarely be lost;
+that is accepted for monitoring counters. Values that already live
+elsewhere (pool sizes, queue depth, cache statistics) are read by
+collectors only when /metrics is scraped.
+"""
+
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# (suffix, label pairs, value) produced by a collector for one family
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    rendered = ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+    return f"{{{rendered}}}" if rendered else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf overflow; cumulated when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Structure: {label values: child}
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Child for a label set, created on first use; bind it once where possible."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_pairs(self, values: Tuple[str, ...]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(zip(self.labelnames, values))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Family):
+    """Monotonic count."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def samples(self) -> List[Sample]:
+        return [("_total", self._label_pairs(values), child.value) for values, child in list(self._children.items())]
+
+
+class Histogram(_Family):
+    """Distribution of observed values in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        for values, child in list(self._children.items()):
+            pairs = self._label_pairs(values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                samples.append(("_bucket", pairs + (("le", _format_value(bound)),), cumulative))
+            samples.append(("_sum", pairs, child.sum))
+            samples.append(("_count", pairs, child.count))
+        return samples
+
+
+class CallbackMetric:
+    """Gauge or counter whose values are read from a callback at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+        kind: str = "gauge"
+    ):
+        """
+        Args:
+            name: Metric name
+            documentation: HELP text
+            read: Returns (labels, value) pairs; called on every scrape
+            kind: "gauge", or "counter" for cumulative values kept elsewhere
+        """
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self._read = read
+        self._suffix = "_total" if kind == "counter" else ""
+
+    def samples(self) -> List[Sample]:
+        return [(self._suffix, tuple(labels.items()), value) for labels, value in self._read()]
+
+
+class MetricsRegistry:
+    """Named metric families rendered together for /metrics."""
+
+    def __init__(self):
+        self._families: Dict[str, object] = {}
+
+    def register(self, family):
+        if family.name in self._families:
+            raise ValueError(f"Metric {family.name} is already registered")
+        self._families[family.name] = family
+        return family
+
+    def unregister(self, name: str):
+        self._families.pop(name, None)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+        kind: str = "gauge"
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, read, kind))
+
+    def render(self) -> str:
+        """Text exposition format (version 0.0.4)."""
+        lines = []
+        for family in list(self._families.values()):
+            try:
+                samples = family.samples()
+            except Exception as e:
+                # One broken source (e.g. the database being down) mustn't hide the rest
+                lines.append(f"# {family.name} unavailable: {type(e).__name__}")
+                continue
+            lines.append(f"# HELP {family.name} {family.documentation}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, pairs, value in samples:
+                lines.append(f"{family.name}{suffix}{_format_labels(pairs)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the metrics recorded on hot paths
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "auth_http_requests", "HTTP responses by route template and status code", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "auth_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+bcrypt_duration = registry.histogram(
+    "auth_bcrypt_duration_seconds", "bcrypt hash and verify time",
+    ("operation",), buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5)
+)
+jwt_duration = registry.histogram(
+    "auth_jwt_duration_seconds", "JWT encode and decode time",
+    ("operation",), buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+rate_limit_rejections = registry.counter(
+    "auth_rate_limit_rejections", "Requests rejected by a rate limit rule", ("rule",)
+)
+db_queries_per_request = registry.histogram(
+    "auth_db_queries_per_request", "SQL statements issued per request by route template",
+    ("method", "route"), buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21)
+)
@@ -1,12 +1,24 @@
 from datetime import datetime, timedelta
-from typing import Any, Union
+from time import perf_counter
+from typing import Any, Dict, Union
 import uuid
 from jose import jwt
 from passlib.context import CryptContext
 from .config import settings
+from .metrics import bcrypt_duration, jwt_duration
+from .server_timing import HASH, JWT, record as record_timing
+from .tracing import get_tracer
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Bound once so timing a call is two perf_counter reads and an observe
+_BCRYPT_HASH = bcrypt_duration.labels("hash")
+_BCRYPT_VERIFY = bcrypt_duration.labels("verify")
+_JWT_ENCODE = jwt_duration.labels("encode")
+_JWT_DECODE = jwt_duration.labels("decode")
+
+_tracer = get_tracer("auth_service.security")
+
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
@@ -18,7 +30,12 @@ def create_access_token(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    with _tracer.start_as_current_span("jwt.encode"):
+        start = perf_counter()
+        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        elapsed = perf_counter() - start
+        _JWT_ENCODE.observe(elapsed)
+        record_timing(JWT, elapsed)
     return encoded_jwt
 
 
@@ -34,13 +51,44 @@ def create_refresh_token(
     # Add unique JWT ID for token invalidation tracking
     jti = uuid.uuid4().hex
     to_encode = {"exp": expire, "sub": str(subject), "jti": jti}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    with _tracer.start_as_current_span("jwt.encode"):
+        start = perf_counter()
+        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        elapsed = perf_counter() - start
+        _JWT_ENCODE.observe(elapsed)
+        record_timing(JWT, elapsed)
     return encoded_jwt
 
 
+def decode_token(token: str) -> Dict[str, Any]:
+    """Decode and verify one of our access or refresh tokens; raises JWTError."""
+    with _tracer.start_as_current_span("jwt.decode"):
+        start = perf_counter()
+        try:
+            return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        finally:
+            elapsed = perf_counter() - start
+            _JWT_DECODE.observe(elapsed)
+            record_timing(JWT, elapsed)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with _tracer.start_as_current_span("bcrypt.verify"):
+        start = perf_counter()
+        try:
+            return pwd_context.verify(plain_password, hashed_password)
+        finally:
+            elapsed = perf_counter() - start
+            _BCRYPT_VERIFY.observe(elapsed)
+            record_timing(HASH, elapsed)
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    with _tracer.start_as_current_span("bcrypt.hash"):
+        start = perf_counter()
+        try:
+            return pwd_context.hash(password)
+        finally:
+            elapsed = perf_counter() - start
+            _BCRYPT_HASH.observe(elapsed)
+            record_timing(HASH, elapsed)
@@ -0,0 +1,92 @@
+"""
+Per-request time accumulators for the Server-Timing response header.
+
+ServerTimingMiddleware puts a RequestTimings in a context variable for the
+duration of a request; the CRUD classes and core.security add their
+elapsed time to it. Outside a request (or with SERVER_TIMING_ENABLED off)
+there is no accumulator and recording is a single context variable read.
+"""
+
+import contextvars
+import functools
+import inspect
+from time import perf_counter
+from typing import Callable, Dict, Optional, Tuple
+
+DB = "db"
+HASH = "hash"
+JWT = "jwt"
+EMAIL = "email"
+# Route handler (dependencies and endpoint); the rest of the request is middleware
+HANDLER = "handler"
+
+
+class RequestTimings:
+    """Seconds spent per category during one request."""
+
+    __slots__ = ("durations", "db_depth")
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        # CRUD methods call each other; only the outermost call is timed
+        self.db_depth = 0
+
+    def add(self, category: str, seconds: float):
+        self.durations[category] = self.durations.get(category, 0.0) + seconds
+
+    def other_than(self, category: str) -> float:
+        return sum(seconds for name, seconds in self.durations.items() if name != category)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("server_timings", default=None)
+
+
+def start_request() -> Tuple[RequestTimings, contextvars.Token]:
+    """Begin accumulating for the current request; pass the token to end_request."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token: contextvars.Token):
+    _current.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record(category: str, seconds: float):
+    """Add time to the current request's category, if a request is being timed."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(category, seconds)
+
+
+def timed_db_methods(cls):
+    """
+    Class decorator adding each public method's time to the ``db`` category.
+
+    Time the method spends hashing (e.g. UserCRUD.create) is already
+    recorded under ``hash`` and is not counted again as db time.
+    """
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None or timings.db_depth:
+                return fn(*args, **kwargs)
+            timings.db_depth += 1
+            others_before = timings.other_than(DB)
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                timings.db_depth -= 1
+                timings.add(DB, elapsed - (timings.other_than(DB) - others_before))
+        return wrapper
+
+    for attr, value in list(vars(cls).items()):
+        if not attr.startswith("_") and inspect.isfunction(value):
+            setattr(cls, attr, wrap(value))
+    return cls
@@ -0,0 +1,603 @@
+"""
+In-process request tracing with an OpenTelemetry-shaped API.
+
+    tracer = get_tracer("auth_service.crud")
+    with tracer.start_as_current_span("UserCRUD.get_by_email", attributes={...}) as span:
+        span.set_attribute("db.rows", 1)
+
+The names (get_tracer, start_as_current_span, set_attribute, set_status,
+StatusCode, record_exception, get_span_context) follow opentelemetry-api, so
+call sites don't change if the SDK is adopted later. Finished spans go to an
+exporter: in memory (inspect them from a shell or a test), a JSON-lines
+file, or an OpenTelemetry collector over OTLP/HTTP; the last two are written
+by a background thread. With TRACING_ENABLED off, starting a span returns a
+shared no-op and costs one context variable read.
+
+Sampling follows the W3C trace-flags: a request whose traceparent says
+"sampled" is recorded, one that says "not sampled" is not (its context is
+still carried, so nothing below it records either), and TRACING_SAMPLE_RATE
+only decides for traces that start here.
+"""
+
+import asyncio
+import contextvars
+import enum
+import functools
+import inspect
+import json
+import logging
+import queue
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger("auth_service.tracing")
+
+# W3C trace-flags bit for "the caller recorded this trace"
+SAMPLED_FLAG = 0x01
+
+
+class StatusCode(enum.Enum):
+    """Span status, numbered as in OpenTelemetry (and OTLP)."""
+
+    UNSET = 0
+    OK = 1
+    ERROR = 2
+
+
+class SpanContext:
+    """Trace and span identifiers of a span, and its W3C trace-flags."""
+
+    __slots__ = ("trace_id", "span_id", "trace_flags")
+
+    def __init__(self, trace_id: int, span_id: int, trace_flags: int = SAMPLED_FLAG):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.trace_flags = trace_flags
+
+    @property
+    def is_valid(self) -> bool:
+        return self.trace_id != 0 and self.span_id != 0
+
+    @property
+    def sampled(self) -> bool:
+        return bool(self.trace_flags & SAMPLED_FLAG)
+
+    @property
+    def trace_id_hex(self) -> str:
+        return f"{self.trace_id:032x}"
+
+    @property
+    def span_id_hex(self) -> str:
+        return f"{self.span_id:016x}"
+
+
+INVALID_SPAN_CONTEXT = SpanContext(0, 0, 0)
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = (
+        "name", "context", "parent_span_id", "scope", "start_time_ns", "end_time_ns",
+        "attributes", "events", "status", "status_description", "_provider"
+    )
+
+    def __init__(
+        self,
+        name: str,
+        context: SpanContext,
+        parent_span_id: Optional[int],
+        provider: "TracerProvider",
+        scope: str = "auth_service"
+    ):
+        self.name = name
+        self.context = context
+        self.scope = scope
+        self.parent_span_id = parent_span_id
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.status = StatusCode.UNSET
+        self.status_description: Optional[str] = None
+        self._provider = provider
+
+    def get_span_context(self) -> SpanContext:
+        return self.context
+
+    def is_recording(self) -> bool:
+        return self.end_time_ns is None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes or {}})
+
+    def update_name(self, name: str):
+        self.name = name
+
+    def set_status(self, status: StatusCode, description: Optional[str] = None):
+        self.status = status
+        # As in OpenTelemetry, only an error carries a description
+        self.status_description = description if status is StatusCode.ERROR else None
+
+    def record_exception(self, exception: BaseException):
+        self.add_event("exception", {
+            "exception.type": type(exception).__name__,
+            "exception.message": str(exception),
+        })
+
+    def end(self):
+        if self.end_time_ns is None:
+            self.end_time_ns = time.time_ns()
+            self._provider.exporter.export(self)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_time_ns is None:
+            return None
+        return (self.end_time_ns - self.start_time_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id_hex,
+            "span_id": self.context.span_id_hex,
+            "parent_span_id": f"{self.parent_span_id:016x}" if self.parent_span_id else None,
+            "scope": self.scope,
+            "start_time_ns": self.start_time_ns,
+            "end_time_ns": self.end_time_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": self.status.name,
+            "status_description": self.status_description,
+        }
+
+
+class _NonRecordingSpan:
+    """Stand-in when tracing is off or the trace wasn't sampled; every call is a no-op."""
+
+    __slots__ = ("context",)
+
+    def __init__(self, context: SpanContext = INVALID_SPAN_CONTEXT):
+        self.context = context
+
+    def get_span_context(self) -> SpanContext:
+        return self.context
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        pass
+
+    def update_name(self, name: str):
+        pass
+
+    def set_status(self, status: StatusCode, description: Optional[str] = None):
+        pass
+
+    def record_exception(self, exception: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+
+# The span code is currently running in; asyncio tasks inherit a copy
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def get_current_span():
+    """The active span, or a non-recording span outside of any trace."""
+    return _current_span.get() or NON_RECORDING_SPAN
+
+
+class InMemorySpanExporter:
+    """Keeps the most recent finished spans in a ring buffer."""
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self._spans.append(span)
+
+    def get_finished_spans(self, trace_id: Optional[int] = None) -> List[Span]:
+        spans = list(self._spans)
+        if trace_id is not None:
+            spans = [span for span in spans if span.context.trace_id == trace_id]
+        return spans
+
+    def clear(self):
+        self._spans.clear()
+
+    def shutdown(self):
+        pass
+
+
+class _BackgroundSpanExporter:
+    """Queues finished spans for a writer thread, which hands them over in batches."""
+
+    thread_name = "span-exporter"
+    max_batch_size = 512
+
+    def __init__(self):
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def export(self, span: Span):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                    self._thread.start()
+        self._queue.put(span)
+
+    def _run(self):
+        self._open()
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # Take what else is already queued, without waiting for more
+                while batch[-1] is not None and len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get())
+                stopping = batch[-1] is None
+                spans = [span for span in batch if span is not None]
+                if spans:
+                    try:
+                        self._write(spans)
+                    except Exception as e:
+                        logger.warning("Dropped %d spans: %s", len(spans), e)
+                if stopping:
+                    return
+        finally:
+            self._close()
+
+    def _open(self):
+        pass
+
+    def _write(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def shutdown(self):
+        """Write out queued spans and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class FileSpanExporter(_BackgroundSpanExporter):
+    """Appends finished spans as JSON lines."""
+
+    thread_name = "span-file-exporter"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._file = None
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, spans: List[Span]):
+        self._file.writelines(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    # bool first: it is also an int
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    """A finished span in the OTLP/JSON encoding (ids as hex, times as strings)."""
+    status: Dict[str, Any] = {"code": span.status.value}
+    if span.status_description:
+        status["message"] = span.status_description
+    return {
+        "traceId": span.context.trace_id_hex,
+        "spanId": span.context.span_id_hex,
+        "parentSpanId": f"{span.parent_span_id:016x}" if span.parent_span_id else "",
+        "flags": span.context.trace_flags,
+        "name": span.name,
+        # SPAN_KIND_SERVER for the request span, INTERNAL for everything below it
+        "kind": 2 if span.attributes.get("http.method") else 1,
+        "startTimeUnixNano": str(span.start_time_ns),
+        "endTimeUnixNano": str(span.end_time_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "events": [
+            {"timeUnixNano": str(event["time_ns"]), "name": event["name"], "attributes": _otlp_attributes(event["attributes"])}
+            for event in span.events
+        ],
+        "status": status,
+    }
+
+
+class OTLPSpanExporter(_BackgroundSpanExporter):
+    """
+    Sends finished spans to an OpenTelemetry collector over OTLP/HTTP with
+    JSON bodies, so Jaeger, Tempo and the like can show them.
+    """
+
+    thread_name = "span-otlp-exporter"
+
+    def __init__(self, endpoint: str, service_name: str = "auth-service", client: Any = None, timeout: float = 10.0):
+        """
+        Args:
+            endpoint: Collector traces URL, e.g. http://collector:4318/v1/traces
+            service_name: ``service.name`` resource attribute
+            client: httpx.Client to send with; replace with a local stand-in in tests
+            timeout: Seconds to wait for the collector per batch
+        """
+        super().__init__()
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = client
+        self._timeout = timeout
+
+    def _open(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client(timeout=self._timeout)
+
+    def _write(self, spans: List[Span]):
+        scopes: Dict[str, List[Dict[str, Any]]] = {}
+        for span in spans:
+            scopes.setdefault(span.scope, []).append(otlp_span(span))
+        body = {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": scope}, "spans": encoded} for scope, encoded in scopes.items()],
+        }]}
+        response = self._client.post(self.endpoint, json=body)
+        response.raise_for_status()
+
+    def _close(self):
+        self._client.close()
+
+
+class _SpanScope:
+    """Context manager that activates a span and ends it on exit."""
+
+    __slots__ = ("_span", "_token", "_end_on_exit")
+
+    def __init__(self, span, end_on_exit: bool = True):
+        self._span = span
+        self._token = None
+        self._end_on_exit = end_on_exit
+
+    def __enter__(self):
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):
+            self._span.record_exception(exc)
+            self._span.set_status(StatusCode.ERROR, f"{exc_type.__name__}: {exc}")
+        if self._end_on_exit:
+            self._span.end()
+        return False
+
+
+class Tracer:
+    """Creates spans for one instrumented component."""
+
+    def __init__(self, name: str, provider: "TracerProvider"):
+        self.name = name
+        self._provider = provider
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, parent: Optional[SpanContext] = None):
+        """
+        Start a span as a child of ``parent`` or of the current span.
+
+        Args:
+            name: Operation name
+            attributes: Initial attributes
+            parent: Remote parent (e.g. from an incoming traceparent header)
+        """
+        provider = self._provider
+        if not provider.enabled:
+            return NON_RECORDING_SPAN
+
+        current = _current_span.get()
+        if parent is None and current is not None:
+            if isinstance(current, _NonRecordingSpan):
+                # Unsampled trace: its descendants aren't recorded either
+                return current
+            parent = current.context
+        if parent is None or not parent.is_valid:
+            if provider.sample_rate < 1.0 and random.random() >= provider.sample_rate:
+                return NON_RECORDING_SPAN
+            trace_id, parent_span_id = secrets.randbits(128) or 1, None
+        elif not parent.sampled:
+            # The caller didn't record this trace; keep its context, record nothing
+            return _NonRecordingSpan(parent)
+        else:
+            trace_id, parent_span_id = parent.trace_id, parent.span_id
+
+        span = Span(name, SpanContext(trace_id, secrets.randbits(64) or 1), parent_span_id, provider, self.name)
+        if attributes:
+            span.attributes.update(attributes)
+        return span
+
+    def start_as_current_span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+        end_on_exit: bool = True
+    ) -> _SpanScope:
+        return _SpanScope(self.start_span(name, attributes, parent), end_on_exit)
+
+
+class TracerProvider:
+    """Tracing configuration shared by every tracer: on/off, sampling, exporter."""
+
+    def __init__(self, enabled: bool = False, sample_rate: float = 1.0, exporter: Any = None):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter or InMemorySpanExporter()
+        self._tracers: Dict[str, Tracer] = {}
+
+    def get_tracer(self, name: str) -> Tracer:
+        tracer = self._tracers.get(name)
+        if tracer is None:
+            tracer = self._tracers[name] = Tracer(name, self)
+        return tracer
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+def _create_provider() -> TracerProvider:
+    exporter_name = settings.TRACING_EXPORTER.lower()
+    if exporter_name == "file":
+        exporter = FileSpanExporter(settings.TRACING_FILE_PATH)
+    elif exporter_name == "otlp":
+        exporter = OTLPSpanExporter(settings.TRACING_OTLP_ENDPOINT, settings.TRACING_SERVICE_NAME)
+    else:
+        exporter = InMemorySpanExporter(settings.TRACING_MEMORY_MAX_SPANS)
+    return TracerProvider(
+        enabled=settings.TRACING_ENABLED,
+        sample_rate=settings.TRACING_SAMPLE_RATE,
+        exporter=exporter
+    )
+
+
+_HEX = frozenset("0123456789abcdef")
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """
+    SpanContext (ids and trace-flags) from a W3C ``traceparent`` header.
+
+    Returns:
+        Optional[SpanContext]: None if the header is absent or malformed
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4:
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    if len(version) != 2 or len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+    if not _HEX.issuperset(version + trace_id + span_id + flags) or version == "ff":
+        return None
+    # Version 00 has exactly four fields; later versions may append more
+    if version == "00" and len(parts) != 4:
+        return None
+    context = SpanContext(int(trace_id, 16), int(span_id, 16), int(flags, 16))
+    return context if context.is_valid else None
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id_hex}-{context.span_id_hex}-{context.trace_flags & 0xff:02x}"
+
+
+class TraceContextFilter:
+    """Logging filter adding the current trace_id and span_id to each record."""
+
+    def filter(self, record) -> bool:
+        span = _current_span.get()
+        if span is not None and span.is_recording():
+            record.trace_id = span.context.trace_id_hex
+            record.span_id = span.context.span_id_hex
+        return True
+
+
+def traced(name: Optional[str] = None, tracer_name: str = "auth_service", require_parent: bool = False):
+    """
+    Decorator running a function (sync or async) inside a span.
+
+    Args:
+        name: Span name; defaults to the function's qualified name
+        tracer_name: Tracer (instrumentation scope) to use
+        require_parent: Only record when called within an existing trace,
+            so background polling doesn't start a trace per call
+    """
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+        tracer = tracer_provider.get_tracer(tracer_name)
+
+        def skip() -> bool:
+            return not tracer_provider.enabled or (require_parent and _current_span.get() is None)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if skip():
+                    return await fn(*args, **kwargs)
+                with tracer.start_as_current_span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if skip():
+                return fn(*args, **kwargs)
+            with tracer.start_as_current_span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_methods(tracer_name: str):
+    """
+    Class decorator tracing every public method, named ``Class.method``.
+
+    Used on the CRUD classes so each database operation shows up as a span
+    of the request (or email delivery) it belongs to.
+    """
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or not inspect.isfunction(value):
+                continue
+            setattr(cls, attr, traced(f"{cls.__name__}.{attr}", tracer_name, require_parent=True)(value))
+        return cls
+    return decorator
+
+
+# Global provider, configured from settings
+tracer_provider = _create_provider()
+
+
+def get_tracer(name: str) -> Tracer:
+    return tracer_provider.get_tracer(name)
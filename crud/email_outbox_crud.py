@@ -0,0 +1,171 @@
+"""
+CRUD operations for the EmailOutbox model.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+from models.email_outbox_model import EmailOutbox
+from core.server_timing import timed_db_methods
+from core.tracing import traced_methods
+
+
+@timed_db_methods
+@traced_methods("auth_service.crud")
+class EmailOutboxCRUD:
+    """CRUD operations for EmailOutbox model."""
+    
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add(
+        self,
+        recipient: str,
+        purpose: str,
+        payload: str,
+        expires_at: Optional[datetime] = None
+    ) -> EmailOutbox:
+        """
+        Add a message to the outbox without committing, so it lands in the
+        caller's transaction.
+        """
+        message = EmailOutbox(
+            recipient=recipient,
+            purpose=purpose,
+            payload=payload,
+            status="pending",
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+            expires_at=expires_at
+        )
+        self.db.add(message)
+        return message
+
+    def claim_due(self, limit: int, lease_until: datetime) -> List[EmailOutbox]:
+        """
+        Claim up to ``limit`` due messages for sending.
+        
+        Claimed messages move to "sending" with next_attempt_at set to the
+        lease end, so a worker that dies mid-send hands them back once the
+        lease runs out. SKIP LOCKED lets several workers claim concurrently;
+        the attempts check keeps the claim exclusive on databases without
+        row locks (SQLite), where two workers can select the same rows.
+        """
+        now = datetime.utcnow()
+        candidates = self.db.execute(
+            select(EmailOutbox.id, EmailOutbox.attempts)
+            .where(
+                or_(EmailOutbox.status == "pending", EmailOutbox.status == "sending"),
+                EmailOutbox.next_attempt_at <= now
+            )
+            .order_by(EmailOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        
+        messages = []
+        for message_id, attempts in candidates:
+            message = self.db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == message_id, EmailOutbox.attempts == attempts)
+                .values(status="sending", attempts=attempts + 1, next_attempt_at=lease_until)
+                .returning(EmailOutbox),
+                execution_options={"populate_existing": True}
+            ).scalars().first()
+            if message is not None:
+                messages.append(message)
+        self.db.commit()
+        return messages
+
+    def _update_claimed(self, message_id: int, claimed_attempts: int, **values) -> bool:
+        """
+        Update a message only while it is still the claim that set ``claimed_attempts``.
+        
+        A claim whose lease ran out may have been taken over by another
+        worker (which bumped attempts); the stale claimant's writes then
+        match nothing instead of overwriting the new owner's result.
+        """
+        result = self.db.execute(
+            update(EmailOutbox)
+            .where(
+                EmailOutbox.id == message_id,
+                EmailOutbox.status == "sending",
+                EmailOutbox.attempts == claimed_attempts
+            )
+            .values(**values)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def renew_lease(self, message_id: int, attempts: int, lease_until: datetime) -> bool:
+        """
+        Extend the lease of a claimed message, right before sending it.
+        
+        Returns:
+            bool: False if the claim was lost and the message must not be sent
+        """
+        return self._update_claimed(message_id, attempts, next_attempt_at=lease_until)
+
+    def mark_sent(self, message_id: int, attempts: int) -> bool:
+        """Mark a claimed message delivered and drop its payload."""
+        return self._update_claimed(
+            message_id, attempts, status="sent", payload=None, sent_at=datetime.utcnow(), last_error=None
+        )
+
+    def mark_failed(self, message_id: int, attempts: int, error: str, retry_at: Optional[datetime]) -> bool:
+        """
+        Record a failed attempt of a claimed message.
+        
+        Args:
+            message_id: Outbox message ID
+            attempts: Attempt count of the claim
+            error: Error description
+            retry_at: When to retry, or None to move the message to the dead-letter state
+        
+        Returns:
+            bool: False if the claim was lost and nothing was recorded
+        """
+        if retry_at is None:
+            values = {"status": "dead", "payload": None, "last_error": error}
+        else:
+            values = {"status": "pending", "next_attempt_at": retry_at, "last_error": error}
+        return self._update_claimed(message_id, attempts, **values)
+
+    def defer(self, message_id: int, attempts: int, retry_at: datetime) -> bool:
+        """Put a claimed message back without using up an attempt."""
+        return self._update_claimed(
+            message_id, attempts, status="pending", next_attempt_at=retry_at, attempts=attempts - 1
+        )
+
+    def count_by_status(self, status: str) -> int:
+        """Count messages in a given status."""
+        return self.db.execute(
+            select(func.count()).select_from(EmailOutbox).where(EmailOutbox.status == status)
+        ).scalar()
+
+    def delete_finished_before(self, cutoff: datetime, limit: int) -> int:
+        """
+        Delete up to ``limit`` sent messages delivered before cutoff and dead
+        messages created before it.
+        
+        Bounded so a large backlog is purged in short transactions.
+        
+        Returns:
+            int: Number of messages deleted
+        """
+        finished = (
+            select(EmailOutbox.id)
+            .where(or_(
+                and_(EmailOutbox.status == "sent", EmailOutbox.sent_at < cutoff),
+                and_(EmailOutbox.status == "dead", EmailOutbox.created_at < cutoff)
+            ))
+            .limit(limit)
+            .scalar_subquery()
+        )
+        result = self.db.execute(
+            delete(EmailOutbox).where(EmailOutbox.id.in_(finished)),
+            execution_options={"synchronize_session": False}
+        )
+        self.db.commit()
+        return result.rowcount
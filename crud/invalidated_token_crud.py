@@ -4,10 +4,22 @@ CRUD operations for InvalidatedToken model.
 
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 from models.invalidated_token_model import InvalidatedToken
+from core.server_timing import timed_db_methods
+from core.tracing import traced_methods
 
 
+# Checked on every refresh and logout; built once so only the values are bound per call
+_SELECT_ACTIVE_JTI = select(InvalidatedToken.id).where(
+    InvalidatedToken.jti == bindparam("jti"),
+    InvalidatedToken.expires_at > bindparam("now")
+).limit(1)
+
+
+@timed_db_methods
+@traced_methods("auth_service.crud")
 class InvalidatedTokenCRUD:
     """CRUD operations for InvalidatedToken model."""
     
@@ -34,11 +46,11 @@ class InvalidatedTokenCRUD:
 
     def is_token_invalidated(self, jti: str) -> bool:
         """Check if a token JTI is in the denylist."""
-        invalidated_token = self.db.query(InvalidatedToken).filter(
-            InvalidatedToken.jti == jti,
-            InvalidatedToken.expires_at > datetime.utcnow()  # Only check non-expired denylisted tokens
-        ).first()
-        return invalidated_token is not None
+        # Only check non-expired denylisted tokens
+        invalidated_token_id = self.db.execute(
+            _SELECT_ACTIVE_JTI, {"jti": jti, "now": datetime.utcnow()}
+        ).scalar()
+        return invalidated_token_id is not None
 
     def get_by_jti(self, jti: str) -> Optional[InvalidatedToken]:
         """Get an invalidated token by its JTI."""
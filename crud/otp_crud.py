@@ -1,10 +1,16 @@
+from datetime import datetime
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any
 from models.otp_model import OTP
 from schemas.otp_schema import OTPCreate
 from core.security import hash_password
+from core.server_timing import timed_db_methods
+from core.tracing import traced_methods
 
 
+@timed_db_methods
+@traced_methods("auth_service.crud")
 class OTPCRUD:
     """CRUD operations for OTP model."""
     
@@ -13,28 +19,43 @@ class OTPCRUD:
     
     def create(self, otp_data: Dict[str, Any]) -> OTP:
         """Create a new OTP record."""
-        # Delete existing OTP for the user and purpose for security
-        existing_otp = self.db.query(OTP).filter(
-            OTP.user_id == otp_data["user_id"],
-            OTP.purpose == otp_data["purpose"]
-        ).first()
-        if existing_otp:
-            self.db.delete(existing_otp)
-            self.db.commit()
-        
         # Hash the OTP before storing
         hashed_otp_code = hash_password(otp_data["otp_code"])
         
-        db_otp = OTP(
+        return self.replace(
             user_id=otp_data["user_id"],
             email=otp_data.get("email", ""),  # Store email for backward compatibility
-            otp_code=hashed_otp_code,
+            hashed_otp_code=hashed_otp_code,
             purpose=otp_data["purpose"],
             expires_at=otp_data["expires_at"]
         )
+    
+    def replace(
+        self,
+        user_id: int,
+        email: str,
+        hashed_otp_code: str,
+        purpose: str,
+        expires_at: datetime
+    ) -> OTP:
+        """Store an already-hashed OTP, replacing any existing one for the user and purpose."""
+        # Delete existing OTP for the user and purpose for security, in the
+        # same transaction as the insert
+        self.db.execute(
+            delete(OTP).where(OTP.user_id == user_id, OTP.purpose == purpose),
+            execution_options={"synchronize_session": False}
+        )
+        
+        db_otp = OTP(
+            user_id=user_id,
+            email=email,
+            otp_code=hashed_otp_code,
+            purpose=purpose,
+            expires_at=expires_at
+        )
         self.db.add(db_otp)
+        # INSERT ... RETURNING fills id and created_at, no refresh needed
         self.db.commit()
-        self.db.refresh(db_otp)
         return db_otp
     
     def get_by_user_and_purpose(self, user_id: int, purpose: str) -> Optional[OTP]:
@@ -46,16 +67,28 @@ class OTPCRUD:
     
     def delete_by_user_and_purpose(self, user_id: int, purpose: str) -> bool:
         """Delete OTP by user ID and purpose."""
-        otp = self.get_by_user_and_purpose(user_id, purpose)
-        if otp:
-            self.db.delete(otp)
-            self.db.commit()
-            return True
-        return False
+        result = self.db.execute(
+            delete(OTP).where(OTP.user_id == user_id, OTP.purpose == purpose),
+            execution_options={"synchronize_session": False}
+        )
+        self.db.commit()
+        return result.rowcount > 0
+    
+    def delete_matching(self, user_id: int, purpose: str, hashed_otp_code: str) -> bool:
+        """Delete the OTP only if it still has this hash. True for exactly one concurrent caller."""
+        result = self.db.execute(
+            delete(OTP).where(
+                OTP.user_id == user_id,
+                OTP.purpose == purpose,
+                OTP.otp_code == hashed_otp_code
+            ),
+            execution_options={"synchronize_session": False}
+        )
+        self.db.commit()
+        return result.rowcount == 1
     
     def delete_expired_otps(self) -> int:
         """Delete all expired OTP records."""
-        from datetime import datetime
         count = self.db.query(OTP).filter(OTP.expires_at < datetime.utcnow()).count()
         self.db.query(OTP).filter(OTP.expires_at < datetime.utcnow()).delete()
         self.db.commit()
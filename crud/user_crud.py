@@ -1,10 +1,39 @@
+from sqlalchemy import bindparam, func, or_, select, update
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any
 from models.user_model import User
-from schemas.user_schema import UserCreate
+from schemas.user_schema import UserCreate, CurrentUser
 from core.security import hash_password
+from core.server_timing import timed_db_methods
+from core.tracing import traced_methods
+from services.user_cache import user_cache, negative_email_cache
 
 
+def normalize_email(email: str) -> str:
+    """Canonical form of an email address, matching the lower(email) unique index."""
+    return email.strip().lower()
+
+
+# Hot lookups are built once at import. SQLAlchemy caches their compiled SQL
+# under the statement's cache key, so each call only binds new values.
+_SELECT_BY_ID = select(User).where(User.id == bindparam("user_id"))
+_SELECT_BY_EMAIL = select(User).where(func.lower(User.email) == bindparam("email"))
+_SELECT_BY_GOOGLE_ID = select(User).where(User.google_id == bindparam("google_id"))
+# Google sign-in resolves both candidates in one round trip (BitmapOr over
+# the google_id and lower(email) unique indexes on PostgreSQL)
+_SELECT_BY_GOOGLE_ID_OR_EMAIL = select(User).where(
+    or_(User.google_id == bindparam("google_id"), func.lower(User.email) == bindparam("email"))
+)
+# Columns UserCRUD.update may write
+_UPDATABLE_COLUMNS = frozenset(attr.key for attr in User.__mapper__.column_attrs)
+# Column-only projection for request authentication - no ORM instance is built
+_SELECT_CURRENT_USER_BY_ID = select(
+    User.id, User.email, User.full_name, User.is_active, User.is_verified, User.created_at
+).where(User.id == bindparam("user_id"))
+
+
+@timed_db_methods
+@traced_methods("auth_service.crud")
 class UserCRUD:
     """CRUD operations for User model."""
     
@@ -13,15 +42,65 @@ class UserCRUD:
     
     def get_by_id(self, user_id: int) -> Optional[User]:
         """Get user by ID."""
-        return self.db.query(User).filter(User.id == user_id).first()
+        return self.db.execute(_SELECT_BY_ID, {"user_id": user_id}).scalars().first()
+    
+    def get_current_user(self, user_id: int) -> Optional[CurrentUser]:
+        """
+        Get the fields needed to authenticate a request, without loading the ORM object.
+        
+        Served from the in-process user cache when possible; writes through
+        this class invalidate it.
+        """
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
+        version = user_cache.version
+        row = self.db.execute(_SELECT_CURRENT_USER_BY_ID, {"user_id": user_id}).first()
+        if row is None:
+            return None
+        user = CurrentUser(*row)
+        user_cache.set(user, version)
+        return user
     
     def get_by_email(self, email: str) -> Optional[User]:
-        """Get user by email."""
-        return self.db.query(User).filter(User.email == email).first()
+        """
+        Get user by email (case-insensitive, served by ix_users_email_lower).
+        
+        Emails recently found to have no account are answered from the
+        negative email cache without a query.
+        """
+        email = normalize_email(email)
+        if negative_email_cache.is_known_absent(email):
+            return None
+        
+        version = negative_email_cache.version
+        user = self.db.execute(_SELECT_BY_EMAIL, {"email": email}).scalars().first()
+        if user is None:
+            negative_email_cache.add(email, version)
+        return user
     
     def get_by_google_id(self, google_id: str) -> Optional[User]:
         """Get user by Google ID."""
-        return self.db.query(User).filter(User.google_id == google_id).first()
+        return self.db.execute(
+            _SELECT_BY_GOOGLE_ID, {"google_id": google_id}
+        ).scalars().first()
+    
+    def get_by_google_id_or_email(self, google_id: str, email: str) -> Optional[User]:
+        """
+        Get the user a Google sign-in belongs to, with a single query.
+        
+        The account already linked to the Google ID wins; otherwise the
+        account with the same email (case-insensitive) is returned so the
+        caller can link it.
+        """
+        users = self.db.execute(
+            _SELECT_BY_GOOGLE_ID_OR_EMAIL, {"google_id": google_id, "email": normalize_email(email)}
+        ).scalars().all()
+        for user in users:
+            if user.google_id == google_id:
+                return user
+        return users[0] if users else None
     
     def create(self, user_data: UserCreate) -> User:
         """Create a new user."""
@@ -31,21 +110,23 @@ class UserCRUD:
             hashed_password = hash_password(user_data.password)
         
         db_user = User(
-            email=user_data.email,
+            email=normalize_email(user_data.email),
             full_name=user_data.full_name,
             hashed_password=hashed_password
             # is_verified defaults to False in the model
             # is_active defaults to True in the model
         )
         self.db.add(db_user)
+        # INSERT ... RETURNING fills id and timestamps, no refresh needed
         self.db.commit()
-        self.db.refresh(db_user)
+        user_cache.invalidate(db_user.id)
+        negative_email_cache.discard(db_user.email)
         return db_user
     
     def create_google_user(self, google_id: str, email: str, full_name: str) -> User:
         """Create a new user from Google OAuth."""
         db_user = User(
-            email=email,
+            email=normalize_email(email),
             full_name=full_name,
             google_id=google_id,
             is_verified=True,  # Google users are pre-verified
@@ -53,19 +134,26 @@ class UserCRUD:
             # No hashed_password for OAuth users
         )
         self.db.add(db_user)
+        # INSERT ... RETURNING fills id and timestamps, no refresh needed
         self.db.commit()
-        self.db.refresh(db_user)
+        user_cache.invalidate(db_user.id)
+        negative_email_cache.discard(db_user.email)
         return db_user
     
     def update(self, user_id: int, update_data: Dict[str, Any]) -> Optional[User]:
-        """Update user by ID."""
-        user = self.get_by_id(user_id)
-        if user:
-            for key, value in update_data.items():
-                if hasattr(user, key):
-                    setattr(user, key, value)
-            self.db.commit()
-            self.db.refresh(user)
+        """Update user by ID with a single UPDATE ... RETURNING."""
+        values = {key: value for key, value in update_data.items() if key in _UPDATABLE_COLUMNS}
+        if not values:
+            return self.get_by_id(user_id)
+        
+        user = self.db.execute(
+            update(User).where(User.id == user_id).values(**values).returning(User),
+            execution_options={"populate_existing": True}
+        ).scalars().first()
+        self.db.commit()
+        user_cache.invalidate(user_id)
+        if "email" in values:
+            negative_email_cache.discard(normalize_email(values["email"]))
         return user
     
     def delete(self, user_id: int) -> bool:
@@ -74,6 +162,7 @@ class UserCRUD:
         if user:
             self.db.delete(user)
             self.db.commit()
+            user_cache.invalidate(user_id)
             return True
         return False
 
@@ -0,0 +1,90 @@
+"""
+Index usage and size report from pg_stat_user_indexes.
+
+Flags indexes that duplicate another index on the same table (same key
+columns, expressions and predicate) and non-unique indexes that have never
+been scanned since statistics were last reset.
+
+Usage:
+    python -m database.index_audit
+"""
+
+import os
+import sys
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+INDEX_STATS_QUERY = text("""
+    SELECT
+        s.relname AS table_name,
+        s.indexrelname AS index_name,
+        s.idx_scan AS scans,
+        s.idx_tup_read AS tuples_read,
+        pg_relation_size(s.indexrelid) AS size_bytes,
+        i.indisunique AS is_unique,
+        i.indisprimary AS is_primary,
+        i.indkey::text
+            || coalesce(pg_get_expr(i.indexprs, i.indrelid), '')
+            || coalesce(pg_get_expr(i.indpred, i.indrelid), '') AS signature,
+        pg_get_indexdef(s.indexrelid) AS definition
+    FROM pg_stat_user_indexes s
+    JOIN pg_index i ON i.indexrelid = s.indexrelid
+    WHERE s.schemaname = current_schema()
+    ORDER BY s.relname, s.indexrelname
+""")
+
+
+def get_index_stats(engine: Engine) -> List[Dict[str, Any]]:
+    """
+    Collect usage and size for every index in the current schema.
+    
+    Args:
+        engine: Engine connected to the PostgreSQL database
+        
+    Returns:
+        List of dicts, one per index, with ``duplicate_of`` and ``unused`` flags
+    """
+    with engine.connect() as conn:
+        rows = [dict(row._mapping) for row in conn.execute(INDEX_STATS_QUERY)]
+    
+    # Prefer keeping primary keys and unique indexes when reporting duplicates
+    first_by_signature: Dict[tuple, str] = {}
+    for row in sorted(rows, key=lambda r: (not r["is_primary"], not r["is_unique"], r["index_name"])):
+        key = (row["table_name"], row["signature"])
+        row["duplicate_of"] = first_by_signature.get(key)
+        first_by_signature.setdefault(key, row["index_name"])
+        row["unused"] = row["scans"] == 0 and not row["is_unique"]
+    
+    return rows
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    """Render index stats as a plain-text table."""
+    lines = [f"{'table':<20} {'index':<32} {'scans':>10} {'size':>10}  notes"]
+    for row in rows:
+        notes = []
+        if row["is_primary"]:
+            notes.append("primary key")
+        elif row["is_unique"]:
+            notes.append("unique")
+        if row["duplicate_of"]:
+            notes.append(f"DUPLICATE of {row['duplicate_of']}")
+        if row["unused"]:
+            notes.append("UNUSED")
+        lines.append(
+            f"{row['table_name']:<20} {row['index_name']:<32} {row['scans']:>10} "
+            f"{row['size_bytes'] / 1024:>8.0f}kB  {', '.join(notes)}"
+        )
+    
+    total = sum(row["size_bytes"] for row in rows)
+    wasted = sum(row["size_bytes"] for row in rows if row["duplicate_of"])
+    lines.append(f"\nTotal index size: {total / 1024:.0f}kB, duplicates: {wasted / 1024:.0f}kB")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from database.session import engine
+    print(format_report(get_index_stats(engine)))
@@ -0,0 +1,67 @@
+"""
+Switch the otps table between LOGGED and UNLOGGED to match OTP_TABLE_UNLOGGED.
+
+This is an operational step, not a migration: whether OTPs survive a
+PostgreSQL crash is a per-deployment choice, and a migration would bake in
+whatever the environment that ran ``alembic upgrade`` had configured. Run it
+after changing the setting, in either direction. ``ALTER TABLE ... SET
+[UN]LOGGED`` rewrites the table under an ACCESS EXCLUSIVE lock; otps is
+small, but run it outside peak traffic.
+
+Usage:
+    python -m database.otp_table_logging            # apply OTP_TABLE_UNLOGGED
+    python -m database.otp_table_logging --check    # report only
+"""
+
+import argparse
+import os
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+PERSISTENCE_QUERY = text("SELECT relpersistence FROM pg_class WHERE oid = 'otps'::regclass")
+
+
+def is_unlogged(engine: Engine) -> bool:
+    """Whether the otps table is currently UNLOGGED."""
+    with engine.connect() as conn:
+        return conn.execute(PERSISTENCE_QUERY).scalar_one() == "u"
+
+
+def apply(engine: Engine, unlogged: bool) -> bool:
+    """
+    Make the otps table UNLOGGED or LOGGED.
+
+    Args:
+        engine: Engine connected to the PostgreSQL database
+        unlogged: Target persistence
+
+    Returns:
+        bool: True if the table was altered, False if it already matched
+    """
+    if is_unlogged(engine) == unlogged:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE otps SET {'UNLOGGED' if unlogged else 'LOGGED'}"))
+    return True
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core.config import settings
+    from database.session import engine
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--check", action="store_true", help="report the current state without changing it")
+    args = parser.parse_args()
+
+    current = "UNLOGGED" if is_unlogged(engine) else "LOGGED"
+    wanted = "UNLOGGED" if settings.OTP_TABLE_UNLOGGED else "LOGGED"
+    if args.check:
+        print(f"otps is {current}; OTP_TABLE_UNLOGGED wants {wanted}")
+        sys.exit(0 if current == wanted else 1)
+    if apply(engine, settings.OTP_TABLE_UNLOGGED):
+        print(f"otps changed from {current} to {wanted}")
+    else:
+        print(f"otps is already {current}")
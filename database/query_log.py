@@ -0,0 +1,139 @@
+"""
+Slow-query logging and per-request query counting.
+
+Listeners on every Engine time each statement at the cursor. Statements
+slower than DB_SLOW_QUERY_MS are logged with their bound parameters
+replaced by type names, so emails, OTP hashes and tokens never reach the
+logs. QueryBudgetMiddleware puts a RequestQueries in a context variable for
+the duration of a request and every statement executed on its behalf is
+counted there; background work (the outbox worker, cache listeners) runs
+outside a request and isn't counted.
+"""
+
+import contextvars
+import logging
+from time import perf_counter
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.config import settings
+
+logger = logging.getLogger("auth_service.sql")
+
+# Statements kept per request for budget reports; the count keeps going past it
+MAX_RECORDED_STATEMENTS = 50
+
+
+class RequestQueries:
+    """Statements executed during one request."""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: List[str] = []
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements.append(statement)
+
+
+# Called with (method, route, queries) when a request finishes
+RequestObserver = Callable[[str, str, RequestQueries], None]
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_queries", default=None)
+_observers: List[RequestObserver] = []
+
+
+def start_request() -> Tuple[RequestQueries, contextvars.Token]:
+    """Begin counting for the current request; pass the token to end_request."""
+    queries = RequestQueries()
+    return queries, _current.set(queries)
+
+
+def end_request(token: contextvars.Token):
+    _current.reset(token)
+
+
+def current_queries() -> Optional[RequestQueries]:
+    return _current.get()
+
+
+def add_request_observer(observer: RequestObserver):
+    """Receive every finished request's query count (used by the test query budget)."""
+    _observers.append(observer)
+
+
+def remove_request_observer(observer: RequestObserver):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def notify_request_finished(method: str, route: str, queries: RequestQueries):
+    for observer in list(_observers):
+        observer(method, route, queries)
+
+
+def _redact_value(value: Any) -> str:
+    return "NULL" if value is None else type(value).__name__
+
+
+def redact_parameters(parameters: Any, executemany: bool = False) -> Any:
+    """
+    Parameter shape with every value replaced by its type name.
+
+    Args:
+        parameters: DBAPI parameters as passed to the cursor (mapping or sequence)
+        executemany: Whether ``parameters`` is a list of parameter sets
+
+    Returns:
+        Any: Same structure with the values redacted; for executemany, the
+            first set and how many there were
+    """
+    if executemany:
+        batch = list(parameters or ())
+        return {"rows": len(batch), "first": redact_parameters(batch[0]) if batch else None}
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_log_start = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_log_start", None)
+    if start is None:
+        return
+    elapsed = perf_counter() - start
+
+    queries = _current.get()
+    if queries is not None:
+        queries.add(statement, elapsed)
+
+    threshold = settings.DB_SLOW_QUERY_MS
+    if threshold is not None and elapsed * 1000 >= threshold:
+        logger.warning(
+            "Slow query (%.1f ms): %s", elapsed * 1000, statement,
+            extra={
+                "duration_ms": round(elapsed * 1000, 3),
+                "parameters": redact_parameters(parameters, executemany),
+                "request_query_index": queries.count if queries is not None else None,
+            }
+        )
+
+
+def install():
+    """Attach the listeners to every Engine (including test engines). Idempotent."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
@@ -1,17 +1,43 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from core.config import settings
+from database import query_log
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _driver_connect_args(database_url: str) -> dict:
+    """Driver-specific connection arguments."""
+    driver = make_url(database_url).get_dialect().driver
+    if driver == "psycopg":
+        # psycopg 3 prepares a statement server-side once it has run this many
+        # times on a connection, so hot lookups skip parsing and planning
+        return {"prepare_threshold": settings.DB_PREPARE_THRESHOLD}
+    # psycopg2 and sqlite have no server-side prepared statements
+    return {}
+
+
+# Slow-query log and per-request counts, on this and any other engine
+query_log.install()
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=_driver_connect_args(SQLALCHEMY_DATABASE_URL)
+)
+# Objects stay loaded after commit: server defaults come back through
+# RETURNING (eager_defaults), so a post-commit refresh would be a wasted SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
+    # Async so FastAPI doesn't hop to the threadpool to enter and exit it;
+    # the routes already use the session from the event loop. A Session only
+    # checks out a pooled connection on its first query, so requests rejected
+    # before that never touch the pool.
     db = SessionLocal()
     try:
         yield db
@@ -1,17 +1,58 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from core.config import settings
+from core.logging_config import configure_logging
+
+# Before the rest of the app is imported, so nothing logs to an unconfigured root
+configure_logging()
+
 from routers.auth_router import router as auth_router
+from routers.metrics_router import router as metrics_router
+from services.user_cache import start_invalidation_listener, stop_invalidation_listener
+from services.email_outbox import email_outbox
+from services.email_service import email_service
+from services.http_client import google_http
+from services.google_id_token import google_jwks
+from services.security_service import oauth_state_manager
 from middleware.security_middleware import (
     SecurityHeadersMiddleware,
     RequestLoggingMiddleware,
     RateLimitMiddleware
 )
+from middleware.metrics_middleware import MetricsMiddleware
+from middleware.tracing_middleware import TracingMiddleware
+from middleware.server_timing_middleware import ServerTimingMiddleware
+from middleware.query_budget_middleware import QueryBudgetMiddleware
+from core.tracing import tracer_provider
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Apply user cache invalidations published by other workers
+    start_invalidation_listener()
+    # Deliver queued OTP emails in the background
+    email_outbox.start()
+    # Pooled client for Google OAuth calls
+    google_http.start()
+    # Keep Google's ID-token signing keys warm
+    google_jwks.start()
+    # Fail fast if consumed OAuth states can't be shared between workers
+    oauth_state_manager.start()
+    yield
+    await google_jwks.stop()
+    await google_http.close()
+    await email_outbox.stop()
+    await email_service.close()
+    stop_invalidation_listener()
+    tracer_provider.shutdown()
+
 
 app = FastAPI(
     title="Auth Service",
     description="Authentication service for the EdTech platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add security middleware (order matters - first added is executed last)
@@ -29,8 +70,22 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Counts every statement issued on behalf of a request, including in the app middleware
+app.add_middleware(QueryBudgetMiddleware)
+# Outside the app middleware, so latency covers the whole stack and rate-limited requests are counted
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# Outside the app middleware, so "middleware" in the breakdown covers all of it
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+# Outside everything else, so the request span includes all middleware time
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(auth_router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -0,0 +1,60 @@
+"""
+Request metrics middleware.
+
+Plain ASGI rather than BaseHTTPMiddleware: it only watches the response
+start message, so it adds no task or body streaming overhead to requests.
+"""
+
+from time import perf_counter
+from typing import Dict, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import http_request_duration, http_requests
+
+# Requests that never reached a route (404s, rejected by the rate limiter)
+UNMATCHED_ROUTE = "unmatched"
+# Anything else is counted as "other" so clients can't mint label sets
+_KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+class MetricsMiddleware:
+    """Records latency and status counts per route template (e.g. /auth/me)."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Bound children per label set, so a request costs two dict lookups
+        self._durations: Dict[Tuple[str, str], object] = {}
+        self._statuses: Dict[Tuple[str, str, int], object] = {}
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route on the shared scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"] if scope["method"] in _KNOWN_METHODS else "other"
+            
+            duration = self._durations.get((method, path))
+            if duration is None:
+                duration = self._durations[(method, path)] = http_request_duration.labels(method, path)
+            duration.observe(perf_counter() - start)
+            
+            counter = self._statuses.get((method, path, status_code))
+            if counter is None:
+                counter = self._statuses[(method, path, status_code)] = http_requests.labels(method, path, str(status_code))
+            counter.inc()
@@ -0,0 +1,57 @@
+"""
+Per-request SQL statement counting.
+
+Counts the statements each request issues (see database.query_log),
+records the distribution per route template and warns when a request
+goes over DB_QUERY_BUDGET_PER_REQUEST, so an N+1 or an extra round trip
+shows up in monitoring instead of only as latency.
+"""
+
+import logging
+from typing import Dict, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import settings
+from core.metrics import db_queries_per_request
+from database.query_log import end_request, notify_request_finished, start_request
+from middleware.metrics_middleware import UNMATCHED_ROUTE
+
+logger = logging.getLogger("auth_service.sql")
+
+
+class QueryBudgetMiddleware:
+    """Counts SQL statements per request and reports them per route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Bound histogram children per (method, route)
+        self._histograms: Dict[Tuple[str, str], object] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries, token = start_request()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end_request(token)
+            # The router stores the matched route on the shared scope
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+
+            if settings.METRICS_ENABLED and route != UNMATCHED_ROUTE:
+                histogram = self._histograms.get((method, route))
+                if histogram is None:
+                    histogram = self._histograms[(method, route)] = db_queries_per_request.labels(method, route)
+                histogram.observe(queries.count)
+
+            budget = settings.DB_QUERY_BUDGET_PER_REQUEST
+            if budget is not None and queries.count > budget:
+                logger.warning(
+                    "%s %s issued %d SQL statements (budget %d)", method, route, queries.count, budget,
+                    extra={"query_count": queries.count, "query_ms": round(queries.seconds * 1000, 3)}
+                )
+            notify_request_finished(method, route, queries)
@@ -8,14 +8,14 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from typing import Callable
 import time
 import logging
-from core.config import settings
+from core.metrics import rate_limit_rejections
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Handlers are set up by core.logging_config.configure_logging()
 logger = logging.getLogger("auth_service.security")
+# Per-request access log; INFO records here are sampled (LOG_ACCESS_SAMPLE_RATE)
+access_logger = logging.getLogger("auth_service.access")
+
+_GLOBAL_RATE_LIMIT_REJECTIONS = rate_limit_rejections.labels("global_ip")
 
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -42,36 +42,55 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """Middleware to log requests for security monitoring."""
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
-        
-        # Extract request details
-        client_ip = request.client.host if request.client else "unknown"
-        user_agent = request.headers.get("user-agent", "unknown")
+        start_time = time.perf_counter()
         method = request.method
-        url = str(request.url)
         
-        # Log request details with proper logging levels
-        if method in ["POST", "PUT", "DELETE"]:
-            logger.info(f"Request: {method} {url} from {client_ip} - UA: {user_agent[:100]}")
-        else:
-            logger.debug(f"Request: {method} {url} from {client_ip}")
+        # Request lines are DEBUG; only build their fields when DEBUG is on
+        if access_logger.isEnabledFor(logging.DEBUG):
+            access_logger.debug(
+                "Request: %s %s",
+                method,
+                request.url.path,
+                extra={
+                    "method": method,
+                    "path": request.url.path,
+                    "client_ip": request.client.host if request.client else "unknown",
+                    "user_agent": request.headers.get("user-agent", "unknown")[:100],
+                }
+            )
         
         response = await call_next(request)
         
-        process_time = time.time() - start_time
-        
-        # Log response details with appropriate levels
+        process_time = time.perf_counter() - start_time
         status_code = response.status_code
+        
+        # Failures always go out; successes at INFO are subject to sampling
         if status_code >= 400:
-            logger.warning(f"Response: {status_code} for {method} {url} - Time: {process_time:.3f}s - IP: {client_ip}")
-        elif status_code >= 300:
-            logger.info(f"Response: {status_code} for {method} {url} - Time: {process_time:.3f}s")
+            level = logging.WARNING
+        elif status_code >= 300 or method in ("POST", "PUT", "DELETE"):
+            level = logging.INFO
         else:
-            logger.debug(f"Response: {status_code} - Time: {process_time:.3f}s")
-        
-        # Log slow requests
+            level = logging.DEBUG
         if process_time > 2.0:  # Requests taking more than 2 seconds
-            logger.warning(f"Slow request detected: {method} {url} took {process_time:.3f}s")
+            level = logging.WARNING
+        
+        if access_logger.isEnabledFor(level):
+            access_logger.log(
+                level,
+                "Response: %s for %s %s - Time: %.3fs",
+                status_code,
+                method,
+                request.url.path,
+                process_time,
+                extra={
+                    "method": method,
+                    "path": request.url.path,
+                    "status": status_code,
+                    "duration_ms": round(process_time * 1000, 2),
+                    "client_ip": request.client.host if request.client else "unknown",
+                    "slow": process_time > 2.0,
+                }
+            )
         
         return response
 
@@ -83,7 +102,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         self.calls_per_minute = calls_per_minute
         self.requests = {}  # {ip: [timestamp1, timestamp2, ...]}
-        logger.info(f"RateLimitMiddleware initialized with {calls_per_minute} calls per minute")
+        logger.info("RateLimitMiddleware initialized with %d calls per minute", calls_per_minute)
     
     def _cleanup_old_requests(self, ip: str):
         """Remove requests older than 1 minute."""
@@ -98,7 +117,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             ]
             new_count = len(self.requests[ip])
             if old_count != new_count:
-                logger.debug(f"Cleaned up {old_count - new_count} old requests for IP {ip}")
+                logger.debug("Cleaned up %d old requests for IP %s", old_count - new_count, ip)
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         client_ip = request.client.host if request.client else "127.0.0.1"
@@ -110,11 +129,15 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         # Count current requests in the last minute
         current_requests = len(self.requests.get(client_ip, []))
         
-        logger.debug(f"IP {client_ip}: {current_requests}/{self.calls_per_minute} requests in last minute")
+        logger.debug("IP %s: %d/%d requests in last minute", client_ip, current_requests, self.calls_per_minute)
         
         # Check if rate limit exceeded
         if current_requests >= self.calls_per_minute:
-            logger.warning(f"Rate limit exceeded for IP {client_ip}: {current_requests} requests in last minute (limit: {self.calls_per_minute})")
+            _GLOBAL_RATE_LIMIT_REJECTIONS.inc()
+            logger.warning(
+                "Rate limit exceeded for IP %s: %d requests in last minute (limit: %d)",
+                client_ip, current_requests, self.calls_per_minute
+            )
             # Return 429 response directly instead of raising exception
             from fastapi.responses import JSONResponse
             return JSONResponse(
@@ -131,6 +154,6 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         
         self.requests[client_ip].append(current_time)
         
-        logger.debug(f"Request recorded for IP {client_ip}. Total: {len(self.requests[client_ip])}")
+        logger.debug("Request recorded for IP %s. Total: %d", client_ip, len(self.requests[client_ip]))
         
         return await call_next(request)
@@ -0,0 +1,73 @@
+"""
+Server-Timing response header.
+
+    Server-Timing: db;dur=1.9, hash;dur=371.4, jwt;dur=0.3, middleware;dur=1.2, total;dur=375.0
+
+Browser devtools show the breakdown next to the request, and probes can
+read it from the response, without access to server logs.
+
+The header is only added for clients in SERVER_TIMING_ALLOWED_NETWORKS.
+The breakdown tells an outsider what the server did, not just how long it
+took: /auth/login only reports ``hash`` when the email belongs to an
+account, which would let anyone enumerate users. Other clients get no
+header and their requests aren't timed.
+"""
+
+from time import perf_counter
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.server_timing import DB, EMAIL, HANDLER, HASH, JWT, end_request, start_request
+from services.security_service import security_utils
+
+_CATEGORIES = (DB, HASH, JWT, EMAIL)
+
+
+class ServerTimingMiddleware:
+    """Times each request and reports the per-category breakdown in Server-Timing."""
+    
+    def __init__(self, app: ASGIApp, allowed_networks: Optional[str] = None):
+        """
+        Args:
+            app: The wrapped application
+            allowed_networks: Comma-separated client networks that receive
+                the header; defaults to SERVER_TIMING_ALLOWED_NETWORKS
+        """
+        self.app = app
+        if allowed_networks is None:
+            allowed_networks = settings.SERVER_TIMING_ALLOWED_NETWORKS
+        self.allowed_networks = security_utils.parse_networks(allowed_networks)
+    
+    def _is_allowed(self, scope: Scope) -> bool:
+        client = scope.get("client")
+        return security_utils.is_client_in_networks(client[0] if client else None, self.allowed_networks)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._is_allowed(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        start = perf_counter()
+        timings, token = start_request()
+        
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                total = perf_counter() - start
+                durations = timings.durations
+                metrics = [
+                    f"{name};dur={durations[name] * 1000:.1f}" for name in _CATEGORIES if name in durations
+                ]
+                if HANDLER in durations:
+                    metrics.append(f"middleware;dur={(total - durations[HANDLER]) * 1000:.1f}")
+                metrics.append(f"total;dur={total * 1000:.1f}")
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", ", ".join(metrics).encode("latin-1"))
+                ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
@@ -0,0 +1,90 @@
+"""
+Request tracing: a server span per request and a child span per route handler.
+
+The route class also times the handler for the Server-Timing header, which
+reports the rest of the request as middleware time.
+
+The request span covers the whole middleware stack; the handler span covers
+dependency resolution and the endpoint. The gap between the two is time
+spent in middleware. Spans opened further down (CRUD, hashing, JWT, email,
+Google calls) nest under the handler span through the current-span context.
+"""
+
+from time import perf_counter
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.server_timing import HANDLER, current_timings
+from core.tracing import StatusCode, get_tracer, parse_traceparent, tracer_provider
+
+_tracer = get_tracer("auth_service.http")
+
+
+class TracingMiddleware:
+    """Opens the request span, continuing an incoming W3C traceparent and its sampling decision."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not tracer_provider.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+        
+        method = scope["method"]
+        with _tracer.start_as_current_span(
+            f"{method} request",
+            attributes={"http.method": method, "http.target": scope["path"]},
+            parent=parent
+        ) as span:
+            trace_id = span.get_span_context().trace_id_hex.encode("ascii") if span.is_recording() else None
+            
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    span.set_attribute("http.status_code", status_code)
+                    if status_code >= 500:
+                        span.set_status(StatusCode.ERROR)
+                    if trace_id is not None:
+                        # Lets a slow response be looked up in the exported spans
+                        message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace_id)]
+                await send(message)
+            
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.update_name(f"{method} {route.path}")
+                    span.set_attribute("http.route", route.path)
+
+
+class TracedRoute(APIRoute):
+    """APIRoute whose handler (dependencies and endpoint) runs in its own span and is timed."""
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        span_name = f"handler {self.path}"
+        
+        async def traced_handler(request: Request) -> Response:
+            timings = current_timings()
+            start = perf_counter()
+            try:
+                if not tracer_provider.enabled:
+                    return await handler(request)
+                with _tracer.start_as_current_span(span_name, attributes={"code.function": self.endpoint.__name__}):
+                    return await handler(request)
+            finally:
+                if timings is not None:
+                    timings.add(HANDLER, perf_counter() - start)
+        
+        return traced_handler
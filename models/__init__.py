@@ -1,5 +1,6 @@
 from .user_model import User
 from .otp_model import OTP
 from .invalidated_token_model import InvalidatedToken
+from .email_outbox_model import EmailOutbox
 
-__all__ = ["User", "OTP", "InvalidatedToken"]
\ No newline at end of file
+__all__ = ["User", "OTP", "InvalidatedToken", "EmailOutbox"]
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+Model for the transactional email outbox.
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime
+from database.session import Base
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    recipient = Column(String, nullable=False)
+    purpose = Column(String, nullable=False)  # verification, login, password_reset
+    payload = Column(Text, nullable=True)  # Encrypted message data (OTP code, name); cleared once sent
+    status = Column(String(16), nullable=False, default="pending")  # pending, sending, sent, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Also the lease end while sending
+    expires_at = Column(DateTime, nullable=True)  # No point delivering an OTP after it expires
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_email_outbox_due', 'status', 'next_attempt_at'),  # Workers claiming due messages
+    )
@@ -6,8 +6,8 @@ from database.session import Base
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)  # Stored lower-cased; unique case-insensitively
     hashed_password = Column(String, nullable=True)  # Nullable for OAuth users
     google_id = Column(String, unique=True, index=True, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
@@ -16,9 +16,11 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
-    # Additional indexes for performance
+    # Fetch server defaults (id, created_at, updated_at) with RETURNING on INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
+    # google_id is already indexed by its unique index
     __table_args__ = (
-        Index('idx_user_email', 'email'),
-        Index('idx_user_google_id', 'google_id'),
+        Index('ix_users_email_lower', func.lower(email), unique=True),  # Serves get_by_email
         Index('idx_user_active_verified', 'is_active', 'is_verified'),
     )
@@ -3,38 +3,49 @@ Authentication router for OTP-based user authentication.
 Handles user registration, OTP generation, verification, and login flows.
 """
 
+import asyncio
+import logging
+import math
 import secrets
 import httpx
-import json
-import base64
 from datetime import timedelta, datetime
 from typing import Optional, Dict
 from urllib.parse import urlencode
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
+from jose import JWTError
 
 from database.session import get_db
-from schemas.user_schema import UserCreate, UserResponse, UserLogin
+from schemas.user_schema import UserCreate, UserResponse, UserLogin, CurrentUser
 from schemas.otp_schema import OTPRequest, OTPVerify, OTPResponse
 from schemas.token_schema import TokenResponse, RefreshTokenRequest, AccessTokenResponse, LogoutRequest, LogoutResponse
 from crud.user_crud import UserCRUD
-from crud.otp_crud import OTPCRUD
 from crud.invalidated_token_crud import InvalidatedTokenCRUD
 from services.otp_service import OTPService
-from services.email_service import EmailService
+from services.email_service import email_service
+from services.email_outbox import email_outbox
+from services.email_templates import email_templates
 from services.rate_limit_service import rate_limit_service
+from services.send_shaper import TemporarySendFailure
+from services.single_flight import otp_request_flight
+from services.http_client import google_http
+from services.google_id_token import google_id_token_verifier, IDTokenError, JWKSUnavailable
 from services.security_service import oauth_state_manager, security_utils
-from core.security import create_access_token, create_refresh_token, verify_password
+from core.security import create_access_token, create_refresh_token, decode_token, verify_password
 from core.config import settings
+from core.tracing import get_tracer
+from middleware.tracing_middleware import TracedRoute
 from .dependencies import get_current_user as get_current_user_dependency
 
-router = APIRouter(prefix="/auth", tags=["authentication"])
+router = APIRouter(prefix="/auth", tags=["authentication"], route_class=TracedRoute)
+
+logger = logging.getLogger("auth_service.auth")
+logout_logger = logging.getLogger("auth_service.logout")
+_tracer = get_tracer("auth_service.auth")
 
 # Initialize services
 otp_service = OTPService()
-email_service = EmailService()
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -127,31 +138,14 @@ async def google_login_redirect(request: Request):
     return RedirectResponse(url=authorization_url)
 
 
-@router.post("/request-otp", response_model=OTPResponse)
-async def request_otp(
+async def _issue_otp(
     otp_request: OTPRequest,
+    sanitized_email: str,
     request: Request,
-    db: Session = Depends(get_db)
-):
-    """
-    Request an OTP for email verification or login.
-    
-    - **email**: User's email address
-    - **purpose**: Purpose of OTP (verification, login, password_reset)
-    
-    Returns OTP request confirmation.
-    """
+    db: Session
+) -> OTPResponse:
+    """Rate-limit, generate, store and deliver an OTP for request_otp."""
     user_crud = UserCRUD(db)
-    otp_crud = OTPCRUD(db)
-    
-    # Sanitize email
-    try:
-        sanitized_email = security_utils.sanitize_email(otp_request.email)
-    except HTTPException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid email format"
-        )
     
     # Check rate limiting for OTP requests
     is_allowed, reset_time = rate_limit_service.is_otp_request_allowed(sanitized_email)
@@ -188,25 +182,49 @@ async def request_otp(
     try:
         # Generate OTP
         otp_code = otp_service.generate_otp()
+        locale = email_templates.negotiate_locale(request.headers.get("accept-language"))
         
-        # Store OTP in database
-        otp_data = {
-            "user_id": user.id,
-            "email": user.email,  # Add email for compatibility
-            "otp_code": otp_code,
-            "purpose": otp_request.purpose,
-            "expires_at": otp_service.get_expiry_time()
-        }
+        def store_otp():
+            if email_outbox.enabled:
+                # Queue the email first so the database OTP store commits both
+                # rows together; the sender workers deliver it after the commit
+                email_outbox.enqueue_otp_email(
+                    db=db,
+                    email=user.email,
+                    otp_code=otp_code,
+                    user_name=user.full_name,
+                    purpose=otp_request.purpose,
+                    locale=locale
+                )
+            
+            # Store OTP in the configured OTP store
+            otp_service.store_otp(
+                db=db,
+                user_id=user.id,
+                email=user.email,
+                otp_code=otp_code,
+                purpose=otp_request.purpose
+            )
+            
+            if email_outbox.enabled:
+                # Other OTP stores don't touch the session, so commit the outbox row here
+                db.commit()
         
-        otp_record = otp_crud.create(otp_data)
+        # Hashing and the writes run off the event loop, which also lets
+        # duplicate requests arriving meanwhile join this one
+        await asyncio.to_thread(store_otp)
         
-        # Send OTP via email
-        await email_service.send_otp_email(
-            email=user.email,
-            otp_code=otp_code,
-            user_name=user.full_name,
-            purpose=otp_request.purpose
-        )
+        if email_outbox.enabled:
+            email_outbox.notify()
+        else:
+            # Send OTP via email
+            await email_service.send_otp_email(
+                email=user.email,
+                otp_code=otp_code,
+                user_name=user.full_name,
+                purpose=otp_request.purpose,
+                locale=locale
+            )
         
         return OTPResponse(
             message="OTP sent successfully",
@@ -214,12 +232,18 @@ async def request_otp(
             expires_in_minutes=settings.OTP_EXPIRY_MINUTES
         )
         
-    except Exception as e:
-        # Log the actual error for debugging
-        import logging
-        logging.error(f"OTP request failed: {str(e)}")
-        import traceback
-        logging.error(f"Traceback: {traceback.format_exc()}")
+    except TemporarySendFailure as e:
+        # Inline delivery only: the relay or the recipient's domain asked us
+        # to slow down. A retry stores a new OTP, replacing this one.
+        logger.warning("OTP email to %s not sent, retry in %.0fs: %s", user.email, e.retry_after, e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="OTP email could not be sent right now. Please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except Exception:
+        # Log the actual error (with traceback) for debugging
+        logger.exception("OTP request failed")
         
         # Don't leak internal error details
         raise HTTPException(
@@ -228,6 +252,37 @@ async def request_otp(
         )
 
 
+@router.post("/request-otp", response_model=OTPResponse)
+async def request_otp(
+    otp_request: OTPRequest,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Request an OTP for email verification or login.
+    
+    - **email**: User's email address
+    - **purpose**: Purpose of OTP (verification, login, password_reset)
+    
+    Returns OTP request confirmation.
+    """
+    # Sanitize email
+    try:
+        sanitized_email = security_utils.sanitize_email(otp_request.email)
+    except HTTPException:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid email format"
+        )
+    
+    # Concurrent duplicates (double clicks, client retries) share one
+    # generation and one send instead of each replacing the previous code
+    return await otp_request_flight.do(
+        (sanitized_email, otp_request.purpose.value),
+        lambda: _issue_otp(otp_request, sanitized_email, request, db)
+    )
+
+
 @router.post("/verify-otp", response_model=TokenResponse)
 async def verify_otp(
     otp_verify: OTPVerify,
@@ -244,7 +299,6 @@ async def verify_otp(
     Returns access token upon successful verification.
     """
     user_crud = UserCRUD(db)
-    otp_crud = OTPCRUD(db)
     
     # Sanitize inputs
     try:
@@ -427,23 +481,14 @@ async def resend_otp(
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user_dependency)
+    current_user: CurrentUser = Depends(get_current_user_dependency)
 ):
     """
     Get current authenticated user information.
     Requires valid access token in Authorization header.
     """
-    user_crud = UserCRUD(db)
-    user = user_crud.get_by_id(current_user["user_id"])
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    return UserResponse.model_validate(user)
+    # The dependency already loaded (and validated) the user for this request
+    return UserResponse.model_validate(current_user)
 
 
 @router.post("/refresh-token", response_model=AccessTokenResponse)
@@ -466,11 +511,7 @@ async def refresh_access_token(
     
     try:
         # Decode the refresh token
-        payload = jwt.decode(
-            token_request.refresh_token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_token(token_request.refresh_token)
         user_id: str = payload.get("sub")
         jti: str = payload.get("jti")
         if user_id is None or jti is None:
@@ -487,9 +528,9 @@ async def refresh_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Fetch user from database
+    # Fetch the user's status columns from the database
     user_crud = UserCRUD(db)
-    user = user_crud.get_by_id(int(user_id))
+    user = user_crud.get_current_user(int(user_id))
     
     if not user or not user.is_active:
         raise HTTPException(
@@ -522,11 +563,8 @@ async def logout(
     
     Returns a success message upon successful logout.
     """
-    import logging
-    logger = logging.getLogger("auth_service.logout")
-    
     try:
-        logger.info("Starting logout process")
+        logout_logger.debug("Starting logout process")
         
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -535,75 +573,64 @@ async def logout(
         )
         
         try:
-            logger.info("Decoding refresh token")
+            logout_logger.debug("Decoding refresh token")
             # Decode the refresh token to extract JTI and other claims
-            payload = jwt.decode(
-                logout_request.refresh_token,
-                settings.SECRET_KEY,
-                algorithms=[settings.ALGORITHM]
-            )
+            payload = decode_token(logout_request.refresh_token)
             user_id: str = payload.get("sub")
             jti: str = payload.get("jti")
             exp: int = payload.get("exp")
             
-            logger.info(f"Token decoded successfully - user_id: {user_id}, jti: {jti}")
+            logout_logger.debug("Token decoded successfully - user_id: %s, jti: %s", user_id, jti)
             
             if user_id is None or jti is None or exp is None:
-                logger.error("Missing required token claims")
+                logout_logger.warning("Missing required token claims")
                 raise credentials_exception
         except JWTError as jwt_err:
-            logger.error(f"JWT decoding error: {jwt_err}")
+            logout_logger.warning("JWT decoding error: %s", jwt_err)
             raise credentials_exception
         
         # Convert exp timestamp to datetime
         expires_at = datetime.fromtimestamp(exp)
-        logger.info(f"Token expires at: {expires_at}")
+        logout_logger.debug("Token expires at: %s", expires_at)
         
         # Check if token is already invalidated
-        logger.info("Checking if token is already invalidated")
+        logout_logger.debug("Checking if token is already invalidated")
         invalidated_token_crud = InvalidatedTokenCRUD(db)
         if invalidated_token_crud.is_token_invalidated(jti):
-            logger.info("Token already invalidated, returning success")
+            logout_logger.info("Token already invalidated, returning success", extra={"user_id": user_id})
             # Token already invalidated, but still return success for idempotency
-            response = LogoutResponse(message="Logout successful")
-            logger.info(f"Created response: {response}")
-            return response
+            return LogoutResponse(message="Logout successful")
         
         # Add token to denylist
-        logger.info("Adding token to denylist")
+        logout_logger.debug("Adding token to denylist")
         try:
             invalidated_token_crud.create_invalidated_token(
                 jti=jti,
                 user_id=int(user_id),
                 expires_at=expires_at
             )
-            logger.info("Token successfully added to denylist")
+            logout_logger.debug("Token successfully added to denylist")
         except Exception as e:
-            logger.error(f"Error adding token to denylist: {e}")
+            logout_logger.error("Error adding token to denylist: %s", e)
             # Handle potential duplicate JTI errors gracefully
             if "unique constraint" in str(e).lower() or "duplicate" in str(e).lower():
-                logger.info("Duplicate JTI error, token already invalidated by another request")
+                logout_logger.info("Duplicate JTI error, token already invalidated by another request")
                 # Token was already invalidated by another request
-                response = LogoutResponse(message="Logout successful")
-                logger.info(f"Created response: {response}")
-                return response
+                return LogoutResponse(message="Logout successful")
             else:
-                logger.error("Raising 500 error due to database failure")
+                logout_logger.error("Raising 500 error due to database failure")
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to invalidate token"
                 )
         
-        logger.info("Creating successful logout response")
-        response = LogoutResponse(message="Logout successful")
-        logger.info(f"Final response created: {response}")
-        return response
+        logout_logger.info("Logout successful", extra={"user_id": user_id})
+        return LogoutResponse(message="Logout successful")
         
-    except Exception as e:
-        logger.error(f"Unexpected error in logout endpoint: {e}")
-        logger.error(f"Error type: {type(e)}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+    except HTTPException:
+        raise
+    except Exception:
+        logout_logger.exception("Unexpected error in logout endpoint")
         raise
 
 
@@ -655,7 +682,7 @@ async def google_oauth_callback(
     
     try:
         # 4. Exchange authorization code for access token
-        token_url = "https://oauth2.googleapis.com/token"
+        token_url = settings.GOOGLE_TOKEN_URL
         token_data = {
             "client_id": settings.GOOGLE_CLIENT_ID,
             "client_secret": settings.GOOGLE_CLIENT_SECRET,
@@ -664,29 +691,31 @@ async def google_oauth_callback(
             "redirect_uri": "https://auth.socialmembrane.com/auth/google/callback"
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                token_response = await client.post(token_url, data=token_data)
-                token_response.raise_for_status()
-                token_json = token_response.json()
-            except httpx.HTTPStatusError as e:
-                # Google returned an HTTP error (400, 401, etc.)
-                if e.response.status_code in [400, 401]:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Google OAuth token exchange failed: Invalid code or client authentication failed. Status: {e.response.status_code}"
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=status.HTTP_502_BAD_GATEWAY,
-                        detail=f"Google OAuth service error. Status: {e.response.status_code}"
-                    )
-            except httpx.RequestError as e:
-                # Network error connecting to Google
+        # Pooled, application-scoped client: reuses connections across logins
+        try:
+            with _tracer.start_as_current_span("google.token_exchange") as span:
+                token_response = await google_http.client.post(token_url, data=token_data)
+                span.set_attribute("http.status_code", token_response.status_code)
+            token_response.raise_for_status()
+            token_json = token_response.json()
+        except httpx.HTTPStatusError as e:
+            # Google returned an HTTP error (400, 401, etc.)
+            if e.response.status_code in [400, 401]:
                 raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail=f"Failed to connect to Google OAuth service: {str(e)}"
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Google OAuth token exchange failed: Invalid code or client authentication failed. Status: {e.response.status_code}"
                 )
+            else:
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail=f"Google OAuth service error. Status: {e.response.status_code}"
+                )
+        except httpx.RequestError as e:
+            # Network error connecting to Google
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Failed to connect to Google OAuth service: {str(e)}"
+            )
         
         # 5. Parse and validate the ID token
         id_token = token_json.get("id_token")
@@ -696,23 +725,18 @@ async def google_oauth_callback(
                 detail="ID token not found in Google response"
             )
         
-        # Decode the ID token (without verification for simplicity in this implementation)
+        # Verify signature and claims against Google's cached signing keys
         try:
-            # Split the JWT and decode the payload
-            header, payload, signature = id_token.split('.')
-            # Add padding if needed
-            payload += '=' * (4 - len(payload) % 4)
-            decoded_payload = base64.urlsafe_b64decode(payload)
-            user_info = json.loads(decoded_payload)
-        except (ValueError, json.JSONDecodeError) as e:
+            user_info = await google_id_token_verifier.verify(id_token, access_token=token_json.get("access_token"))
+        except IDTokenError as e:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Failed to decode ID token: Malformed token structure"
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Invalid ID token: {str(e)}"
             )
-        except Exception as e:
+        except JWKSUnavailable as e:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Unexpected error decoding ID token: {str(e)}"
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Unable to verify ID token: Google signing keys unavailable"
             )
         
         # 6. Validate required claims in the ID token
@@ -739,39 +763,28 @@ async def google_oauth_callback(
         user_crud = UserCRUD(db)
         
         # 7. User lookup and creation logic
-        # First, check if user exists by Google ID
-        existing_user = user_crud.get_by_google_id(google_id)
+        # One query finds the account linked to this Google ID, or else the
+        # account with the same email (for account linking)
+        existing_user = user_crud.get_by_google_id_or_email(google_id, email)
         
-        if existing_user:
+        if existing_user is None:
+            # No existing user found - create new user
+            user = user_crud.create_google_user(
+                google_id=google_id,
+                email=email,
+                full_name=name
+            )
+        elif existing_user.google_id == google_id:
             # User found by Google ID - existing Google user
             user = existing_user
         else:
-            # Check if user exists by email (for account linking)
-            existing_user = user_crud.get_by_email(email)
+            # User found by email but not linked to this Google ID - link the account
+            update_data = {"google_id": google_id}
+            if not existing_user.is_verified:
+                update_data["is_verified"] = True
             
-            if existing_user:
-                # User found by email but no Google ID - link the account
-                update_data = {"google_id": google_id}
-                if not existing_user.is_verified:
-                    update_data["is_verified"] = True
-                
-                user_crud.update(existing_user.id, update_data)
-                
-                # Try to refresh the existing_user object, but handle errors gracefully
-                try:
-                    db.refresh(existing_user)
-                except Exception:
-                    # If refresh fails (e.g., with mock objects in tests), just continue
-                    pass
-                    
-                user = existing_user
-            else:
-                # No existing user found - create new user
-                user = user_crud.create_google_user(
-                    google_id=google_id,
-                    email=email,
-                    full_name=name
-                )
+            # update() returns the row as written (UPDATE ... RETURNING)
+            user = user_crud.update(existing_user.id, update_data)
           # 8. Generate platform-specific JWT tokens
         access_token = create_access_token(subject=str(user.id))
         refresh_token = create_refresh_token(subject=str(user.id))
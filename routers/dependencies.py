@@ -6,11 +6,12 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
+from jose import JWTError
 
 from database.session import get_db
 from crud.user_crud import UserCRUD
-from core.config import settings
+from schemas.user_schema import CurrentUser
+from core.security import decode_token
 
 # Security scheme for bearer token
 security = HTTPBearer()
@@ -19,16 +20,19 @@ security = HTTPBearer()
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> dict:
+) -> CurrentUser:
     """
     Dependency to get the current authenticated user from JWT token.
     
+    The user is loaded with a column-only query, once per request; routes
+    that need the user should use this result instead of querying again.
+    
     Args:
         credentials: Bearer token from Authorization header
         db: Database session
         
     Returns:
-        dict: User information from token payload
+        CurrentUser: Authenticated user's fields
         
     Raises:
         HTTPException: If token is invalid or user not found
@@ -41,11 +45,7 @@ async def get_current_user(
     
     try:
         # Decode JWT token
-        payload = jwt.decode(
-            credentials.credentials, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_token(credentials.credentials)
           # Extract user information
         user_id: str = payload.get("sub")
         
@@ -57,23 +57,17 @@ async def get_current_user(
     
     # Verify user exists in database
     user_crud = UserCRUD(db)
-    user = user_crud.get_by_id(int(user_id))
+    user = user_crud.get_current_user(int(user_id))
     
     if user is None:
         raise credentials_exception
     
-    return {
-        "user_id": user.id,
-        "email": user.email,
-        "full_name": user.full_name,
-        "is_verified": user.is_verified,
-        "is_active": user.is_active
-    }
+    return user
 
 
 async def get_current_active_user(
-    current_user: dict = Depends(get_current_user)
-) -> dict:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     """
     Dependency to get current active user.
     
@@ -81,12 +75,12 @@ async def get_current_active_user(
         current_user: Current user from get_current_user dependency
         
     Returns:
-        dict: Active user information
+        CurrentUser: Active user information
         
     Raises:
         HTTPException: If user is inactive
     """
-    if not current_user["is_active"]:
+    if not current_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="Inactive user"
@@ -95,8 +89,8 @@ async def get_current_active_user(
 
 
 async def get_current_verified_user(
-    current_user: dict = Depends(get_current_user)
-) -> dict:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     """
     Dependency to get current verified user.
     
@@ -104,12 +98,12 @@ async def get_current_verified_user(
         current_user: Current user from get_current_user dependency
         
     Returns:
-        dict: Verified user information
+        CurrentUser: Verified user information
         
     Raises:
         HTTPException: If user email is not verified
     """
-    if not current_user["is_verified"]:
+    if not current_user.is_verified:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Email not verified"
@@ -128,8 +122,8 @@ def require_roles(*required_roles: str):
         Dependency function that checks user roles
     """
     async def role_checker(
-        current_user: dict = Depends(get_current_active_user)
-    ) -> dict:
+        current_user: CurrentUser = Depends(get_current_active_user)
+    ) -> CurrentUser:
         # Note: This assumes you have a role system in place
         # You would need to extend the User model and add role checking logic
         user_roles = current_user.get("roles", [])
@@ -0,0 +1,91 @@
+"""
+Prometheus scrape endpoint.
+
+Request, bcrypt, JWT and rate-limit metrics are recorded on the hot path
+(core.metrics); everything below is read from the owning component's own
+counters only when /metrics is scraped.
+
+Only clients in METRICS_ALLOWED_NETWORKS are served; everyone else gets a
+404, as if the endpoint didn't exist. The metrics include per-route status
+counts and rate-limit rejections, which outsiders have no business seeing.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from core.config import settings
+from core.metrics import registry
+from database.session import engine
+from services.email_outbox import email_outbox
+from services.google_id_token import google_jwks
+from services.security_service import security_utils
+from services.single_flight import otp_request_flight
+from services.user_cache import negative_email_cache, user_cache
+
+router = APIRouter(tags=["Monitoring"])
+
+_CACHES = {"user": user_cache, "negative_email": negative_email_cache}
+
+
+def _db_pool():
+    pool = engine.pool
+    # SQLite's pools don't track checkouts
+    for state, reader in (
+        ("size", "size"), ("checked_in", "checkedin"), ("checked_out", "checkedout"), ("overflow", "overflow")
+    ):
+        if hasattr(pool, reader):
+            yield {"state": state}, getattr(pool, reader)()
+
+
+def _email_outbox_pending():
+    if email_outbox.enabled:
+        yield {}, email_outbox.pending_count()
+
+
+def _cache_lookups():
+    for name, cache in _CACHES.items():
+        stats = cache.stats()
+        yield {"cache": name, "result": "hit"}, stats["hits"]
+        yield {"cache": name, "result": "miss"}, stats["misses"]
+
+
+def _cache_hit_ratio():
+    for name, cache in _CACHES.items():
+        yield {"cache": name}, cache.stats()["hit_ratio"]
+
+
+def _single_flight_coalesced():
+    yield {"flight": otp_request_flight.name}, otp_request_flight.coalesced
+    yield {"flight": "google_jwks"}, google_jwks.stats()["coalesced"]
+
+
+registry.collect("auth_db_pool_connections", "SQLAlchemy connection pool state", _db_pool)
+registry.collect("auth_email_outbox_pending", "OTP emails waiting in the outbox", _email_outbox_pending)
+registry.collect("auth_cache_lookups", "In-process cache lookups by result", _cache_lookups, kind="counter")
+registry.collect("auth_cache_hit_ratio", "In-process cache hit ratio since start", _cache_hit_ratio)
+registry.collect(
+    "auth_single_flight_coalesced", "Calls that joined an identical in-flight call", _single_flight_coalesced,
+    kind="counter"
+)
+
+
+def require_metrics_client(request: Request):
+    """Reject scrapes from outside METRICS_ALLOWED_NETWORKS."""
+    networks = security_utils.parse_networks(settings.METRICS_ALLOWED_NETWORKS)
+    if not security_utils.is_client_in_networks(request.client.host if request.client else None, networks):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+    dependencies=[Depends(require_metrics_client)]
+)
+def metrics():
+    """
+    Metrics in the Prometheus text format.
+    
+    Sync so the outbox depth query runs in the threadpool, off the event loop.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,9 +1,9 @@
-from .user_schema import UserBase, UserCreate, UserRead
+from .user_schema import UserBase, UserCreate, UserRead, CurrentUser
 from .token_schema import TokenData, Token, LogoutRequest, LogoutResponse
 from .otp_schema import OTPRequest, OTPVerify, OTPBase, OTPCreate, OTPRead
 
 __all__ = [
-    "UserBase", "UserCreate", "UserRead",
+    "UserBase", "UserCreate", "UserRead", "CurrentUser",
     "TokenData", "Token", "LogoutRequest", "LogoutResponse",
     "OTPRequest", "OTPVerify", "OTPBase", "OTPCreate", "OTPRead"
 ]
\ No newline at end of file
@@ -69,3 +69,44 @@ class UserRead(UserBase):
 
 # Alias for backward compatibility and clearer API responses
 UserResponse = UserRead
+
+
+class CurrentUser:
+    """
+    Authenticated user resolved from a column-only query.
+    
+    Plain ``__slots__`` object rather than an ORM instance, so it carries no
+    identity-map or change-tracking state. Also supports the dict-style access
+    (``current_user["user_id"]``) of the payload it replaced.
+    """
+    
+    __slots__ = ("id", "email", "full_name", "is_active", "is_verified", "created_at")
+    
+    def __init__(
+        self,
+        id: int,
+        email: str,
+        full_name: Optional[str],
+        is_active: bool,
+        is_verified: bool,
+        created_at: datetime
+    ):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self.is_active = is_active
+        self.is_verified = is_verified
+        self.created_at = created_at
+    
+    @property
+    def user_id(self) -> int:
+        return self.id
+    
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+    
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
@@ -4,8 +4,15 @@ Services package for Auth Service business logic.
 
 from .otp_service import OTPService
 from .email_service import EmailService
+from .email_outbox import EmailOutboxService
+from .otp_store import OTPStore, DatabaseOTPStore, InMemoryOTPStore, RedisOTPStore
 
 __all__ = [
     "OTPService",
-    "EmailService"
+    "EmailService",
+    "EmailOutboxService",
+    "OTPStore",
+    "DatabaseOTPStore",
+    "InMemoryOTPStore",
+    "RedisOTPStore"
 ]
\ No newline at end of file
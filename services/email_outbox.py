@@ -0,0 +1,318 @@
+"""
+Transactional email outbox with an async sender pool.
+
+Routes write the message into the ``email_outbox`` table in the same
+transaction as the data it belongs to (the OTP) and return as soon as that
+commits. A pool of sender tasks claims due messages, delivers them through
+EmailService, and retries failures with exponential backoff until the
+message is sent, its OTP expires, or it runs out of attempts and is moved to
+the dead-letter state.
+
+A claim is a lease of EMAIL_OUTBOX_LEASE_SECONDS, renewed right before each
+send, so a message is only picked up again if its sender stalls or dies
+during that one send. Every result is written only while the claim is still
+the one the sender took (same status and attempt count), so a sender that
+lost its lease can't overwrite the result of the sender that took over.
+
+OTP codes are encrypted in the outbox with a key derived from SECRET_KEY and
+removed once the message is sent or dead. Sent and dead rows are deleted
+after EMAIL_OUTBOX_RETENTION_HOURS by a purge loop that runs alongside the
+senders.
+
+The outbox is a database table whatever OTP_STORE_BACKEND is, so with the
+memory or Redis OTP store every OTP request still writes (and later
+updates and deletes) a row in the database. Use EMAIL_DELIVERY_MODE=inline
+to keep OTP traffic out of the database entirely, at the cost of sending
+during the request and losing the retries.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.config import settings
+from crud.email_outbox_crud import EmailOutboxCRUD
+from database.session import SessionLocal
+from services.email_service import email_service
+from services.send_shaper import DomainDeferred, TemporarySendFailure
+
+logger = logging.getLogger("auth_service.email_outbox")
+
+
+def _payload_cipher() -> Fernet:
+    """Fernet cipher keyed from SECRET_KEY."""
+    key = hashlib.sha256(f"email_outbox:{settings.SECRET_KEY}".encode("utf-8")).digest()
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+class EmailOutboxService:
+    """Queues OTP emails in the outbox and runs the sender workers."""
+
+    def __init__(self, session_factory: sessionmaker = SessionLocal):
+        """
+        Args:
+            session_factory: Session factory the sender workers use
+        """
+        self.session_factory = session_factory
+        self._cipher = _payload_cipher()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        # Set on stop(), so the purge loop's sleep ends early
+        self._stopped: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def enabled(self) -> bool:
+        return settings.EMAIL_DELIVERY_MODE.lower() == "outbox"
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def enqueue_otp_email(
+        self,
+        db: Session,
+        email: str,
+        otp_code: str,
+        user_name: Optional[str],
+        purpose: str,
+        locale: Optional[str] = None
+    ):
+        """
+        Add an OTP email to the outbox in the caller's transaction.
+
+        The caller commits; call notify() afterwards to wake a sender.
+
+        Args:
+            db: Database session of the current request
+            email: Recipient email address
+            otp_code: Plain OTP code (stored encrypted)
+            user_name: User's name for personalization
+            purpose: Purpose of the OTP
+            locale: Preferred email language
+        """
+        payload = json.dumps({"otp_code": otp_code, "user_name": user_name, "locale": locale})
+        EmailOutboxCRUD(db).add(
+            recipient=email,
+            purpose=getattr(purpose, "value", purpose),
+            payload=self._cipher.encrypt(payload.encode("utf-8")).decode("ascii"),
+            expires_at=datetime.utcnow() + timedelta(minutes=settings.OTP_EXPIRY_MINUTES)
+        )
+
+    def notify(self):
+        """Wake the sender workers after an outbox commit."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with +/-20% jitter for the given attempt count."""
+        delay = settings.EMAIL_OUTBOX_BASE_BACKOFF_SECONDS * (2 ** (attempts - 1))
+        delay = min(delay, settings.EMAIL_OUTBOX_MAX_BACKOFF_SECONDS)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _claim_batch(self) -> List[Dict[str, Any]]:
+        """Claim due messages and return them detached from the session."""
+        lease_until = datetime.utcnow() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        with self.session_factory() as db:
+            messages = EmailOutboxCRUD(db).claim_due(settings.EMAIL_OUTBOX_BATCH_SIZE, lease_until)
+            return [
+                {
+                    "id": message.id,
+                    "recipient": message.recipient,
+                    "purpose": message.purpose,
+                    "payload": message.payload,
+                    "attempts": message.attempts,
+                    "expires_at": message.expires_at,
+                }
+                for message in messages
+            ]
+
+    def _renew_lease(self, message_id: int, attempts: int) -> bool:
+        lease_until = datetime.utcnow() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        with self.session_factory() as db:
+            return EmailOutboxCRUD(db).renew_lease(message_id, attempts, lease_until)
+
+    def _mark_sent(self, message_id: int, attempts: int) -> bool:
+        with self.session_factory() as db:
+            return EmailOutboxCRUD(db).mark_sent(message_id, attempts)
+
+    def _mark_failed(self, message_id: int, attempts: int, error: str, retry_at: Optional[datetime]) -> bool:
+        with self.session_factory() as db:
+            return EmailOutboxCRUD(db).mark_failed(message_id, attempts, error[:1000], retry_at)
+
+    def _defer(self, message_id: int, attempts: int, retry_at: datetime) -> bool:
+        with self.session_factory() as db:
+            return EmailOutboxCRUD(db).defer(message_id, attempts, retry_at)
+
+    async def _record(self, message: Dict[str, Any], write, *args):
+        """Write the outcome of a claimed message, unless the claim was lost."""
+        if not await asyncio.to_thread(write, message["id"], message["attempts"], *args):
+            logger.warning(
+                "Outbox message %s was re-claimed after its lease ran out; result of attempt %s dropped",
+                message["id"], message["attempts"]
+            )
+
+    # Rows per purge transaction
+    PURGE_BATCH_SIZE = 1000
+
+    def purge(self) -> int:
+        """
+        Delete sent and dead messages older than EMAIL_OUTBOX_RETENTION_HOURS.
+
+        Returns:
+            int: Number of messages deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=settings.EMAIL_OUTBOX_RETENTION_HOURS)
+        total = 0
+        with self.session_factory() as db:
+            crud = EmailOutboxCRUD(db)
+            while True:
+                deleted = crud.delete_finished_before(cutoff, self.PURGE_BATCH_SIZE)
+                total += deleted
+                if deleted < self.PURGE_BATCH_SIZE:
+                    return total
+
+    def pending_count(self) -> int:
+        """Number of messages waiting to be sent."""
+        with self.session_factory() as db:
+            return EmailOutboxCRUD(db).count_by_status("pending")
+
+    async def _deliver(self, message: Dict[str, Any]):
+        """Send one claimed message and record the outcome."""
+        if message["expires_at"] is not None and message["expires_at"] <= datetime.utcnow():
+            await self._record(message, self._mark_failed, "OTP expired before delivery", None)
+            return
+
+        try:
+            data = json.loads(self._cipher.decrypt(message["payload"].encode("ascii")))
+        except (InvalidToken, AttributeError, ValueError):
+            # Encrypted under a different SECRET_KEY, or the payload is gone
+            await self._record(message, self._mark_failed, "Unreadable payload", None)
+            return
+
+        # The batch may have waited behind earlier sends; the lease has to cover this one
+        if not await asyncio.to_thread(self._renew_lease, message["id"], message["attempts"]):
+            logger.warning(
+                "Outbox message %s was re-claimed before attempt %s was sent; skipping it",
+                message["id"], message["attempts"]
+            )
+            return
+
+        try:
+            await email_service.send_otp_email(
+                email=message["recipient"],
+                otp_code=data["otp_code"],
+                user_name=data["user_name"],
+                purpose=message["purpose"],
+                locale=data.get("locale")
+            )
+        except DomainDeferred as e:
+            # Not attempted: the recipient's domain is throttled, try again when it opens up
+            await self._record(message, self._defer, datetime.utcnow() + timedelta(seconds=e.retry_after))
+            return
+        except Exception as e:
+            retry_at = None
+            if message["attempts"] < settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                delay = self.retry_delay(message["attempts"])
+                if isinstance(e, TemporarySendFailure):
+                    delay = max(delay, e.retry_after)
+                retry_at = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning(
+                "Outbox message %s attempt %s failed%s: %s",
+                message["id"], message["attempts"], "" if retry_at else ", moved to dead letter", e
+            )
+            await self._record(message, self._mark_failed, str(e), retry_at)
+            return
+
+        await self._record(message, self._mark_sent)
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _worker(self, worker_id: int):
+        """Sender loop: claim due messages, deliver them, sleep when idle."""
+        while not self._stopping:
+            try:
+                batch = await asyncio.to_thread(self._claim_batch)
+            except Exception as e:
+                logger.error("Outbox worker %s failed to claim messages: %s", worker_id, e)
+                await asyncio.sleep(settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS)
+                continue
+
+            if not batch:
+                await self._wait_for_work()
+                continue
+
+            for message in batch:
+                if self._stopping:
+                    # Unsent claims go back to the queue when their lease ends
+                    break
+                try:
+                    await self._deliver(message)
+                except Exception as e:
+                    # The lease expires and another attempt picks it up
+                    logger.error("Outbox worker %s failed on message %s: %s", worker_id, message["id"], e)
+
+    async def _purge_loop(self):
+        """Delete finished messages every EMAIL_OUTBOX_PURGE_INTERVAL_SECONDS."""
+        while not self._stopping:
+            try:
+                deleted = await asyncio.to_thread(self.purge)
+                if deleted:
+                    logger.info("Purged %s finished outbox messages", deleted)
+            except Exception as e:
+                logger.error("Outbox purge failed: %s", e)
+            try:
+                await asyncio.wait_for(self._stopped.wait(), settings.EMAIL_OUTBOX_PURGE_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, concurrency: Optional[int] = None):
+        """Start the sender pool on the running event loop."""
+        if self._tasks or not self.enabled:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        concurrency = concurrency or settings.EMAIL_OUTBOX_WORKERS
+        self._stopped = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(worker_id), name=f"email-outbox-{worker_id}")
+            for worker_id in range(concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._purge_loop(), name="email-outbox-purge"))
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Stop the sender pool. Undelivered messages stay in the outbox.
+
+        Workers get ``timeout`` seconds to finish the message they are
+        sending, so it isn't delivered and then sent again after its lease.
+        """
+        self._stopping = True
+        self.notify()
+        if self._stopped is not None:
+            self._stopped.set()
+        if self._tasks:
+            _, still_running = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+        self._stopped = None
+
+
+# Global instance
+email_outbox = EmailOutboxService()
@@ -1,7 +1,19 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+import logging
+import aiosmtplib
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
 from datetime import datetime
+from time import perf_counter
 from typing import Optional
 from core.config import settings
+from core.server_timing import EMAIL, record as record_timing
+from core.tracing import get_tracer
+from services.smtp_pool import SMTPConnectionPool
+from services.email_templates import email_templates
+from services.send_shaper import DomainDeferred, DomainSendShaper, TemporarySendFailure, create_send_shaper
+
+logger = logging.getLogger("auth_service.email")
+_tracer = get_tracer("auth_service.email")
 
 
 class EmailService:
@@ -9,30 +21,48 @@ class EmailService:
     
     def __init__(self):
         """Initialize email service with configuration."""
-        self._config = None
+        self._pool = None
+        self._shaper = None
     
-    def _get_mail_config(self) -> ConnectionConfig:
-        """Get email configuration - lazy loading."""
-        if self._config is None:
-            self._config = ConnectionConfig(
-                MAIL_USERNAME=settings.EMAIL_USERNAME,
-                MAIL_PASSWORD=settings.EMAIL_PASSWORD,
-                MAIL_FROM=settings.EMAIL_FROM,
-                MAIL_PORT=settings.EMAIL_PORT,
-                MAIL_SERVER=settings.EMAIL_HOST,
-                MAIL_STARTTLS=settings.EMAIL_STARTTLS,
-                MAIL_SSL_TLS=settings.EMAIL_SSL_TLS,
-                USE_CREDENTIALS=True,
-                VALIDATE_CERTS=True,
+    def _get_pool(self) -> SMTPConnectionPool:
+        """Get the SMTP connection pool - lazy loading."""
+        if self._pool is None:
+            self._pool = SMTPConnectionPool(
+                hostname=settings.EMAIL_HOST,
+                port=settings.EMAIL_PORT,
+                username=settings.EMAIL_USERNAME,
+                password=settings.EMAIL_PASSWORD,
+                use_tls=bool(settings.EMAIL_SSL_TLS),
+                start_tls=settings.EMAIL_STARTTLS,
+                validate_certs=True,
+                max_size=settings.EMAIL_SMTP_POOL_SIZE,
+                keepalive_seconds=settings.EMAIL_SMTP_KEEPALIVE_SECONDS,
+                idle_timeout_seconds=settings.EMAIL_SMTP_IDLE_TIMEOUT_SECONDS,
+                max_messages_per_connection=settings.EMAIL_SMTP_MAX_MESSAGES_PER_CONNECTION,
+                timeout=settings.EMAIL_SMTP_TIMEOUT_SECONDS
             )
-        return self._config
+        return self._pool
+    
+    def _get_shaper(self) -> DomainSendShaper:
+        """Get the per-recipient-domain send shaper - lazy loading."""
+        if self._shaper is None:
+            self._shaper = create_send_shaper()
+        return self._shaper
+    
+    async def close(self):
+        """Close pooled SMTP connections."""
+        if self._pool is not None:
+            await self._pool.close()
+        # Domain connection caps are bound to the current event loop
+        self._shaper = None
     
     async def send_otp_email(
         self,
         email: str,
         otp_code: str,
         user_name: Optional[str] = None,
-        purpose: str = "verification"
+        purpose: str = "verification",
+        locale: Optional[str] = None
     ):
         """
         Send OTP email to user.
@@ -42,64 +72,62 @@ class EmailService:
             otp_code: The OTP code to send
             user_name: User's name for personalization
             purpose: Purpose of the OTP (verification, login, password_reset)
+            locale: Preferred language; falls back to EMAIL_DEFAULT_LOCALE
+            
+        Raises:
+            DomainDeferred: Not sent; the recipient's domain is rate limited
+                or backing off
+            TemporarySendFailure: The relay answered with a 4xx
         """
         # Check if email settings are configured
         if not all([settings.EMAIL_HOST, settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD]):
-            print(f"Email not configured. Would send OTP {otp_code} to {email}")
+            logger.warning("Email not configured. Would send OTP %s to %s", otp_code, email)
             return
         
-        # Customize subject and content based on purpose
-        if purpose == "verification":
-            subject = "Verify Your Email - AI EdTech Platform"
-            action_text = "verify your email address"
-        elif purpose == "login":
-            subject = "Your Login Code - AI EdTech Platform"
-            action_text = "log into your account"
-        elif purpose == "password_reset":
-            subject = "Password Reset Code - AI EdTech Platform"
-            action_text = "reset your password"
-        else:
-            subject = "Your OTP Code - AI EdTech Platform"
-            action_text = "complete your request"
+        # Subject and wording come from the precompiled per-purpose templates
+        rendered = email_templates.render_otp(purpose, otp_code, user_name, locale)
         
-        greeting = f"Hello {user_name}," if user_name else "Hello,"
-        
-        body = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h2 style="color: #333;">AI EdTech Platform</h2>
-            <p>{greeting}</p>
-            <p>Your One-Time Password (OTP) to {action_text} is:</p>
-            <div style="background-color: #f4f4f4; padding: 20px; text-align: center; margin: 20px 0;">
-                <h1 style="color: #007bff; font-size: 32px; margin: 0; letter-spacing: 5px;">{otp_code}</h1>
-            </div>
-            <p>This OTP will expire in {settings.OTP_EXPIRY_MINUTES} minutes.</p>
-            <p>If you did not request this OTP, please ignore this email.</p>
-            <hr style="margin: 30px 0;">
-            <p style="color: #666; font-size: 12px;">
-                Thanks,<br>
-                The AI EdTech Platform Team
-            </p>
-        </div>
-        """
-        
-        message = MessageSchema(
-            subject=subject,
-            recipients=[email],
-            body=body,
-            subtype="html"
-        )
+        message = EmailMessage()
+        message["Subject"] = rendered.subject
+        message["From"] = settings.EMAIL_FROM
+        message["To"] = email
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid(domain=settings.EMAIL_FROM.rpartition("@")[2] or None)
+        message.set_content(rendered.text)
+        message.add_alternative(rendered.html, subtype="html")
         
+        shaper = self._get_shaper()
+        span_attributes = {"email.domain": email.rpartition("@")[2], "email.purpose": purpose}
+        start = perf_counter()
         try:
-            fm = FastMail(self._get_mail_config())
-            await fm.send_message(message)
-            print(f"OTP email sent to {email}")
+            with _tracer.start_as_current_span("email.send_otp", attributes=span_attributes):
+                async with shaper.slot(email):
+                    await self._get_pool().send_message(message)
+            shaper.record_success(email)
+            logger.info("OTP email sent to %s", email)
+        except DomainDeferred:
+            raise
+        except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused) as e:
+            code = e.recipients[0].code if isinstance(e, aiosmtplib.SMTPRecipientsRefused) else e.code
+            logger.warning("Relay refused OTP email to %s: %s", email, e)
+            if 400 <= code < 500:
+                # Greylisting or throttling: pause the whole domain
+                pause = shaper.record_temporary_failure(email)
+                raise TemporarySendFailure(f"Failed to send email: {str(e)}", pause) from e
+            raise Exception(f"Failed to send email: {str(e)}")
         except Exception as e:
-            print(f"Error sending OTP email to {email}: {e}")
+            logger.error("Error sending OTP email to %s: %s", email, e)
             raise Exception(f"Failed to send email: {str(e)}")
+        finally:
+            # Inline delivery only; outbox sends happen outside any request
+            record_timing(EMAIL, perf_counter() - start)
+
+
+# Global instance
+email_service = EmailService()
 
 
 # Legacy function for backward compatibility
 async def send_otp_email(to_email: str, otp_code: str, otp_expires_at: datetime):
     """Legacy function - use EmailService class instead."""
-    service = EmailService()
-    await service.send_otp_email(to_email, otp_code)
+    await email_service.send_otp_email(to_email, otp_code)
@@ -0,0 +1,236 @@
+"""
+Precompiled OTP email templates.
+
+Templates live in ``templates/email/<locale>/``: ``otp.html`` and ``otp.txt``
+hold the layout and ``messages.json`` the greeting and per-purpose subject
+and wording. Everything except the OTP code and the user's name is known
+when the templates are loaded, so each (locale, purpose) pair is compiled
+once into alternating static chunks and slots, and rendering a message is a
+join of those chunks with the two values filled in.
+
+Adding a purpose or a language only needs a new ``messages.json`` entry or
+locale directory.
+"""
+
+import html
+import json
+import os
+import re
+import threading
+from string import Template
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+
+DEFAULT_TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "email"
+)
+
+# Placeholders still present after the static values are filled in
+_SLOT = re.compile(r"\$\{(\w+)\}")
+
+
+class CompiledTemplate:
+    """Template text split into static chunks and named slots."""
+
+    __slots__ = ("_parts", "_slots")
+
+    def __init__(self, source: str, static_values: Dict[str, str]):
+        """
+        Args:
+            source: Template text with ``${name}`` placeholders
+            static_values: Values known at load time, substituted once
+        """
+        text = Template(source).safe_substitute(static_values)
+        # [static, slot, static, slot, ..., static]
+        self._parts: List[str] = _SLOT.split(text)
+        # Structure: ((index_in_parts, slot_name), ...)
+        self._slots: Tuple[Tuple[int, str], ...] = tuple(
+            (index, self._parts[index]) for index in range(1, len(self._parts), 2)
+        )
+
+    @property
+    def slots(self) -> List[str]:
+        return [name for _, name in self._slots]
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = self._parts.copy()
+        for index, name in self._slots:
+            parts[index] = values[name]
+        return "".join(parts)
+
+
+class RenderedEmail:
+    """Subject, HTML body and plain-text alternative of one message."""
+
+    __slots__ = ("subject", "html", "text")
+
+    def __init__(self, subject: str, html: str, text: str):
+        self.subject = subject
+        self.html = html
+        self.text = text
+
+
+class OTPEmailTemplate:
+    """Compiled OTP email for one locale and purpose."""
+
+    def __init__(self, subject: str, html_source: str, text_source: str, messages: Dict[str, str]):
+        """
+        Args:
+            subject: Email subject
+            html_source: HTML layout
+            text_source: Plain-text layout
+            messages: Static wording (greeting, greeting_anonymous,
+                action_text, ignore_notice, ...)
+        """
+        self.subject = subject
+        static = dict(messages, expiry_minutes=str(settings.OTP_EXPIRY_MINUTES))
+        named = dict(static, greeting=messages["greeting"])
+        anonymous = dict(static, greeting=messages["greeting_anonymous"])
+        # Structure: {has_user_name: (html, text)}
+        self._variants: Dict[bool, Tuple[CompiledTemplate, CompiledTemplate]] = {
+            True: (CompiledTemplate(html_source, named), CompiledTemplate(text_source, named)),
+            False: (CompiledTemplate(html_source, anonymous), CompiledTemplate(text_source, anonymous)),
+        }
+
+    def render(self, otp_code: str, user_name: Optional[str] = None) -> RenderedEmail:
+        html_template, text_template = self._variants[bool(user_name)]
+        values = {"otp_code": otp_code, "user_name": user_name or ""}
+        text = text_template.render(values)
+        if user_name:
+            values["user_name"] = html.escape(user_name)
+        return RenderedEmail(subject=self.subject, html=html_template.render(values), text=text)
+
+
+class EmailTemplates:
+    """Loads and compiles every locale and purpose once, then serves lookups."""
+
+    def __init__(self, directory: Optional[str] = None, default_locale: Optional[str] = None):
+        """
+        Args:
+            directory: Template root; the bundled ``templates/email`` when None
+            default_locale: Locale used when the requested one is missing
+        """
+        self.directory = directory or settings.EMAIL_TEMPLATE_DIR or DEFAULT_TEMPLATE_DIR
+        self.default_locale = (default_locale or settings.EMAIL_DEFAULT_LOCALE).lower()
+        # Structure: {locale: {purpose: OTPEmailTemplate}}
+        self._templates: Optional[Dict[str, Dict[str, OTPEmailTemplate]]] = None
+        # Structure: {(purpose, requested_locale): OTPEmailTemplate}
+        self._resolved: Dict[Tuple[str, Optional[str]], OTPEmailTemplate] = {}
+        self._lock = threading.Lock()
+
+    def _read(self, locale: str, filename: str) -> str:
+        with open(os.path.join(self.directory, locale, filename), encoding="utf-8") as f:
+            return f.read()
+
+    def _load(self) -> Dict[str, Dict[str, OTPEmailTemplate]]:
+        templates = {}
+        for locale in sorted(os.listdir(self.directory)):
+            if not os.path.isfile(os.path.join(self.directory, locale, "messages.json")):
+                continue
+            messages = json.loads(self._read(locale, "messages.json"))
+            html_source = self._read(locale, "otp.html")
+            text_source = self._read(locale, "otp.txt")
+            shared = {key: value for key, value in messages.items() if key != "purposes"}
+            templates[locale.lower()] = {
+                purpose: OTPEmailTemplate(
+                    subject=wording["subject"],
+                    html_source=html_source,
+                    text_source=text_source,
+                    messages=dict(shared, **{k: v for k, v in wording.items() if k != "subject"})
+                )
+                for purpose, wording in messages["purposes"].items()
+            }
+        if self.default_locale not in templates:
+            raise RuntimeError(f"No email templates for default locale '{self.default_locale}' in {self.directory}")
+        return templates
+
+    @property
+    def locales(self) -> List[str]:
+        return list(self._get_templates())
+
+    def _get_templates(self) -> Dict[str, Dict[str, OTPEmailTemplate]]:
+        if self._templates is None:
+            with self._lock:
+                if self._templates is None:
+                    self._templates = self._load()
+        return self._templates
+
+    def _locale_chain(self, locale: Optional[str]) -> List[str]:
+        """Requested locale, its language, then the default."""
+        chain = []
+        if locale:
+            locale = locale.replace("_", "-").lower()
+            chain.extend([locale, locale.split("-", 1)[0]])
+        chain.append(self.default_locale)
+        return chain
+
+    def get(self, purpose: str, locale: Optional[str] = None) -> OTPEmailTemplate:
+        """
+        Get the compiled template for a purpose and locale.
+
+        Falls back from ``pt-BR`` to ``pt`` to the default locale, and to the
+        ``default`` purpose for purposes without their own wording.
+        """
+        purpose = getattr(purpose, "value", purpose)
+        key = (purpose, locale)
+        template = self._resolved.get(key)
+        if template is not None:
+            return template
+
+        templates = self._get_templates()
+        for candidate in self._locale_chain(locale):
+            by_purpose = templates.get(candidate)
+            if by_purpose is not None:
+                template = by_purpose.get(purpose) or by_purpose.get("default")
+                if template is not None:
+                    break
+        if template is None:
+            raise KeyError(f"No email template for purpose '{purpose}'")
+        self._resolved[key] = template
+        return template
+
+    def render_otp(
+        self,
+        purpose: str,
+        otp_code: str,
+        user_name: Optional[str] = None,
+        locale: Optional[str] = None
+    ) -> RenderedEmail:
+        return self.get(purpose, locale).render(otp_code, user_name)
+
+    def negotiate_locale(self, accept_language: Optional[str]) -> Optional[str]:
+        """
+        Pick the best available locale from an Accept-Language header.
+
+        Returns None when nothing matches, so the default locale applies.
+        """
+        if not accept_language:
+            return None
+        available = self._get_templates()
+        ranked = []
+        for position, item in enumerate(accept_language.split(",")):
+            tag, _, params = item.strip().partition(";")
+            quality = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    continue
+            if tag and tag != "*" and quality > 0:
+                ranked.append((-quality, position, tag.lower()))
+        for _, _, tag in sorted(ranked):
+            for candidate in (tag, tag.split("-", 1)[0]):
+                if candidate in available:
+                    return candidate
+        return None
+
+    def clear(self):
+        """Drop compiled templates so the next lookup reloads them."""
+        with self._lock:
+            self._templates = None
+            self._resolved = {}
+
+
+# Global instance
+email_templates = EmailTemplates()
@@ -0,0 +1,276 @@
+"""
+Google ID-token verification against a cached copy of Google's signing keys.
+
+Google publishes its ID-token signing keys as a JWKS with a Cache-Control
+max-age of several hours and rotates them well inside that window. The
+keys are held in memory and refreshed in the background shortly before
+they expire, so verifying a login costs one RSA signature check and no
+network round trip. A token signed with a key id that isn't cached yet (a
+rotation that happened after the last refresh) triggers one refetch, shared
+by every request waiting for it.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+from core.config import settings
+from core.tracing import get_tracer
+from services.http_client import google_http
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger("auth_service.google_id_token")
+
+# Returns the JWKS document and how long it may be cached (None if unspecified)
+JWKSFetcher = Callable[[], Awaitable[Tuple[Dict[str, Any], Optional[float]]]]
+
+_tracer = get_tracer("auth_service.google")
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class IDTokenError(ValueError):
+    """The ID token is malformed, wrongly signed or has invalid claims."""
+
+
+class JWKSUnavailable(RuntimeError):
+    """Signing keys could not be fetched and none are cached."""
+
+
+def cache_lifetime(headers: Any) -> Optional[float]:
+    """
+    Seconds a response may be cached for, from Cache-Control max-age minus Age.
+
+    Returns:
+        Optional[float]: Lifetime, or None when the response doesn't say
+    """
+    cache_control = headers.get("cache-control") or ""
+    if "no-store" in cache_control.lower() or "no-cache" in cache_control.lower():
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if not match:
+        return None
+    try:
+        age = float(headers.get("age") or 0)
+    except ValueError:
+        age = 0.0
+    return max(0.0, int(match.group(1)) - age)
+
+
+async def fetch_google_jwks() -> Tuple[Dict[str, Any], Optional[float]]:
+    """Fetch Google's JWKS over the shared HTTP client."""
+    with _tracer.start_as_current_span("google.jwks_fetch") as span:
+        response = await google_http.client.get(settings.GOOGLE_JWKS_URL)
+        span.set_attribute("http.status_code", response.status_code)
+        response.raise_for_status()
+    return response.json(), cache_lifetime(response.headers)
+
+
+class JWKSCache:
+    """In-memory JWKS keyed by ``kid``, refreshed ahead of expiry."""
+
+    def __init__(
+        self,
+        fetch: Optional[JWKSFetcher] = None,
+        default_ttl_seconds: Optional[float] = None,
+        refresh_margin_seconds: Optional[float] = None,
+        min_refetch_interval_seconds: Optional[float] = None
+    ):
+        """
+        Args:
+            fetch: Coroutine function returning (jwks, max_age); replace with
+                a local stand-in in tests. Defaults to fetching GOOGLE_JWKS_URL
+            default_ttl_seconds: Lifetime when the response has no max-age
+            refresh_margin_seconds: How long before expiry to refresh
+            min_refetch_interval_seconds: Minimum time between fetches caused
+                by unknown key ids, so tokens with made-up ``kid`` values
+                can't turn into a fetch each
+        """
+        self.fetch: JWKSFetcher = fetch or fetch_google_jwks
+        self.default_ttl_seconds = default_ttl_seconds if default_ttl_seconds is not None else settings.GOOGLE_JWKS_DEFAULT_TTL_SECONDS
+        self.refresh_margin_seconds = refresh_margin_seconds if refresh_margin_seconds is not None else settings.GOOGLE_JWKS_REFRESH_MARGIN_SECONDS
+        self.min_refetch_interval_seconds = (
+            min_refetch_interval_seconds if min_refetch_interval_seconds is not None
+            else settings.GOOGLE_JWKS_MIN_REFETCH_INTERVAL_SECONDS
+        )
+        # Structure: {kid: constructed public key}
+        self._keys: Dict[str, Key] = {}
+        self._expires_at = 0.0
+        self._fetched_at: Optional[float] = None
+        self._flight = SingleFlight("google_jwks")
+        self._refresher: Optional[asyncio.Task] = None
+        self.fetches = 0
+        self.fetch_failures = 0
+
+    async def _load(self) -> Dict[str, Key]:
+        self._fetched_at = time.monotonic()
+        self.fetches += 1
+        try:
+            document, max_age = await self.fetch()
+        except Exception:
+            self.fetch_failures += 1
+            raise
+
+        keys = {}
+        for entry in document.get("keys", []):
+            kid = entry.get("kid")
+            if not kid or entry.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[kid] = jwk.construct(entry, entry.get("alg", "RS256"))
+            except Exception as e:
+                logger.warning("Skipping unusable JWKS key %s: %s", kid, e)
+        if not keys:
+            self.fetch_failures += 1
+            raise JWKSUnavailable("JWKS response contained no usable signing keys")
+
+        ttl = self.default_ttl_seconds if max_age is None else max_age
+        self._keys = keys
+        self._expires_at = time.monotonic() + ttl
+        return keys
+
+    async def refresh(self) -> Dict[str, Key]:
+        """Fetch the keys now, joining a fetch that is already running."""
+        return await self._flight.do("jwks", self._load)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self._expires_at
+
+    async def get_key(self, kid: str) -> Key:
+        """
+        Key for a ``kid``, fetching the JWKS when it is unknown or expired.
+
+        Raises:
+            JWKSUnavailable: No keys could be fetched
+            IDTokenError: The key id isn't in Google's current JWKS
+        """
+        key = self._keys.get(kid)
+        if key is not None and not self.expired:
+            return key
+
+        if key is None and not self.expired and not self._flight.in_flight:
+            # Keys are fresh but the kid is new: refetch, at most so often
+            if time.monotonic() - self._fetched_at < self.min_refetch_interval_seconds:
+                raise IDTokenError("Unknown signing key")
+
+        try:
+            keys = await self.refresh()
+        except Exception as e:
+            if key is not None:
+                # Keep verifying with the expired keys rather than failing logins
+                logger.warning("JWKS refresh failed, using cached keys: %s", e)
+                return key
+            if isinstance(e, JWKSUnavailable):
+                raise
+            raise JWKSUnavailable(f"Failed to fetch Google signing keys: {e}") from e
+
+        key = keys.get(kid)
+        if key is None:
+            raise IDTokenError("Unknown signing key")
+        return key
+
+    async def _refresh_loop(self):
+        while True:
+            delay = self._expires_at - self.refresh_margin_seconds - time.monotonic()
+            if self._fetched_at is not None:
+                # Failed fetches and short max-age values retry at this pace
+                delay = max(delay, self.min_refetch_interval_seconds)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Background JWKS refresh failed: %s", e)
+
+    def start(self):
+        """Start refreshing in the background. Called from the app lifespan."""
+        # Nothing to verify until Google sign-in is configured
+        if self._refresher is None and settings.GOOGLE_CLIENT_ID:
+            self._refresher = asyncio.create_task(self._refresh_loop(), name="google-jwks-refresh")
+
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+    def clear(self):
+        self._keys = {}
+        self._expires_at = 0.0
+        self._fetched_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._keys),
+            "expires_in": max(0.0, self._expires_at - time.monotonic()),
+            "fetches": self.fetches,
+            "fetch_failures": self.fetch_failures,
+            "coalesced": self._flight.coalesced,
+        }
+
+
+class GoogleIDTokenVerifier:
+    """Verifies Google ID tokens: RS256 signature, issuer, audience and expiry."""
+
+    ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+
+    def __init__(self, jwks: JWKSCache, client_id: Optional[str] = None):
+        """
+        Args:
+            jwks: Key cache to verify signatures with
+            client_id: Expected audience; defaults to GOOGLE_CLIENT_ID
+        """
+        self.jwks = jwks
+        self._client_id = client_id
+
+    async def verify(self, id_token: str, access_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Verify an ID token and return its claims.
+
+        Args:
+            id_token: Compact JWS from the token endpoint
+            access_token: Access token issued alongside it, checked against
+                the ``at_hash`` claim when present
+
+        Returns:
+            Dict[str, Any]: Verified claims
+
+        Raises:
+            IDTokenError: The token is invalid
+            JWKSUnavailable: Signing keys could not be fetched
+        """
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except JWTError as e:
+            raise IDTokenError("Malformed ID token") from e
+        if header.get("alg") != "RS256":
+            raise IDTokenError("Unexpected ID token algorithm")
+        kid = header.get("kid")
+        if not kid:
+            raise IDTokenError("ID token has no key id")
+
+        key = await self.jwks.get_key(kid)
+        try:
+            with _tracer.start_as_current_span("google.id_token_verify"):
+                return jwt.decode(
+                    id_token,
+                    key,
+                    algorithms=["RS256"],
+                    audience=self._client_id or settings.GOOGLE_CLIENT_ID,
+                    issuer=self.ISSUERS,
+                    access_token=access_token,
+                    options={"leeway": settings.GOOGLE_ID_TOKEN_LEEWAY_SECONDS}
+                )
+        except JWTError as e:
+            raise IDTokenError(str(e)) from e
+
+
+# Global instances
+google_jwks = JWKSCache()
+google_id_token_verifier = GoogleIDTokenVerifier(google_jwks)
@@ -0,0 +1,82 @@
+"""
+Application-scoped HTTP client for outbound calls to Google.
+
+A new httpx.AsyncClient per OAuth callback pays DNS, TCP and TLS setup to
+oauth2.googleapis.com on every login. One client, opened in the app lifespan
+and closed on shutdown, keeps connections alive between logins and
+multiplexes concurrent requests over HTTP/2 when the ``h2`` package is
+installed.
+"""
+
+import logging
+from typing import Any, Optional
+
+import httpx
+
+from core.config import settings
+
+logger = logging.getLogger("auth_service.http_client")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class SharedHTTPClient:
+    """Lazily created, pooled httpx.AsyncClient shared across requests."""
+
+    def __init__(self, **client_options: Any):
+        """
+        Args:
+            client_options: Extra httpx.AsyncClient arguments (e.g. ``verify``
+                for a local stand-in server)
+        """
+        self._client_options = client_options
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _build(self) -> httpx.AsyncClient:
+        http2 = settings.GOOGLE_HTTP2
+        if http2 and not _http2_available():
+            logger.warning("GOOGLE_HTTP2 is enabled but the 'h2' package is missing; using HTTP/1.1 keep-alive")
+            http2 = False
+        options = {
+            "http2": http2,
+            "limits": httpx.Limits(
+                max_connections=settings.GOOGLE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GOOGLE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GOOGLE_HTTP_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            "timeout": httpx.Timeout(
+                settings.GOOGLE_HTTP_TIMEOUT_SECONDS,
+                connect=settings.GOOGLE_HTTP_CONNECT_TIMEOUT_SECONDS,
+                pool=settings.GOOGLE_HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+        }
+        options.update(self._client_options)
+        return httpx.AsyncClient(**options)
+
+    def start(self):
+        """Open the client. Called from the app lifespan."""
+        if self._client is None:
+            self._client = self._build()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared client, opened on first use outside the lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build()
+        return self._client
+
+    async def close(self):
+        """Close pooled connections. Called on shutdown."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global instance
+google_http = SharedHTTPClient()
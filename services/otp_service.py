@@ -3,16 +3,53 @@ OTP service for generation, storage, and verification of One-Time Passwords.
 """
 
 from sqlalchemy.orm import Session
-from crud.otp_crud import OTPCRUD
-from core.security import verify_password
+from typing import Optional
+from core.security import hash_password, verify_password
 from core.config import settings
+from services.otp_store import (
+    OTPStore,
+    StoredOTP,
+    DatabaseOTPStore,
+    InMemoryOTPStore,
+    RedisOTPStore,
+)
 from datetime import datetime, timedelta, timezone
 import secrets
 
 
+def create_otp_store(backend: Optional[str] = None) -> Optional[OTPStore]:
+    """
+    Build the process-wide OTP store for the configured backend.
+    
+    Returns None for the "database" backend, whose store is bound to each
+    request's session instead.
+    """
+    backend = (backend or settings.OTP_STORE_BACKEND).lower()
+    if backend == "memory":
+        return InMemoryOTPStore()
+    if backend == "redis":
+        return RedisOTPStore(url=settings.REDIS_URL)
+    if backend == "database":
+        return None
+    raise ValueError(f"Unknown OTP_STORE_BACKEND: {backend}")
+
+
 class OTPService:
     """Service for OTP generation, storage, and verification."""
     
+    def __init__(self, store: Optional[OTPStore] = None):
+        """
+        Args:
+            store: OTP store to use; defaults to the configured backend
+        """
+        self._store = store if store is not None else create_otp_store()
+    
+    def _get_store(self, db: Session) -> OTPStore:
+        """Get the OTP store, falling back to the request's database session."""
+        if self._store is not None:
+            return self._store
+        return DatabaseOTPStore(db)
+    
     def generate_otp(self) -> str:
         """Generate a secure 6-digit OTP."""
         return "".join([secrets.choice("0123456789") for _ in range(6)])
@@ -21,6 +58,37 @@ class OTPService:
         """Get OTP expiry time."""
         return datetime.now(timezone.utc) + timedelta(minutes=settings.OTP_EXPIRY_MINUTES)
     
+    def store_otp(
+        self,
+        db: Session,
+        user_id: int,
+        email: str,
+        otp_code: str,
+        purpose: str
+    ) -> StoredOTP:
+        """
+        Hash and store an OTP, replacing any previous one for the user and purpose.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            email: User's email address
+            otp_code: Plain OTP code
+            purpose: Purpose of the OTP
+            
+        Returns:
+            StoredOTP: The stored (hashed) OTP
+        """
+        otp = StoredOTP(
+            user_id=user_id,
+            email=email,
+            otp_code=hash_password(otp_code),
+            purpose=purpose,
+            expires_at=self.get_expiry_time()
+        )
+        self._get_store(db).save(otp)
+        return otp
+    
     def verify_otp(self, db: Session, user_id: int, otp_code: str, purpose: str) -> bool:
         """
         Verify OTP for a user.
@@ -34,31 +102,31 @@ class OTPService:
         Returns:
             bool: True if OTP is valid, False otherwise
         """
-        otp_crud = OTPCRUD(db)
+        store = self._get_store(db)
         
         # Get stored OTP
-        stored_otp = otp_crud.get_by_user_and_purpose(user_id, purpose)
+        stored_otp = store.get(user_id, purpose)
         if not stored_otp:
             return False
         
         # Check if OTP is expired
         if datetime.now(timezone.utc) > stored_otp.expires_at:
-            # OTP expired, delete it
-            otp_crud.delete_by_user_and_purpose(user_id, purpose)
+            # OTP expired; delete it only if it is still the one we read, so an
+            # OTP issued meanwhile by /auth/request-otp survives
+            store.consume(stored_otp)
             return False
         
         # Verify the provided plain OTP against the stored hashed OTP
         if not verify_password(otp_code, stored_otp.otp_code):
             return False
         
-        # OTP is valid, delete it to prevent reuse
-        otp_crud.delete_by_user_and_purpose(user_id, purpose)
-        return True
+        # OTP is valid; only the caller that deletes it may use it, so two
+        # concurrent verifications of the same code can't both succeed
+        return store.consume(stored_otp)
     
     def cleanup_expired_otps(self, db: Session) -> int:
         """Clean up expired OTP records."""
-        otp_crud = OTPCRUD(db)
-        return otp_crud.delete_expired_otps()
+        return self._get_store(db).cleanup_expired()
 
 
 # Legacy functions for backward compatibility
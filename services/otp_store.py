@@ -0,0 +1,253 @@
+"""
+OTP storage backends.
+
+OTPs are short-lived, write-once/read-once records, so they don't need to live
+in the relational database. OTPService talks to an OTPStore, which can be the
+existing ``otps`` table, a process-local TTL map, or a Redis-protocol server.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from crud.otp_crud import OTPCRUD
+from core.config import settings
+
+
+class StoredOTP:
+    """Backend-independent view of a stored (hashed) OTP."""
+
+    __slots__ = ("user_id", "email", "otp_code", "purpose", "expires_at")
+
+    def __init__(self, user_id: int, email: str, otp_code: str, purpose: str, expires_at: datetime):
+        self.user_id = user_id
+        self.email = email
+        self.otp_code = otp_code  # Hashed OTP, never the plain code
+        self.purpose = purpose
+        self.expires_at = expires_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "email": self.email,
+            "otp_code": self.otp_code,
+            "purpose": self.purpose,
+            "expires_at": self.expires_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StoredOTP":
+        return cls(
+            user_id=data["user_id"],
+            email=data["email"],
+            otp_code=data["otp_code"],
+            purpose=data["purpose"],
+            expires_at=datetime.fromisoformat(data["expires_at"]),
+        )
+
+
+def _purpose_value(purpose: Any) -> str:
+    """Normalize an OTPPurpose enum or plain string to its stored value."""
+    return purpose.value if isinstance(purpose, Enum) else str(purpose)
+
+
+def _ttl_seconds(expires_at: datetime) -> int:
+    """Seconds until expiry, never less than one so the key is always written."""
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return max(1, int((expires_at - datetime.now(timezone.utc)).total_seconds()))
+
+
+class OTPStore:
+    """Interface for OTP storage. One active OTP per (user_id, purpose)."""
+
+    def save(self, otp: StoredOTP) -> None:
+        """Store an OTP, replacing any existing one for the same user and purpose."""
+        raise NotImplementedError
+
+    def get(self, user_id: int, purpose: str) -> Optional[StoredOTP]:
+        """Get the active OTP for a user and purpose."""
+        raise NotImplementedError
+
+    def delete(self, user_id: int, purpose: str) -> bool:
+        """Delete the OTP for a user and purpose. Returns True if one existed."""
+        raise NotImplementedError
+
+    def consume(self, otp: StoredOTP) -> bool:
+        """
+        Atomically delete an OTP previously returned by get(), if it is still stored.
+
+        Of several callers consuming the same OTP concurrently, exactly one
+        gets True, so a code can only be redeemed once.
+        """
+        raise NotImplementedError
+
+    def cleanup_expired(self) -> int:
+        """Remove expired OTPs. Returns the number removed."""
+        return 0
+
+
+class DatabaseOTPStore(OTPStore):
+    """OTP store backed by the ``otps`` table through OTPCRUD."""
+
+    def __init__(self, db: Session):
+        self.otp_crud = OTPCRUD(db)
+
+    def save(self, otp: StoredOTP) -> None:
+        self.otp_crud.replace(
+            user_id=otp.user_id,
+            email=otp.email,
+            hashed_otp_code=otp.otp_code,
+            purpose=_purpose_value(otp.purpose),
+            expires_at=otp.expires_at
+        )
+
+    def get(self, user_id: int, purpose: str) -> Optional[StoredOTP]:
+        db_otp = self.otp_crud.get_by_user_and_purpose(user_id, _purpose_value(purpose))
+        if not db_otp:
+            return None
+        expires_at = db_otp.expires_at
+        if expires_at.tzinfo is None:
+            # Backends without timezone support hand back naive UTC values
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return StoredOTP(
+            user_id=db_otp.user_id,
+            email=db_otp.email,
+            otp_code=db_otp.otp_code,
+            purpose=db_otp.purpose,
+            expires_at=expires_at
+        )
+
+    def delete(self, user_id: int, purpose: str) -> bool:
+        return self.otp_crud.delete_by_user_and_purpose(user_id, _purpose_value(purpose))
+
+    def consume(self, otp: StoredOTP) -> bool:
+        return self.otp_crud.delete_matching(otp.user_id, _purpose_value(otp.purpose), otp.otp_code)
+
+    def cleanup_expired(self) -> int:
+        return self.otp_crud.delete_expired_otps()
+
+
+class InMemoryOTPStore(OTPStore):
+    """Process-local TTL store. Suitable for single-node deployments only."""
+
+    def __init__(self):
+        # Structure: {(user_id, purpose): (monotonic_deadline, StoredOTP)}
+        self._otps: Dict[Tuple[int, str], Tuple[float, StoredOTP]] = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = time.monotonic()
+
+    def _maybe_cleanup(self):
+        """Sweep expired entries every 5 minutes to prevent memory bloat."""
+        if time.monotonic() - self._last_cleanup >= 300:
+            self.cleanup_expired()
+
+    def save(self, otp: StoredOTP) -> None:
+        self._maybe_cleanup()
+        deadline = time.monotonic() + _ttl_seconds(otp.expires_at)
+        with self._lock:
+            self._otps[(otp.user_id, _purpose_value(otp.purpose))] = (deadline, otp)
+
+    def get(self, user_id: int, purpose: str) -> Optional[StoredOTP]:
+        key = (user_id, _purpose_value(purpose))
+        with self._lock:
+            entry = self._otps.get(key)
+            if entry is None:
+                return None
+            deadline, otp = entry
+            if deadline <= time.monotonic():
+                del self._otps[key]
+                return None
+            return otp
+
+    def delete(self, user_id: int, purpose: str) -> bool:
+        with self._lock:
+            return self._otps.pop((user_id, _purpose_value(purpose)), None) is not None
+
+    def consume(self, otp: StoredOTP) -> bool:
+        key = (otp.user_id, _purpose_value(otp.purpose))
+        with self._lock:
+            entry = self._otps.get(key)
+            if entry is None or entry[1].otp_code != otp.otp_code:
+                return False
+            del self._otps[key]
+            return True
+
+    def cleanup_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (deadline, _) in self._otps.items() if deadline <= now]
+            for key in expired:
+                del self._otps[key]
+            self._last_cleanup = now
+        return len(expired)
+
+
+class RedisOTPStore(OTPStore):
+    """
+    OTP store for any Redis-protocol server (Redis, Valkey, KeyDB, ...).
+
+    Expiry is handled by the server through ``SET ... EX``, so there is nothing
+    to vacuum or clean up. Consuming uses ``GETDEL`` (Redis 6.2+), so only one
+    caller ever receives a given OTP back.
+    """
+
+    KEY_PREFIX = "otp"
+
+    def __init__(self, client: Any = None, url: Optional[str] = None):
+        """
+        Args:
+            client: Object with redis-py style ``set``/``get``/``getdel``/``delete`` methods
+            url: Redis URL used to build a client when none is given
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "OTP_STORE_BACKEND=redis requires the 'redis' package"
+                ) from e
+            client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self._client = client
+
+    def _key(self, user_id: int, purpose: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:{_purpose_value(purpose)}"
+
+    def save(self, otp: StoredOTP) -> None:
+        self._client.set(
+            self._key(otp.user_id, otp.purpose),
+            json.dumps(otp.to_dict()),
+            ex=_ttl_seconds(otp.expires_at)
+        )
+
+    @staticmethod
+    def _decode(raw: Any) -> StoredOTP:
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return StoredOTP.from_dict(json.loads(raw))
+
+    def get(self, user_id: int, purpose: str) -> Optional[StoredOTP]:
+        raw = self._client.get(self._key(user_id, purpose))
+        if raw is None:
+            return None
+        return self._decode(raw)
+
+    def delete(self, user_id: int, purpose: str) -> bool:
+        return bool(self._client.delete(self._key(user_id, purpose)))
+
+    def consume(self, otp: StoredOTP) -> bool:
+        key = self._key(otp.user_id, otp.purpose)
+        raw = self._client.getdel(key)
+        if raw is None:
+            return False
+        current = self._decode(raw)
+        if current.otp_code != otp.otp_code:
+            # A new OTP was issued after this one was read; put it back
+            self._client.set(key, raw, ex=_ttl_seconds(current.expires_at), nx=True)
+            return False
+        return True
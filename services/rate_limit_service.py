@@ -7,6 +7,7 @@ import time
 from typing import Dict, Tuple
 from datetime import datetime, timedelta
 from core.config import settings
+from core.metrics import rate_limit_rejections
 
 
 class RateLimitService:
@@ -71,6 +72,8 @@ class RateLimitService:
         if current_attempts >= max_attempts:
             # Find the oldest attempt to calculate reset time
             if valid_attempts:
+                # Rule is the identifier prefix (otp_request, otp_verify, login)
+                rate_limit_rejections.labels(identifier.partition(":")[0]).inc()
                 oldest_attempt = min(timestamp for timestamp, _ in valid_attempts)
                 seconds_until_reset = int(window_seconds - (current_time - oldest_attempt))
                 return False, current_attempts, max(0, seconds_until_reset)
@@ -2,12 +2,20 @@
 Security utilities and helpers for input validation and security hardening.
 """
 
+import base64
+import hashlib
+import heapq
+import hmac
 import re
 import secrets
 import string
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+import struct
+import threading
+import time
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from typing import Optional, Dict, Any, List, Tuple, Union
 from fastapi import HTTPException, status
+from core.config import settings
 
 
 class SecurityUtils:
@@ -183,35 +191,170 @@ class SecurityUtils:
                 return True
                 
         return False
+    
+    @staticmethod
+    def parse_networks(networks: str) -> List[Union[IPv4Network, IPv6Network]]:
+        """
+        Parse a comma-separated list of client networks.
+        
+        Args:
+            networks: e.g. "127.0.0.1/32,10.0.0.0/8"; bare addresses are single hosts
+            
+        Returns:
+            List of networks
+        """
+        return [ip_network(network.strip(), strict=False) for network in networks.split(",") if network.strip()]
+    
+    @staticmethod
+    def is_client_in_networks(host: Optional[str], networks: List[Union[IPv4Network, IPv6Network]]) -> bool:
+        """
+        Check whether a client address belongs to one of the networks.
+        
+        Args:
+            host: Client IP address; None or a non-IP value never matches
+            networks: Networks from parse_networks
+            
+        Returns:
+            bool: True if the client is in one of the networks
+        """
+        if not host:
+            return False
+        try:
+            address = ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in networks)
 
 
-class OAuthStateManager:
-    """Secure OAuth state management with expiry."""
+class InMemoryReplaySet:
+    """Process-local set of consumed OAuth state nonces, each kept until it expires."""
     
     def __init__(self):
-        # Structure: {state: (timestamp, used)}
-        self._states: Dict[str, tuple[float, bool]] = {}
-        self._last_cleanup = datetime.now()
+        # Structure: {nonce: expires_at}, plus a heap ordered by expiry for pruning
+        self._nonces: Dict[bytes, float] = {}
+        self._expiry_heap: List[Tuple[float, bytes]] = []
+        self._lock = threading.Lock()
     
-    def _cleanup_expired_states(self):
-        """Remove expired states to prevent memory bloat."""
-        current_time = datetime.now()
-        
-        # Cleanup every 10 minutes
-        if current_time - self._last_cleanup < timedelta(minutes=10):
-            return
-        
-        cutoff_time = current_time.timestamp() - 1800  # 30 minutes expiry
-        
-        expired_states = [
-            state for state, (timestamp, used) in self._states.items()
-            if timestamp < cutoff_time or used
-        ]
-        
-        for state in expired_states:
-            del self._states[state]
+    def add_if_absent(self, nonce: bytes, ttl_seconds: int) -> bool:
+        """
+        Record a nonce as consumed.
         
-        self._last_cleanup = current_time
+        Returns:
+            bool: True if the nonce had not been consumed before
+        """
+        now = time.time()
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                _, expired = heapq.heappop(self._expiry_heap)
+                del self._nonces[expired]
+            if nonce in self._nonces:
+                return False
+            expires_at = now + ttl_seconds
+            self._nonces[nonce] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, nonce))
+            return True
+    
+    def __len__(self) -> int:
+        return len(self._nonces)
+
+
+class RedisReplaySet:
+    """Consumed OAuth state nonces shared by every worker through ``SET NX EX``."""
+    
+    KEY_PREFIX = "oauth_state"
+    
+    def __init__(self, client: Any = None):
+        """
+        Args:
+            client: redis-py style client; built from REDIS_URL when not given
+        """
+        if client is None:
+            if not settings.REDIS_URL:
+                raise RuntimeError("OAUTH_STATE_REPLAY_BACKEND=redis requires REDIS_URL")
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "OAUTH_STATE_REPLAY_BACKEND=redis requires the 'redis' package"
+                ) from e
+            client = redis.Redis.from_url(settings.REDIS_URL)
+        self._client = client
+    
+    def add_if_absent(self, nonce: bytes, ttl_seconds: int) -> bool:
+        key = f"{self.KEY_PREFIX}:{nonce.hex()}"
+        return bool(self._client.set(key, b"1", nx=True, ex=max(1, ttl_seconds)))
+
+
+def create_replay_set(backend: Optional[str] = None) -> Any:
+    """
+    Build the consumed-nonce set for the configured backend.
+    
+    Raises:
+        RuntimeError: The backend can't be used in this deployment, e.g. the
+            per-process memory set with more than one worker, where a state
+            consumed on one worker could be replayed on another
+    """
+    backend = (backend or settings.OAUTH_STATE_REPLAY_BACKEND).lower()
+    if backend == "redis":
+        return RedisReplaySet()
+    if backend == "memory":
+        if settings.WEB_CONCURRENCY > 1:
+            raise RuntimeError(
+                f"OAUTH_STATE_REPLAY_BACKEND=memory is per process and WEB_CONCURRENCY={settings.WEB_CONCURRENCY}; "
+                "use redis so a consumed OAuth state can't be replayed on another worker"
+            )
+        return InMemoryReplaySet()
+    raise ValueError(f"Unknown OAUTH_STATE_REPLAY_BACKEND: {backend}")
+
+
+class OAuthStateManager:
+    """
+    Stateless OAuth state: issue time and nonce, authenticated with an HMAC.
+    
+    Any worker can verify a state without having issued it, and nothing is
+    stored for logins that are never completed. One-time use is enforced by
+    recording the nonce of each consumed state in a replay set until the
+    state would have expired anyway.
+    """
+    
+    VERSION = 1
+    NONCE_BYTES = 12
+    MAC_BYTES = 16
+    # version (1) | issued_at seconds (4) | nonce (12)
+    _PAYLOAD = struct.Struct(">BI12s")
+    # Tolerated clock difference between workers for states "from the future"
+    MAX_CLOCK_SKEW_SECONDS = 60
+    
+    def __init__(self, secret_key: Optional[str] = None, ttl_seconds: Optional[int] = None, replay_set: Any = None):
+        """
+        Args:
+            secret_key: Signing secret; defaults to SECRET_KEY
+            ttl_seconds: State lifetime; defaults to OAUTH_STATE_TTL_SECONDS
+            replay_set: Consumed-nonce set; built from OAUTH_STATE_REPLAY_BACKEND
+                on first use when not given
+        """
+        secret = secret_key or settings.SECRET_KEY
+        self._key = hashlib.sha256(f"oauth_state:{secret}".encode("utf-8")).digest()
+        self.ttl_seconds = ttl_seconds or settings.OAUTH_STATE_TTL_SECONDS
+        self._replay_set = replay_set
+    
+    @property
+    def replay_set(self) -> Any:
+        # Built lazily, so deployments without Google sign-in don't need Redis
+        if self._replay_set is None:
+            self._replay_set = create_replay_set()
+        return self._replay_set
+    
+    def start(self):
+        """
+        Build the replay set up front when Google sign-in is configured, so a
+        misconfigured backend fails at startup. Called from the app lifespan.
+        """
+        if settings.GOOGLE_CLIENT_ID:
+            self.replay_set
+    
+    def _mac(self, payload: bytes) -> bytes:
+        return hmac.new(self._key, payload, hashlib.sha256).digest()[:self.MAC_BYTES]
     
     def create_state(self) -> str:
         """
@@ -220,12 +363,8 @@ class OAuthStateManager:
         Returns:
             str: New state parameter
         """
-        self._cleanup_expired_states()
-        
-        state = SecurityUtils.generate_secure_state()
-        self._states[state] = (datetime.now().timestamp(), False)
-        
-        return state
+        payload = self._PAYLOAD.pack(self.VERSION, int(time.time()), secrets.token_bytes(self.NONCE_BYTES))
+        return base64.urlsafe_b64encode(payload + self._mac(payload)).rstrip(b"=").decode("ascii")
     
     def validate_and_consume_state(self, state: str) -> bool:
         """
@@ -237,25 +376,30 @@ class OAuthStateManager:
         Returns:
             bool: True if state is valid and unused
         """
-        self._cleanup_expired_states()
-        
-        if not state or state not in self._states:
+        expected_length = self._PAYLOAD.size + self.MAC_BYTES
+        if not state or len(state) > 64:
+            return False
+        try:
+            raw = base64.urlsafe_b64decode(state + "=" * (-len(state) % 4))
+        except (ValueError, TypeError):
+            return False
+        if len(raw) != expected_length:
             return False
         
-        timestamp, used = self._states[state]
-        
-        # Check if already used
-        if used:
+        payload, mac = raw[:self._PAYLOAD.size], raw[self._PAYLOAD.size:]
+        if not hmac.compare_digest(mac, self._mac(payload)):
             return False
         
-        # Check if expired (30 minutes)
-        if datetime.now().timestamp() - timestamp > 1800:
-            del self._states[state]
+        version, issued_at, nonce = self._PAYLOAD.unpack(payload)
+        if version != self.VERSION:
+            return False
+        age = time.time() - issued_at
+        if age > self.ttl_seconds or age < -self.MAX_CLOCK_SKEW_SECONDS:
             return False
         
-        # Mark as used
-        self._states[state] = (timestamp, True)
-        return True
+        # Only needs remembering until the state would be rejected as expired
+        remaining = int(self.ttl_seconds - age) + 1
+        return self.replay_set.add_if_absent(nonce, remaining)
 
 
 # Global instances
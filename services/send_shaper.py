@@ -0,0 +1,203 @@
+"""
+Per-recipient-domain send shaping for outgoing mail.
+
+Large receivers (school and district domains in particular) throttle or
+greylist senders that push too much mail at them at once. Every recipient
+domain gets its own token bucket, a cap on how many pooled SMTP connections
+it may hold at a time, and an exponential pause after the relay answers with
+a 4xx for it. A domain that is rate limited or paused raises DomainDeferred
+straight away instead of making the caller wait, so the outbox can
+reschedule that message and move on to other domains.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from core.config import settings
+
+logger = logging.getLogger("auth_service.send_shaper")
+
+
+class TemporarySendFailure(Exception):
+    """The relay answered with a 4xx; the message may be retried later."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DomainDeferred(TemporarySendFailure):
+    """The message was not sent because its domain is rate limited or paused."""
+
+
+class _DomainState:
+    """Token bucket, connection cap and backoff for one recipient domain."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "slots", "paused_until", "failures", "sent", "deferred")
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.paused_until = 0.0
+        self.failures = 0
+        self.sent = 0
+        self.deferred = 0
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class DomainSendShaper:
+    """Rate limits, connection caps and 4xx backoff keyed by recipient domain."""
+
+    def __init__(
+        self,
+        rate_per_second: float = 5.0,
+        burst: int = 20,
+        max_concurrency: int = 2,
+        max_wait_seconds: float = 2.0,
+        backoff_base_seconds: float = 30.0,
+        backoff_max_seconds: float = 900.0,
+        overrides: Optional[Dict[str, Dict[str, float]]] = None,
+        max_domains: int = 10000
+    ):
+        """
+        Args:
+            rate_per_second: Sustained sends per second per domain
+            burst: Sends allowed back to back before the rate applies
+            max_concurrency: Pooled SMTP connections one domain may use at once
+            max_wait_seconds: Longest a send waits for a token or a connection
+                before it is deferred instead
+            backoff_base_seconds: Pause after the first 4xx for a domain,
+                doubled for each further consecutive 4xx
+            backoff_max_seconds: Upper bound of the pause
+            overrides: Per-domain ``{"rate": ..., "burst": ..., "max_concurrency": ...}``
+            max_domains: Domain states kept; least recently used are dropped
+        """
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_wait_seconds = max_wait_seconds
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.overrides = {domain.lower(): values for domain, values in (overrides or {}).items()}
+        self.max_domains = max_domains
+        # Structure: {domain: _DomainState}, least recently used first
+        self._domains: "OrderedDict[str, _DomainState]" = OrderedDict()
+
+    @staticmethod
+    def domain_of(email: str) -> str:
+        return email.rpartition("@")[2].lower()
+
+    def _state(self, domain: str) -> _DomainState:
+        state = self._domains.get(domain)
+        if state is None:
+            override = self.overrides.get(domain, {})
+            state = _DomainState(
+                rate=float(override.get("rate", self.rate_per_second)),
+                burst=int(override.get("burst", self.burst)),
+                max_concurrency=int(override.get("max_concurrency", self.max_concurrency))
+            )
+            self._domains[domain] = state
+            if len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+        else:
+            self._domains.move_to_end(domain)
+        return state
+
+    def _defer(self, state: _DomainState, domain: str, reason: str, retry_after: float):
+        state.deferred += 1
+        raise DomainDeferred(f"Sending to {domain} deferred: {reason}", retry_after)
+
+    @asynccontextmanager
+    async def slot(self, email: str) -> AsyncIterator[None]:
+        """
+        Reserve a send to email's domain for the duration of the block.
+
+        Raises:
+            DomainDeferred: The domain is paused, out of tokens for longer
+                than max_wait_seconds, or using all its connections
+        """
+        domain = self.domain_of(email)
+        state = self._state(domain)
+        now = time.monotonic()
+        if state.paused_until > now:
+            self._defer(state, domain, "backing off after 4xx", state.paused_until - now)
+
+        state.refill(now)
+        wait = 0.0 if state.tokens >= 1 else (1 - state.tokens) / state.rate
+        if wait > self.max_wait_seconds:
+            self._defer(state, domain, "rate limited", wait)
+        # Take the token now so concurrent senders queue behind this one
+        state.tokens -= 1
+        acquired = False
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+            await asyncio.wait_for(state.slots.acquire(), self.max_wait_seconds)
+            acquired = True
+        except asyncio.TimeoutError:
+            self._defer(state, domain, "all connections busy", self.max_wait_seconds)
+        finally:
+            if not acquired:
+                # Deferred or cancelled before sending, so the token goes back
+                state.tokens = min(state.burst, state.tokens + 1)
+        try:
+            yield
+        finally:
+            state.slots.release()
+
+    def record_success(self, email: str):
+        state = self._state(self.domain_of(email))
+        state.failures = 0
+        state.sent += 1
+
+    def record_temporary_failure(self, email: str) -> float:
+        """Pause the domain after a 4xx. Returns the pause in seconds."""
+        domain = self.domain_of(email)
+        state = self._state(domain)
+        state.failures += 1
+        pause = min(self.backoff_base_seconds * (2 ** (state.failures - 1)), self.backoff_max_seconds)
+        state.paused_until = time.monotonic() + pause
+        logger.warning("Relay deferred mail for %s (%s in a row); pausing %.0fs", domain, state.failures, pause)
+        return pause
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "domains": len(self._domains),
+            "paused": [domain for domain, state in self._domains.items() if state.paused_until > now],
+            "deferred": sum(state.deferred for state in self._domains.values()),
+        }
+
+
+def _parse_overrides(raw: Optional[str]) -> Dict[str, Dict[str, float]]:
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        logger.error("EMAIL_DOMAIN_OVERRIDES is not valid JSON; ignoring it")
+        return {}
+
+
+def create_send_shaper() -> DomainSendShaper:
+    """Build a shaper from the EMAIL_DOMAIN_* settings."""
+    return DomainSendShaper(
+        rate_per_second=settings.EMAIL_DOMAIN_RATE_PER_SECOND,
+        burst=settings.EMAIL_DOMAIN_BURST,
+        max_concurrency=settings.EMAIL_DOMAIN_MAX_CONCURRENCY,
+        max_wait_seconds=settings.EMAIL_DOMAIN_MAX_WAIT_SECONDS,
+        backoff_base_seconds=settings.EMAIL_DOMAIN_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds=settings.EMAIL_DOMAIN_BACKOFF_MAX_SECONDS,
+        overrides=_parse_overrides(settings.EMAIL_DOMAIN_OVERRIDES)
+    )
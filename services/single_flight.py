@@ -0,0 +1,96 @@
+"""
+Single-flight coalescing of concurrent identical calls.
+
+While a call for a key is running, further calls for the same key don't
+start their own; they wait for the running one and get its result (or its
+exception). Nothing is cached once the call finishes. If the caller running
+the call is cancelled (e.g. its client disconnected), the waiting callers
+aren't: one of them runs the call again and the others join it.
+
+Only calls that await while running can be joined; a call that runs to
+completion without yielding to the event loop finishes before anyone else
+gets the chance to arrive.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """Set on the shared future when the caller running the call is cancelled."""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls per key within one process."""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Label for stats
+        """
+        self.name = name
+        # Structure: {key: future of the running call}
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn for key, or join the call already running for key.
+
+        Args:
+            key: Identity of the call
+            fn: Coroutine function producing the result
+
+        Returns:
+            The result of the call that ran for key
+        """
+        running = self._calls.get(key)
+        if running is not None:
+            self.coalesced += 1
+        while running is not None:
+            try:
+                # A follower being cancelled must not cancel the shared call
+                return await asyncio.shield(running)
+            except _LeaderCancelled:
+                # Run it ourselves, or join whoever got there first
+                running = self._calls.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a call nobody joined doesn't log "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
+
+
+# Global instances
+# Concurrent /auth/request-otp and /auth/resend-otp calls per (email, purpose)
+otp_request_flight = SingleFlight("otp_request")
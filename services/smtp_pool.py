@@ -0,0 +1,189 @@
+"""
+Pool of long-lived, authenticated SMTP connections.
+
+Opening an SMTP session costs a TCP connect, the greeting, EHLO, a STARTTLS
+handshake and AUTH before the first message can go out. The pool keeps a
+bounded number of sessions open and sends message after message over each
+of them, checking a connection that has been idle for a while with NOOP
+before reusing it and reconnecting when the server has dropped it.
+"""
+
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional
+
+import aiosmtplib
+
+logger = logging.getLogger("auth_service.smtp_pool")
+
+
+class _PooledConnection:
+    """An open SMTP session and its usage bookkeeping."""
+
+    __slots__ = ("smtp", "last_used", "messages_sent")
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages_sent = 0
+
+
+class SMTPConnectionPool:
+    """Bounded pool of reusable SMTP sessions."""
+
+    # Errors meaning the session is gone rather than the message being refused
+    DISCONNECT_ERRORS = (aiosmtplib.SMTPServerDisconnected, ConnectionError)
+    # The server answered and the session is still usable
+    REFUSAL_ERRORS = (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused)
+
+    def __init__(
+        self,
+        hostname: str,
+        port: Optional[int] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: Optional[bool] = None,
+        validate_certs: bool = True,
+        max_size: int = 4,
+        keepalive_seconds: float = 30,
+        idle_timeout_seconds: float = 240,
+        max_messages_per_connection: int = 100,
+        timeout: float = 30
+    ):
+        """
+        Args:
+            hostname: SMTP server host
+            port: SMTP server port; aiosmtplib picks 25/465/587 when None
+            username: Login user; no AUTH when None
+            password: Login password
+            use_tls: Connect over implicit TLS
+            start_tls: Upgrade with STARTTLS; None upgrades when offered
+            validate_certs: Verify the server certificate
+            max_size: Maximum number of open connections
+            keepalive_seconds: Idle time after which a connection is checked
+                with NOOP before reuse
+            idle_timeout_seconds: Idle time after which a connection is closed
+                instead of reused (relays drop idle sessions after a few minutes)
+            max_messages_per_connection: Messages sent before a connection is
+                recycled; many relays cap this per session
+            timeout: Connect and command timeout in seconds
+        """
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.max_size = max_size
+        self.keepalive_seconds = keepalive_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        # Most recently used last, so warm connections are reused first
+        self._idle: List[_PooledConnection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.reconnects = 0
+        self.keepalive_failures = 0
+
+    async def _open(self) -> _PooledConnection:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout
+        )
+        # Connects, negotiates TLS and logs in when credentials are set
+        await smtp.connect()
+        self.connections_opened += 1
+        return _PooledConnection(smtp)
+
+    async def _discard(self, conn: _PooledConnection):
+        try:
+            if conn.smtp.is_connected:
+                await conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    async def _checkout(self) -> _PooledConnection:
+        """Take a live idle connection, or open a new one."""
+        while self._idle:
+            conn = self._idle.pop()
+            idle_for = time.monotonic() - conn.last_used
+            if not conn.smtp.is_connected or idle_for >= self.idle_timeout_seconds:
+                await self._discard(conn)
+                continue
+            if idle_for >= self.keepalive_seconds:
+                try:
+                    await conn.smtp.noop()
+                except (aiosmtplib.SMTPException, OSError):
+                    self.keepalive_failures += 1
+                    await self._discard(conn)
+                    continue
+            return conn
+        return await self._open()
+
+    async def _checkin(self, conn: _PooledConnection):
+        conn.last_used = time.monotonic()
+        if not conn.smtp.is_connected or conn.messages_sent >= self.max_messages_per_connection:
+            await self._discard(conn)
+        else:
+            self._idle.append(conn)
+
+    async def send_message(self, message: EmailMessage):
+        """
+        Send a message over a pooled connection.
+
+        A connection the server has dropped is replaced and the message is
+        retried once. When the server refuses the message, aiosmtplib resets
+        the envelope and the connection goes back to the pool; any other
+        error closes it, since its SMTP state is unknown.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+        async with self._slots:
+            conn = await self._checkout()
+            try:
+                try:
+                    await conn.smtp.send_message(message)
+                except self.DISCONNECT_ERRORS:
+                    await self._discard(conn)
+                    self.reconnects += 1
+                    conn = await self._open()
+                    await conn.smtp.send_message(message)
+            except self.REFUSAL_ERRORS:
+                await self._checkin(conn)
+                raise
+            except BaseException:
+                await self._discard(conn)
+                raise
+            conn.messages_sent += 1
+            self.messages_sent += 1
+            await self._checkin(conn)
+
+    async def close(self):
+        """Close every idle connection. Call on shutdown."""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._discard(conn)
+        # The next event loop gets a fresh semaphore
+        self._slots = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "idle": len(self._idle),
+            "max_size": self.max_size,
+            "connections_opened": self.connections_opened,
+            "messages_sent": self.messages_sent,
+            "reconnects": self.reconnects,
+            "keepalive_failures": self.keepalive_failures,
+        }
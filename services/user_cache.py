@@ -0,0 +1,341 @@
+"""
+In-process caches in front of user lookups.
+
+UserCache holds authenticated-user records for UserCRUD.get_current_user,
+the by-id read behind get_current_user, /auth/me and /auth/refresh-token.
+NegativeEmailCache remembers emails that have no account, so repeated
+lookups of unknown addresses (enumeration, password spraying) stop reaching
+the database.
+
+Both are bounded by count and age, and UserCRUD writes invalidate them.
+With several workers, an optional Redis pub/sub channel carries
+invalidations between processes; without it, other workers see a change
+within the TTL. That is acceptable for UserCache but not for the negative
+cache, where an account registered on one worker would look absent on the
+others (logins answered generically, no OTP sent), so the negative cache is
+off when WEB_CONCURRENCY > 1 and there is no channel.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.config import settings
+from schemas.user_schema import CurrentUser
+
+logger = logging.getLogger("auth_service.user_cache")
+
+
+class RedisInvalidationChannel:
+    """Broadcasts cache invalidations to every worker over Redis pub/sub."""
+
+    def __init__(self, client: Any = None, channel: str = "auth_service:user_cache:invalidate"):
+        """
+        Args:
+            client: redis-py style client; built from REDIS_URL when not given
+            channel: Pub/sub channel name
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "USER_CACHE_INVALIDATION=redis requires the 'redis' package"
+                ) from e
+            client = redis.Redis.from_url(settings.REDIS_URL)
+        self._client = client
+        self._channel = channel
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, message: str):
+        """Send an invalidation message to every worker."""
+        try:
+            self._client.publish(self._channel, message)
+        except Exception as e:
+            # Other workers fall back to TTL expiry
+            logger.warning("Failed to publish cache invalidation: %s", e)
+
+    def start(self, handler: Callable[[str], None]):
+        """Start a daemon thread that passes messages from other workers to handler."""
+        if self._thread is not None:
+            return
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self._channel)
+
+        def listen():
+            try:
+                for message in self._pubsub.listen():
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode("utf-8")
+                    try:
+                        handler(data)
+                    except (TypeError, ValueError):
+                        continue
+            except Exception as e:
+                # Closed on shutdown, or the connection dropped
+                logger.info("User cache invalidation listener stopped: %s", e)
+
+        self._thread = threading.Thread(target=listen, name="user-cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._pubsub is not None:
+            self._pubsub.close()
+        self._thread = None
+        self._pubsub = None
+
+
+class UserCache:
+    """Bounded LRU + TTL cache of CurrentUser records keyed by user ID."""
+
+    def __init__(self, max_size: int, ttl_seconds: float, channel: Optional[RedisInvalidationChannel] = None):
+        """
+        Args:
+            max_size: Maximum number of cached users
+            ttl_seconds: Maximum age of an entry; 0 disables the cache
+            channel: Optional cross-worker invalidation channel
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.channel = channel
+        # Structure: {user_id: (monotonic_expiry, CurrentUser)}, oldest first
+        self._entries: "OrderedDict[int, Tuple[float, CurrentUser]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a read that raced a write isn't cached
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    @property
+    def version(self) -> int:
+        """Token to pass to set() for a value read from the database now."""
+        return self._version
+
+    def get(self, user_id: int) -> Optional[CurrentUser]:
+        """Get a cached user, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def set(self, user: CurrentUser, version: int):
+        """
+        Cache a user read from the database.
+
+        Args:
+            user: User record to cache
+            version: ``version`` taken before the database read; the value is
+                dropped if an invalidation happened since
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[user.id] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int, broadcast: bool = True):
+        """Drop a user from this worker's cache and, optionally, every other worker's."""
+        with self._lock:
+            self._version += 1
+            self._entries.pop(user_id, None)
+            self.invalidations += 1
+        if broadcast and self.channel is not None:
+            self.channel.publish(f"user:{user_id}")
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters plus current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class NegativeEmailCache:
+    """
+    Bounded TTL set of normalized emails known to have no account.
+    
+    Only short-circuits the lookup: callers get the same None they would get
+    from the database, so responses for unknown emails are unchanged.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, channel: Optional[RedisInvalidationChannel] = None):
+        """
+        Args:
+            max_size: Maximum number of remembered emails (oldest dropped first)
+            ttl_seconds: How long an email is remembered as absent; 0 disables
+            channel: Optional cross-worker invalidation channel
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.channel = channel
+        # Structure: {email: monotonic_expiry}, oldest first
+        self._emails: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    @property
+    def version(self) -> int:
+        """Token to pass to add() for an absence observed in the database now."""
+        return self._version
+
+    def is_known_absent(self, email: str) -> bool:
+        """Whether email was recently looked up and had no account."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            expires_at = self._emails.get(email)
+            if expires_at is None:
+                self.misses += 1
+                return False
+            if expires_at <= time.monotonic():
+                del self._emails[email]
+                self.misses += 1
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, email: str, version: int):
+        """
+        Remember that email has no account.
+        
+        Args:
+            email: Normalized email
+            version: ``version`` taken before the database lookup; the entry
+                is dropped if an account was created since
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            self._emails[email] = time.monotonic() + self.ttl_seconds
+            self._emails.move_to_end(email)
+            while len(self._emails) > self.max_size:
+                self._emails.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, email: str, broadcast: bool = True):
+        """Forget email, e.g. because an account was just created for it."""
+        with self._lock:
+            self._version += 1
+            self._emails.pop(email, None)
+        if broadcast and self.channel is not None:
+            self.channel.publish(f"email:{email}")
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._emails.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._emails),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def _create_invalidation_channel() -> Optional[RedisInvalidationChannel]:
+    if settings.USER_CACHE_INVALIDATION.lower() == "redis":
+        return RedisInvalidationChannel()
+    return None
+
+
+def _negative_email_cache_ttl(channel: Optional[RedisInvalidationChannel]) -> float:
+    """NEGATIVE_EMAIL_CACHE_TTL_SECONDS, or 0 (off) when other workers couldn't be told about new accounts."""
+    ttl = settings.NEGATIVE_EMAIL_CACHE_TTL_SECONDS
+    if ttl > 0 and channel is None and settings.WEB_CONCURRENCY > 1:
+        logger.warning(
+            "Negative email cache disabled: WEB_CONCURRENCY=%d without USER_CACHE_INVALIDATION=redis "
+            "would hide new accounts from other workers for up to %ds",
+            settings.WEB_CONCURRENCY, ttl
+        )
+        return 0
+    return ttl
+
+
+def _apply_invalidation(message: str):
+    """Apply an invalidation published by another worker."""
+    kind, _, value = message.partition(":")
+    if kind == "user":
+        user_cache.invalidate(int(value), broadcast=False)
+    elif kind == "email":
+        negative_email_cache.discard(value, broadcast=False)
+
+
+def start_invalidation_listener():
+    """Start applying invalidations from other workers, if a channel is configured."""
+    if _channel is not None:
+        _channel.start(_apply_invalidation)
+
+
+def stop_invalidation_listener():
+    if _channel is not None:
+        _channel.stop()
+
+
+# Global instances
+_channel = _create_invalidation_channel()
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    channel=_channel
+)
+negative_email_cache = NegativeEmailCache(
+    max_size=settings.NEGATIVE_EMAIL_CACHE_MAX_SIZE,
+    ttl_seconds=_negative_email_cache_ttl(_channel),
+    channel=_channel
+)
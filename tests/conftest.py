@@ -7,17 +7,27 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch
 import sys
 import os
+import tempfile
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 # Add the parent directory to Python path to import modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Tests run on SQLite unless DATABASE_URL says otherwise, so importing the app
+# doesn't need a PostgreSQL driver. Set before the app reads its settings.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'auth_service_tests.db')}")
+# The test app is a single process; tests of the shared replay set use FakeRedis
+os.environ.setdefault("OAUTH_STATE_REPLAY_BACKEND", "memory")
+
 from main import app
-from database.session import Base, get_db
+from database.session import Base, SessionLocal, get_db
 # Import models so they get registered with Base.metadata
 from models.user_model import User
 from models.otp_model import OTP
+from models.email_outbox_model import EmailOutbox
+from services.user_cache import user_cache, negative_email_cache
+from services.email_outbox import email_outbox
 
 
 @pytest.fixture(scope="session")
@@ -51,7 +61,7 @@ def test_db():
     actual_tables = inspector.get_table_names()
     print(f"DEBUG: Actual tables created in database: {actual_tables}")
     
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
     db = TestingSessionLocal()
     
     try:
@@ -82,7 +92,7 @@ def test_client_with_db():
         
         Base.metadata.create_all(bind=engine)
         
-        TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
         
         def override_get_db():
             db = TestingSessionLocal()
@@ -92,6 +102,11 @@ def test_client_with_db():
                 db.close()
         
         app.dependency_overrides[get_db] = override_get_db
+        # User IDs and accounts restart in every test database
+        user_cache.clear()
+        negative_email_cache.clear()
+        # Outbox workers open their own sessions, outside get_db
+        email_outbox.session_factory = TestingSessionLocal
         
         with TestClient(app, follow_redirects=False) as client:
             yield client
@@ -99,6 +114,7 @@ def test_client_with_db():
     finally:
         # Clean up
         app.dependency_overrides.clear()
+        email_outbox.session_factory = SessionLocal
         # Properly dispose of the engine to close all connections
         engine.dispose()
         # Remove temporary database file
@@ -131,3 +147,112 @@ def mock_settings(mock_google_client_id):
         mock_settings_obj.ACCESS_TOKEN_EXPIRE_MINUTES = 30
         mock_settings_obj.REFRESH_TOKEN_EXPIRE_DAYS = 7
         yield mock_settings_obj
+
+
+@pytest.fixture
+def fake_redis():
+    """
+    In-process Redis-protocol fake.
+    """
+    from tests.fakes import FakeRedis
+    return FakeRedis()
+
+
+@pytest.fixture
+def redis_otp_service(fake_redis):
+    """
+    OTPService backed by the Redis OTP store talking to the local fake.
+    """
+    from services.otp_service import OTPService
+    from services.otp_store import RedisOTPStore
+    return OTPService(store=RedisOTPStore(client=fake_redis))
+
+
+@pytest.fixture
+def smtp_sink():
+    """
+    Local SMTP sink on a background thread, with the email settings pointed
+    at it so EmailService delivers there instead of printing.
+    """
+    from core.config import settings
+    from services.email_service import email_service
+    from tests.fakes import SMTPSinkController
+    
+    controller = SMTPSinkController()
+    sink = controller.start()
+    overrides = {
+        "EMAIL_HOST": sink.host,
+        "EMAIL_PORT": sink.port,
+        "EMAIL_USERNAME": "sink",
+        "EMAIL_PASSWORD": "sink",
+        "EMAIL_FROM": "noreply@example.com",
+        "EMAIL_STARTTLS": False,
+        "EMAIL_SSL_TLS": False,
+    }
+    original = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    # Connections are bound to the old settings
+    email_service._pool = None
+    try:
+        yield controller
+    finally:
+        for name, value in original.items():
+            setattr(settings, name, value)
+        email_service._pool = None
+        controller.stop()
+
+
+@pytest.fixture
+def google_id_tokens(mock_google_client_id):
+    """
+    Local Google ID-token issuer whose JWKS replaces the network fetch, with
+    GOOGLE_CLIENT_ID set to match the tokens it signs.
+    """
+    from core.config import settings
+    from services.google_id_token import google_jwks
+    from tests.fakes import GoogleIDTokenIssuer
+    
+    issuer = GoogleIDTokenIssuer(client_id=mock_google_client_id)
+    original_fetch, original_client_id = google_jwks.fetch, settings.GOOGLE_CLIENT_ID
+    google_jwks.fetch = issuer.fetch
+    google_jwks.clear()
+    settings.GOOGLE_CLIENT_ID = mock_google_client_id
+    try:
+        yield issuer
+    finally:
+        google_jwks.fetch = original_fetch
+        google_jwks.clear()
+        settings.GOOGLE_CLIENT_ID = original_client_id
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Context manager asserting a maximum SQL statement count per request:
+    ``with query_budget(1): client.get("/auth/me", ...)``.
+    """
+    from tests.query_budget import assert_max_queries
+    return assert_max_queries
+
+
+@pytest.fixture
+def google_token_endpoint(google_id_tokens):
+    """
+    Google's token endpoint served in-process: the shared Google HTTP client
+    is rebuilt on a mock transport that answers code exchanges with ID
+    tokens from google_id_tokens.
+    """
+    from services.http_client import google_http
+    from tests.fakes import GoogleTokenEndpoint
+    
+    endpoint = GoogleTokenEndpoint(google_id_tokens)
+    original_options = google_http._client_options
+    google_http._client_options = {**original_options, "transport": endpoint.transport()}
+    # Rebuilt with the transport on next use
+    google_http._client = None
+    try:
+        yield endpoint
+    finally:
+        google_http._client_options = original_options
+        google_http._client = None
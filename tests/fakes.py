@@ -0,0 +1,438 @@
+"""
+Local stand-ins for external services used in tests and benchmarks.
+"""
+
+import asyncio
+import threading
+import time
+from email import message_from_bytes
+from email.message import Message
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FakeRedis:
+    """
+    Minimal in-process Redis replacement.
+    
+    Implements only the redis-py calls used by the service (``set`` with
+    ``ex``/``nx``, ``get``, ``getdel``, ``delete``, ``publish``, ``pubsub``)
+    with real expiry semantics. Clients sharing one FakeRedis stand in for
+    several workers talking to the same server.
+    """
+    
+    def __init__(self):
+        # Structure: {key: (value, expires_at_monotonic or None)}
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._subscribers: List["FakePubSub"] = []
+        self._subscribers_lock = threading.Lock()
+    
+    def _alive(self, key: str) -> bool:
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        _, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return False
+        return True
+    
+    def set(self, name: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        if nx and self._alive(name):
+            return None
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        expires_at = time.monotonic() + ex if ex else None
+        self._data[name] = (value, expires_at)
+        return True
+    
+    def get(self, name: str) -> Optional[bytes]:
+        if not self._alive(name):
+            return None
+        return self._data[name][0]
+    
+    def getdel(self, name: str) -> Optional[bytes]:
+        # A single pop, so concurrent callers can't both get the value
+        entry = self._data.pop(name, None)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            return None
+        return value
+    
+    def delete(self, *names: str) -> int:
+        deleted = 0
+        for name in names:
+            if self._alive(name):
+                del self._data[name]
+                deleted += 1
+        return deleted
+    
+    def ttl(self, name: str) -> int:
+        if not self._alive(name):
+            return -2
+        _, expires_at = self._data[name]
+        if expires_at is None:
+            return -1
+        return int(expires_at - time.monotonic())
+    
+    def publish(self, channel: str, message: Any) -> int:
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        with self._subscribers_lock:
+            receivers = [pubsub for pubsub in self._subscribers if channel in pubsub.channels]
+        for pubsub in receivers:
+            pubsub._queue.put({"type": "message", "channel": channel.encode("utf-8"), "data": message})
+        return len(receivers)
+    
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> "FakePubSub":
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    """redis-py style PubSub on a FakeRedis: ``subscribe``, a blocking ``listen`` and ``close``."""
+    
+    def __init__(self, server: FakeRedis):
+        import queue
+        
+        self._server = server
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self.channels: set = set()
+    
+    def subscribe(self, *channels: str):
+        self.channels.update(channels)
+        with self._server._subscribers_lock:
+            if self not in self._server._subscribers:
+                self._server._subscribers.append(self)
+    
+    def listen(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            yield message
+    
+    def close(self):
+        with self._server._subscribers_lock:
+            if self in self._server._subscribers:
+                self._server._subscribers.remove(self)
+        self._queue.put(None)
+
+
+class SMTPSink:
+    """
+    Local SMTP server that accepts and keeps every message.
+    
+    Speaks enough ESMTP for aiosmtplib (EHLO, AUTH PLAIN/LOGIN accepted with
+    any credentials, MAIL, RCPT, DATA, RSET, NOOP, QUIT). ``command_delay``
+    adds a fixed delay before every reply to stand in for a remote relay's
+    round trip time. ``fail_every`` answers every Nth message with
+    ``fail_reply`` instead of accepting it, to exercise retries, and
+    recipients in ``greylist_domains`` are always refused with a 450.
+    
+        sink = SMTPSink()
+        await sink.start()
+        ... send to ("127.0.0.1", sink.port) ...
+        await sink.stop()
+    
+    Use SMTPSinkController to run it on its own thread next to synchronous
+    code such as TestClient.
+    """
+    
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        command_delay: float = 0.0,
+        fail_every: int = 0,
+        fail_reply: str = "451 4.3.0 Temporary local problem, try again",
+        greylist_domains: Optional[List[str]] = None
+    ):
+        self.host = host
+        self.port = port
+        self.command_delay = command_delay
+        self.fail_every = fail_every
+        self.fail_reply = fail_reply
+        self.greylist_domains = {domain.lower() for domain in greylist_domains or []}
+        self.messages: List[Message] = []
+        # time.monotonic() at which each message in ``messages`` was accepted
+        self.received_at: List[float] = []
+        self.connections = 0
+        self.commands = 0
+        self.attempts = 0
+        self.rejected = 0
+        self.greylisted = 0
+        self.noops = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers = set()
+        self._handlers = set()
+    
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def stop(self):
+        """Stop listening and drop open sessions, like a relay restart."""
+        for writer in list(self._writers):
+            writer.close()
+        # Sessions in the middle of a delayed reply don't see the close
+        for handler in list(self._handlers):
+            handler.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    async def drop_connections(self):
+        """Close open sessions but keep listening, like a relay's idle cutoff."""
+        for writer in list(self._writers):
+            writer.close()
+    
+    def messages_to(self, recipient: str) -> List[Message]:
+        return [message for message in self.messages if message["To"] == recipient]
+    
+    async def _reply(self, writer: asyncio.StreamWriter, line: str):
+        if self.command_delay:
+            await asyncio.sleep(self.command_delay)
+        writer.write(line.encode("ascii") + b"\r\n")
+        await writer.drain()
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            await self._reply(writer, "220 smtp-sink ESMTP ready")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.commands += 1
+                command = line.decode("utf-8", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    await self._reply(writer, "250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+                elif verb == "HELO":
+                    await self._reply(writer, "250 smtp-sink")
+                elif verb == "AUTH":
+                    if command.upper() == "AUTH LOGIN":
+                        # Username and password prompts
+                        await self._reply(writer, "334 VXNlcm5hbWU6")
+                        await reader.readline()
+                        await self._reply(writer, "334 UGFzc3dvcmQ6")
+                        await reader.readline()
+                    await self._reply(writer, "235 2.7.0 Authentication successful")
+                elif verb == "RCPT" and command.rstrip(">").rpartition("@")[2].lower() in self.greylist_domains:
+                    self.greylisted += 1
+                    await self._reply(writer, "450 4.2.0 Greylisted, please try again later")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    if verb == "NOOP":
+                        self.noops += 1
+                    await self._reply(writer, "250 OK")
+                elif verb == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    data = await reader.readuntil(b"\r\n.\r\n")
+                    self.attempts += 1
+                    if self.fail_every and self.attempts % self.fail_every == 0:
+                        self.rejected += 1
+                        await self._reply(writer, self.fail_reply)
+                        continue
+                    self.messages.append(message_from_bytes(data[:-5].replace(b"\r\n..", b"\r\n.")))
+                    self.received_at.append(time.monotonic())
+                    await self._reply(writer, "250 OK: queued")
+                elif verb == "QUIT":
+                    await self._reply(writer, "221 Bye")
+                    break
+                else:
+                    await self._reply(writer, "502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+
+class SMTPSinkController:
+    """
+    Runs an SMTPSink on a background event loop thread (like aiosmtpd's
+    Controller), for tests and benchmarks that aren't async themselves.
+    
+        controller = SMTPSinkController(SMTPSink())
+        controller.start()
+        ... send to ("127.0.0.1", controller.sink.port) ...
+        controller.stop()
+    """
+    
+    def __init__(self, sink: Optional[SMTPSink] = None):
+        self.sink = sink or SMTPSink()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> SMTPSink:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.sink.start(), self._loop).result(timeout=5)
+        return self.sink
+    
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.sink.stop(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+    
+    def drop_connections(self):
+        """Close the sink's open sessions and wait until they are closed."""
+        asyncio.run_coroutine_threadsafe(self.sink.drop_connections(), self._loop).result(timeout=5)
+    
+    def wait_for_messages(self, count: int, timeout: float = 5.0) -> bool:
+        """Block until the sink has accepted ``count`` messages."""
+        deadline = time.monotonic() + timeout
+        while len(self.sink.messages) < count:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+class GoogleIDTokenIssuer:
+    """
+    Local stand-in for Google's ID-token signing: holds RSA keys, serves
+    them as a JWKS through ``fetch`` (the JWKSCache fetch hook) and signs
+    ID tokens with them.
+    
+        issuer = GoogleIDTokenIssuer(client_id="test-client")
+        google_jwks.fetch = issuer.fetch
+        token = issuer.issue(sub="123", email="a@example.com")
+    """
+    
+    ISSUER = "https://accounts.google.com"
+    
+    def __init__(self, client_id: str, max_age: Optional[float] = 3600, fetch_delay: float = 0.0):
+        self.client_id = client_id
+        self.max_age = max_age
+        self.fetch_delay = fetch_delay
+        # Structure: {kid: PEM private key}, newest last
+        self._keys: Dict[str, bytes] = {}
+        self._public: Dict[str, Dict[str, Any]] = {}
+        self.fetches = 0
+        self.fail_fetches = False
+        self.rotate()
+    
+    def rotate(self, retire_old: bool = False) -> str:
+        """Add a new signing key (optionally dropping the others); returns its kid."""
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from jose import jwk
+        
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        kid = f"test-key-{len(self._keys) + 1}"
+        if retire_old:
+            self._keys.clear()
+            self._public.clear()
+        self._keys[kid] = pem
+        public = jwk.construct(pem, "RS256").public_key().to_dict()
+        self._public[kid] = {**public, "kid": kid, "use": "sig", "alg": "RS256"}
+        return kid
+    
+    @property
+    def current_kid(self) -> str:
+        return next(reversed(self._keys))
+    
+    def jwks(self) -> Dict[str, Any]:
+        return {"keys": list(self._public.values())}
+    
+    async def fetch(self) -> Tuple[Dict[str, Any], Optional[float]]:
+        self.fetches += 1
+        if self.fetch_delay:
+            await asyncio.sleep(self.fetch_delay)
+        if self.fail_fetches:
+            raise ConnectionError("JWKS stand-in is unavailable")
+        return self.jwks(), self.max_age
+    
+    def issue(
+        self,
+        sub: str,
+        email: str,
+        name: str = "",
+        email_verified: bool = True,
+        kid: Optional[str] = None,
+        expires_in: int = 3600,
+        access_token: Optional[str] = None,
+        **claims: Any
+    ) -> str:
+        """Sign an ID token with the given (or newest) key; ``access_token`` adds its ``at_hash``."""
+        from jose import jwt
+        
+        kid = kid or self.current_kid
+        now = int(time.time())
+        payload = {
+            "iss": self.ISSUER,
+            "aud": self.client_id,
+            "sub": sub,
+            "email": email,
+            "email_verified": email_verified,
+            "name": name,
+            "iat": now,
+            "exp": now + expires_in,
+        }
+        payload.update(claims)
+        return jwt.encode(
+            payload, self._keys[kid].decode("ascii"), algorithm="RS256", headers={"kid": kid}, access_token=access_token
+        )
+
+
+class GoogleTokenEndpoint:
+    """
+    Stand-in for Google's OAuth token endpoint, served through an
+    httpx.MockTransport. Authorization codes map to the ID-token claims the
+    exchange returns, signed by a GoogleIDTokenIssuer.
+    
+        endpoint = GoogleTokenEndpoint(issuer)
+        code = endpoint.authorize(sub="123", email="a@example.com")
+        ... GET /auth/google/callback?code=<code>&state=<state> ...
+    """
+    
+    def __init__(self, issuer: GoogleIDTokenIssuer):
+        self.issuer = issuer
+        # Structure: {code: ID-token claims}
+        self._codes: Dict[str, Dict[str, Any]] = {}
+        self.exchanges = 0
+    
+    def authorize(self, sub: str, email: str, **claims: Any) -> str:
+        """Register a one-time authorization code for a Google account."""
+        code = f"code-{len(self._codes) + 1}"
+        self._codes[code] = {"sub": sub, "email": email, **claims}
+        return code
+    
+    def handle(self, request: Any) -> Any:
+        import httpx
+        from urllib.parse import parse_qs
+        
+        self.exchanges += 1
+        form = parse_qs(request.content.decode("ascii"))
+        claims = self._codes.pop(form.get("code", [""])[0], None)
+        if claims is None:
+            return httpx.Response(400, json={"error": "invalid_grant"})
+        access_token = f"ya29.{self.exchanges}"
+        return httpx.Response(200, json={
+            "access_token": access_token,
+            "id_token": self.issuer.issue(access_token=access_token, **claims),
+            "expires_in": 3599,
+            "token_type": "Bearer",
+        })
+    
+    def transport(self) -> Any:
+        import httpx
+        return httpx.MockTransport(self.handle)
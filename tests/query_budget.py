@@ -0,0 +1,61 @@
+"""
+Query budget assertions for endpoint tests.
+
+    with assert_max_queries(1):
+        client.get("/auth/me", headers=auth_headers)
+
+fails the test if any request made inside the block issued more than one
+SQL statement, listing the statements it ran, so a new round trip on a hot
+path is caught by the suite rather than in production latency.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from database.query_log import RequestQueries, add_request_observer, remove_request_observer
+
+
+class QueryBudget:
+    """Requests observed inside an assert_max_queries block."""
+
+    def __init__(self, limit: int, route: Optional[str] = None):
+        self.limit = limit
+        self.route = route
+        # Structure: [(method, route, statement count, statements)]
+        self.requests: List[Tuple[str, str, int, List[str]]] = []
+
+    def _observe(self, method: str, route: str, queries: RequestQueries):
+        if self.route is None or route == self.route:
+            self.requests.append((method, route, queries.count, list(queries.statements)))
+
+    def check(self):
+        if not self.requests:
+            target = self.route or "any route"
+            raise AssertionError(f"No requests to {target} were made inside the query budget block")
+        for method, route, count, statements in self.requests:
+            if count > self.limit:
+                listing = "\n".join(f"  {index}. {statement}" for index, statement in enumerate(statements, 1))
+                raise AssertionError(
+                    f"{method} {route} issued {count} SQL statements, budget is {self.limit}:\n{listing}"
+                )
+
+
+@contextmanager
+def assert_max_queries(limit: int, route: Optional[str] = None) -> Iterator[QueryBudget]:
+    """
+    Assert that each request made inside the block issues at most ``limit`` statements.
+
+    Args:
+        limit: Maximum SQL statements per request
+        route: Only check requests to this route template (e.g. "/auth/me")
+
+    Raises:
+        AssertionError: A request went over budget, or no matching request was made
+    """
+    budget = QueryBudget(limit, route)
+    add_request_observer(budget._observe)
+    try:
+        yield budget
+    finally:
+        remove_request_observer(budget._observe)
+    budget.check()
@@ -0,0 +1,271 @@
+"""
+Tests for email outbox delivery, retries, leases and retention.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.config import settings
+from database.session import Base
+from models.email_outbox_model import EmailOutbox
+from services import email_outbox as email_outbox_module
+from services.email_outbox import EmailOutboxService
+from services.email_service import email_service
+from services.send_shaper import DomainDeferred, TemporarySendFailure
+
+RECIPIENT = "user@example.com"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A file database: the senders write from worker threads, which an
+    # in-memory SQLite database doesn't share
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as db:
+        yield db
+
+
+@pytest.fixture
+def outbox(session_factory):
+    return EmailOutboxService(session_factory=session_factory)
+
+
+@pytest.fixture
+def sends(monkeypatch):
+    """
+    Records each send; an exception put in ``sends.outcomes`` is raised by
+    the next send instead.
+    """
+    class Sends(list):
+        outcomes = []
+
+    sends = Sends()
+
+    async def send_otp_email(email, otp_code, user_name=None, purpose="verification", locale=None):
+        sends.append((email, otp_code))
+        if sends.outcomes:
+            raise sends.outcomes.pop(0)
+
+    monkeypatch.setattr(email_service, "send_otp_email", send_otp_email)
+    return sends
+
+
+@pytest.fixture
+def fixed_jitter(monkeypatch):
+    monkeypatch.setattr(email_outbox_module.random, "uniform", lambda low, high: 1.0)
+
+
+def enqueue(outbox: EmailOutboxService, db) -> int:
+    outbox.enqueue_otp_email(db, RECIPIENT, "123456", "User", "verification")
+    db.commit()
+    return db.query(EmailOutbox).one().id
+
+
+def load(db, message_id: int) -> EmailOutbox:
+    db.expire_all()
+    return db.get(EmailOutbox, message_id)
+
+
+def deliver_next(outbox: EmailOutboxService):
+    (message,) = outbox._claim_batch()
+    asyncio.run(outbox._deliver(message))
+    return message
+
+
+def seconds_until(moment: datetime) -> float:
+    return (moment - datetime.utcnow()).total_seconds()
+
+
+def test_delivered_message_is_marked_sent(outbox, db, sends):
+    message_id = enqueue(outbox, db)
+
+    deliver_next(outbox)
+
+    message = load(db, message_id)
+    assert sends == [(RECIPIENT, "123456")]
+    assert message.status == "sent"
+    assert message.payload is None
+    assert message.sent_at is not None
+
+
+def test_failed_send_is_retried_with_backoff(outbox, db, sends, fixed_jitter):
+    message_id = enqueue(outbox, db)
+    sends.outcomes = [ConnectionError("connection refused")]
+
+    deliver_next(outbox)
+
+    message = load(db, message_id)
+    assert message.status == "pending"
+    assert message.attempts == 1
+    assert message.last_error == "connection refused"
+    assert seconds_until(message.next_attempt_at) == pytest.approx(settings.EMAIL_OUTBOX_BASE_BACKOFF_SECONDS, abs=1)
+
+
+def test_retry_delay_doubles_up_to_the_cap(outbox, monkeypatch, fixed_jitter):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_BASE_BACKOFF_SECONDS", 5.0)
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_MAX_BACKOFF_SECONDS", 30.0)
+
+    assert [outbox.retry_delay(attempts) for attempts in range(1, 6)] == [5.0, 10.0, 20.0, 30.0, 30.0]
+
+
+def test_retry_delay_jitter_stays_within_twenty_percent(outbox, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_BASE_BACKOFF_SECONDS", 10.0)
+
+    delays = [outbox.retry_delay(1) for _ in range(200)]
+
+    assert 8.0 <= min(delays) and max(delays) <= 12.0
+
+
+def test_server_retry_after_outlasts_backoff(outbox, db, sends, fixed_jitter):
+    message_id = enqueue(outbox, db)
+    sends.outcomes = [TemporarySendFailure("421 try again later", retry_after=120)]
+
+    deliver_next(outbox)
+
+    assert seconds_until(load(db, message_id).next_attempt_at) == pytest.approx(120, abs=1)
+
+
+def test_last_attempt_moves_message_to_dead_letter(outbox, db, sends, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+    message_id = enqueue(outbox, db)
+    sends.outcomes = [ConnectionError("refused"), ConnectionError("still refused")]
+
+    deliver_next(outbox)
+    db.query(EmailOutbox).update({"next_attempt_at": datetime.utcnow()})
+    db.commit()
+    deliver_next(outbox)
+
+    message = load(db, message_id)
+    assert len(sends) == 2
+    assert message.status == "dead"
+    assert message.attempts == 2
+    assert message.payload is None
+    assert message.last_error == "still refused"
+
+
+def test_deferred_send_does_not_use_an_attempt(outbox, db, sends):
+    message_id = enqueue(outbox, db)
+    sends.outcomes = [DomainDeferred("example.com is throttled", retry_after=30)]
+
+    deliver_next(outbox)
+
+    message = load(db, message_id)
+    assert message.status == "pending"
+    assert message.attempts == 0
+    assert seconds_until(message.next_attempt_at) == pytest.approx(30, abs=1)
+
+
+def test_expired_otp_is_not_sent(outbox, db, sends):
+    message_id = enqueue(outbox, db)
+    db.query(EmailOutbox).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    deliver_next(outbox)
+
+    message = load(db, message_id)
+    assert sends == []
+    assert message.status == "dead"
+    assert message.payload is None
+
+
+def test_message_reclaimed_after_lease_is_sent_once(outbox, db, sends, monkeypatch):
+    message_id = enqueue(outbox, db)
+    # Sender A's lease has already run out by the time it gets to the message
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", -1)
+    (stale,) = outbox._claim_batch()
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", 60)
+    (current,) = outbox._claim_batch()
+
+    asyncio.run(outbox._deliver(stale))
+    asyncio.run(outbox._deliver(current))
+
+    assert len(sends) == 1
+    message = load(db, message_id)
+    assert message.status == "sent"
+    assert message.attempts == 2
+
+
+def test_stale_claim_cannot_overwrite_the_new_owner(outbox, db, sends, monkeypatch):
+    message_id = enqueue(outbox, db)
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", -1)
+    (stale,) = outbox._claim_batch()
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", 60)
+    outbox._claim_batch()
+
+    assert outbox._mark_failed(stale["id"], stale["attempts"], "late failure", None) is False
+    assert outbox._defer(stale["id"], stale["attempts"], datetime.utcnow()) is False
+    assert outbox._mark_sent(stale["id"], stale["attempts"]) is False
+    message = load(db, message_id)
+    assert message.status == "sending"
+    assert message.attempts == 2
+    assert message.last_error is None
+
+
+def test_lease_is_renewed_before_each_send(outbox, db, monkeypatch):
+    message_id = enqueue(outbox, db)
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", -1)
+    (message,) = outbox._claim_batch()
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", 60)
+    reclaimed_during_send = []
+
+    async def send_otp_email(email, otp_code, user_name=None, purpose="verification", locale=None):
+        # Another sender polls while this one is sending
+        reclaimed_during_send.append(outbox._claim_batch())
+
+    monkeypatch.setattr(email_service, "send_otp_email", send_otp_email)
+
+    asyncio.run(outbox._deliver(message))
+
+    assert reclaimed_during_send == [[]]
+    assert load(db, message_id).status == "sent"
+
+
+def add_message(db, status: str, age_hours: float) -> EmailOutbox:
+    at = datetime.utcnow() - timedelta(hours=age_hours)
+    message = EmailOutbox(
+        recipient=RECIPIENT,
+        purpose="verification",
+        status=status,
+        attempts=1,
+        next_attempt_at=at,
+        created_at=at,
+        sent_at=at if status == "sent" else None
+    )
+    db.add(message)
+    db.commit()
+    return message
+
+
+def test_purge_deletes_only_finished_messages_past_retention(outbox, db):
+    retention = settings.EMAIL_OUTBOX_RETENTION_HOURS
+    old_sent = add_message(db, "sent", retention + 1)
+    old_dead = add_message(db, "dead", retention + 1)
+    recent_sent = add_message(db, "sent", 0.1)
+    old_pending = add_message(db, "pending", retention + 1)
+    old_sending = add_message(db, "sending", retention + 1)
+
+    assert outbox.purge() == 2
+
+    remaining = {message.id for message in db.query(EmailOutbox)}
+    assert remaining == {recent_sent.id, old_pending.id, old_sending.id}
+    assert old_sent.id not in remaining and old_dead.id not in remaining
+
+
+def test_purge_works_through_a_backlog_in_batches(outbox, db, monkeypatch):
+    monkeypatch.setattr(EmailOutboxService, "PURGE_BATCH_SIZE", 3)
+    for _ in range(7):
+        add_message(db, "sent", settings.EMAIL_OUTBOX_RETENTION_HOURS + 1)
+
+    assert outbox.purge() == 7
+    assert db.query(EmailOutbox).count() == 0
@@ -0,0 +1,166 @@
+"""
+Tests for Google ID-token verification and the OAuth callback built on it.
+"""
+
+import asyncio
+import base64
+import json
+import time
+
+import pytest
+from jose import jwt
+
+from services.google_id_token import GoogleIDTokenVerifier, IDTokenError, JWKSCache, JWKSUnavailable
+from services.security_service import oauth_state_manager
+from tests.fakes import GoogleIDTokenIssuer
+
+CLIENT_ID = "test_google_client_id_123456789"
+
+
+@pytest.fixture
+def issuer():
+    return GoogleIDTokenIssuer(client_id=CLIENT_ID)
+
+
+@pytest.fixture
+def verifier(issuer):
+    return GoogleIDTokenVerifier(JWKSCache(fetch=issuer.fetch, min_refetch_interval_seconds=60), client_id=CLIENT_ID)
+
+
+def verify(verifier: GoogleIDTokenVerifier, id_token: str, access_token: str = None):
+    return asyncio.run(verifier.verify(id_token, access_token=access_token))
+
+
+def b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode("ascii")
+
+
+def test_valid_token_is_accepted(verifier, issuer):
+    claims = verify(verifier, issuer.issue(sub="123", email="user@example.com", access_token="ya29.a"), "ya29.a")
+
+    assert claims["sub"] == "123"
+    assert claims["email"] == "user@example.com"
+    assert issuer.fetches == 1
+
+
+def test_bad_signature_is_rejected(verifier, issuer):
+    # Same kid as the real key, different private key
+    forger = GoogleIDTokenIssuer(client_id=CLIENT_ID)
+
+    with pytest.raises(IDTokenError):
+        verify(verifier, forger.issue(sub="123", email="user@example.com", kid=issuer.current_kid))
+
+
+def test_wrong_audience_is_rejected(verifier, issuer):
+    with pytest.raises(IDTokenError):
+        verify(verifier, issuer.issue(sub="123", email="user@example.com", aud="another-client"))
+
+
+def test_wrong_issuer_is_rejected(verifier, issuer):
+    with pytest.raises(IDTokenError):
+        verify(verifier, issuer.issue(sub="123", email="user@example.com", iss="https://evil.example.com"))
+
+
+def test_expired_token_is_rejected(verifier, issuer, monkeypatch):
+    from core.config import settings
+    monkeypatch.setattr(settings, "GOOGLE_ID_TOKEN_LEEWAY_SECONDS", 10)
+
+    with pytest.raises(IDTokenError):
+        verify(verifier, issuer.issue(sub="123", email="user@example.com", expires_in=-11))
+    # Inside the leeway
+    assert verify(verifier, issuer.issue(sub="123", email="user@example.com", expires_in=-5))["sub"] == "123"
+
+
+def test_unknown_kid_refetches_at_most_once_per_interval(verifier, issuer):
+    verify(verifier, issuer.issue(sub="123", email="user@example.com"))
+    stranger = GoogleIDTokenIssuer(client_id=CLIENT_ID)
+    stranger.rotate()
+
+    for _ in range(5):
+        with pytest.raises(IDTokenError, match="Unknown signing key"):
+            verify(verifier, stranger.issue(sub="123", email="user@example.com", kid="test-key-2"))
+    # The keys were fetched just now, so made-up kids don't trigger fetches
+    assert issuer.fetches == 1
+
+    verifier.jwks._fetched_at = time.monotonic() - 61
+    with pytest.raises(IDTokenError, match="Unknown signing key"):
+        verify(verifier, stranger.issue(sub="123", email="user@example.com", kid="test-key-2"))
+    assert issuer.fetches == 2
+
+
+def test_rotated_key_is_fetched_once(verifier, issuer):
+    verify(verifier, issuer.issue(sub="123", email="user@example.com"))
+    verifier.jwks._fetched_at = time.monotonic() - 61
+    issuer.rotate()
+
+    assert verify(verifier, issuer.issue(sub="123", email="user@example.com"))["sub"] == "123"
+    assert issuer.fetches == 2
+
+
+def test_alg_none_is_rejected(verifier, issuer):
+    now = int(time.time())
+    payload = {"iss": issuer.ISSUER, "aud": CLIENT_ID, "sub": "123", "iat": now, "exp": now + 3600}
+    token = f"{b64({'alg': 'none', 'kid': issuer.current_kid})}.{b64(payload)}."
+
+    with pytest.raises(IDTokenError, match="algorithm"):
+        verify(verifier, token)
+    assert issuer.fetches == 0
+
+
+def test_hs256_is_rejected(verifier, issuer):
+    now = int(time.time())
+    payload = {"iss": issuer.ISSUER, "aud": CLIENT_ID, "sub": "123", "iat": now, "exp": now + 3600}
+    token = jwt.encode(payload, "secret", algorithm="HS256", headers={"kid": issuer.current_kid})
+
+    with pytest.raises(IDTokenError, match="algorithm"):
+        verify(verifier, token)
+
+
+def test_mismatched_at_hash_is_rejected(verifier, issuer):
+    token = issuer.issue(sub="123", email="user@example.com", access_token="ya29.real")
+
+    with pytest.raises(IDTokenError):
+        verify(verifier, token, "ya29.other")
+
+
+def test_keys_that_never_loaded_raise_unavailable(verifier, issuer):
+    issuer.fail_fetches = True
+
+    with pytest.raises(JWKSUnavailable):
+        verify(verifier, issuer.issue(sub="123", email="user@example.com"))
+
+
+def test_callback_signs_in_a_google_user(test_client_with_db, google_token_endpoint):
+    code = google_token_endpoint.authorize(sub="google-123", email="google@example.com", name="Google User")
+
+    response = test_client_with_db.get(
+        "/auth/google/callback", params={"code": code, "state": oauth_state_manager.create_state()}
+    )
+
+    assert response.status_code == 302
+    assert "access_token=" in response.headers["location"]
+    assert google_token_endpoint.exchanges == 1
+
+
+def test_callback_rejects_an_invalid_id_token(test_client_with_db, google_token_endpoint):
+    code = google_token_endpoint.authorize(sub="google-123", email="google@example.com", aud="another-client")
+
+    response = test_client_with_db.get(
+        "/auth/google/callback", params={"code": code, "state": oauth_state_manager.create_state()}
+    )
+
+    assert response.status_code == 401
+
+
+def test_callback_returns_503_when_keys_were_never_fetched(test_client_with_db, google_token_endpoint):
+    from services.google_id_token import google_jwks
+
+    google_token_endpoint.issuer.fail_fetches = True
+    google_jwks.clear()
+    code = google_token_endpoint.authorize(sub="google-123", email="google@example.com")
+
+    response = test_client_with_db.get(
+        "/auth/google/callback", params={"code": code, "state": oauth_state_manager.create_state()}
+    )
+
+    assert response.status_code == 503
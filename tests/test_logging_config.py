@@ -0,0 +1,154 @@
+"""
+Tests for the JSON log format, access-log sampling and the queued writer.
+"""
+
+import json
+import logging
+import sys
+
+import pytest
+
+from core import logging_config
+from core.config import settings
+from core.logging_config import JSONFormatter, SamplingFilter, configure_logging, stop_logging
+from core.tracing import InMemorySpanExporter, tracer_provider
+
+
+def make_record(level: int = logging.INFO, msg: str = "hello %s", args=("world",), **extra) -> logging.LogRecord:
+    record = logging.LogRecord("auth_service.tests", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_emits_one_object_per_record():
+    entry = json.loads(JSONFormatter().format(make_record()))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "auth_service.tests"
+    assert entry["message"] == "hello world"
+    assert entry["ts"].endswith("+00:00")
+
+
+def test_json_formatter_includes_extra_fields():
+    record = make_record(route="/auth/login", status_code=200, elapsed=object(), _private="hidden")
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["route"] == "/auth/login"
+    assert entry["status_code"] == 200
+    # Values json can't encode are written as their str()
+    assert entry["elapsed"].startswith("<object object")
+    assert "_private" not in entry
+    assert "args" not in entry and "levelno" not in entry
+
+
+def test_json_formatter_includes_the_traceback():
+    try:
+        raise ValueError("bad input")
+    except ValueError:
+        record = logging.LogRecord("auth_service.tests", logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["message"] == "failed"
+    assert entry["exc_info"].startswith("Traceback")
+    assert "ValueError: bad input" in entry["exc_info"]
+
+
+def test_sampling_filter_keeps_warnings_and_errors(monkeypatch):
+    monkeypatch.setattr(logging_config.random, "random", lambda: 0.99)
+    sampler = SamplingFilter(rate=0.1)
+
+    assert sampler.filter(make_record(logging.INFO)) is False
+    assert sampler.filter(make_record(logging.DEBUG)) is False
+    assert sampler.filter(make_record(logging.WARNING)) is True
+    assert sampler.filter(make_record(logging.ERROR)) is True
+
+
+def test_sampling_filter_keeps_about_the_rate():
+    sampler = SamplingFilter(rate=0.25)
+
+    kept = sum(sampler.filter(make_record()) for _ in range(4000))
+
+    assert 800 < kept < 1200
+    assert all(SamplingFilter(rate=1.0).filter(make_record()) for _ in range(100))
+
+
+@pytest.fixture
+def fresh_logging(monkeypatch):
+    """
+    Logging reconfigured from scratch for one test, with the app's logging
+    put back afterwards.
+    """
+    root = logging.getLogger()
+    access_logger = logging.getLogger("auth_service.access")
+    saved = (root.handlers[:], root.level, access_logger.filters[:])
+    original_listener = logging_config._listener
+    stop_logging()
+    monkeypatch.setattr(settings, "LOG_FORMAT", "json")
+    monkeypatch.setattr(settings, "LOG_LEVEL", "INFO")
+    monkeypatch.setattr(settings, "LOG_ACCESS_SAMPLE_RATE", 1.0)
+    try:
+        yield
+    finally:
+        stop_logging()
+        root.handlers[:], level, access_logger.filters[:] = saved
+        root.setLevel(level)
+        if original_listener is not None:
+            original_listener.start()
+            logging_config._listener = original_listener
+
+
+def logged_entries(capsys):
+    return [json.loads(line) for line in capsys.readouterr().err.splitlines() if line.startswith("{")]
+
+
+def test_records_round_trip_through_the_queue(fresh_logging, capsys):
+    configure_logging()
+    logger = logging.getLogger("auth_service.tests")
+
+    logger.info("signed in user %s", 7, extra={"route": "/auth/login"})
+    logger.debug("below LOG_LEVEL")
+    # Flushes the queue before returning
+    stop_logging()
+
+    entries = [entry for entry in logged_entries(capsys) if entry["logger"] == "auth_service.tests"]
+    assert len(entries) == 1
+    assert entries[0]["message"] == "signed in user 7"
+    assert entries[0]["route"] == "/auth/login"
+
+
+def test_configure_logging_is_idempotent(fresh_logging):
+    configure_logging()
+    listener = logging_config._listener
+    configure_logging()
+
+    assert logging_config._listener is listener
+    assert len(logging.getLogger().handlers) == 1
+
+
+def test_access_logs_are_sampled(fresh_logging, capsys, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_ACCESS_SAMPLE_RATE", 0.0)
+    configure_logging()
+
+    logging.getLogger("auth_service.access").info("GET / 200")
+    logging.getLogger("auth_service.access").warning("GET / 500")
+    stop_logging()
+
+    messages = [entry["message"] for entry in logged_entries(capsys) if entry["logger"] == "auth_service.access"]
+    assert messages == ["GET / 500"]
+
+
+def test_records_carry_the_active_span(fresh_logging, capsys, monkeypatch):
+    monkeypatch.setattr(tracer_provider, "enabled", True)
+    monkeypatch.setattr(tracer_provider, "sample_rate", 1.0)
+    monkeypatch.setattr(tracer_provider, "exporter", InMemorySpanExporter())
+    configure_logging()
+
+    with tracer_provider.get_tracer("tests").start_as_current_span("request") as span:
+        logging.getLogger("auth_service.tests").info("inside a span")
+    stop_logging()
+
+    (entry,) = [entry for entry in logged_entries(capsys) if entry["message"] == "inside a span"]
+    assert entry["trace_id"] == span.context.trace_id_hex
+    assert entry["span_id"] == span.context.span_id_hex
@@ -0,0 +1,139 @@
+"""
+Tests for the Prometheus exposition output and who may scrape /metrics.
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.config import settings
+from core.metrics import MetricsRegistry
+from routers.metrics_router import router as metrics_router
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter_exposition(registry):
+    requests = registry.counter("app_requests", "Requests by route", ("method", "route"))
+    requests.labels("GET", "/items").inc()
+    requests.labels("GET", "/items").inc(2)
+    requests.labels("POST", "/items").inc()
+
+    assert registry.render() == (
+        "# HELP app_requests Requests by route\n"
+        "# TYPE app_requests counter\n"
+        'app_requests_total{method="GET",route="/items"} 3\n'
+        'app_requests_total{method="POST",route="/items"} 1\n'
+    )
+
+
+def test_unlabelled_counter_has_no_braces(registry):
+    registry.counter("app_starts", "Starts").inc()
+
+    assert "app_starts_total 1\n" in registry.render()
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = registry.histogram("app_latency_seconds", "Latency", buckets=(0.5, 0.1, 1))
+    for value in (0.05, 0.1, 0.3, 0.7, 5):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert lines[1] == "# TYPE app_latency_seconds histogram"
+    assert lines[2:] == [
+        # Buckets are sorted, and a value on a bound counts in that bucket (le)
+        'app_latency_seconds_bucket{le="0.1"} 2',
+        'app_latency_seconds_bucket{le="0.5"} 3',
+        'app_latency_seconds_bucket{le="1"} 4',
+        'app_latency_seconds_bucket{le="+Inf"} 5',
+        "app_latency_seconds_sum 6.15",
+        "app_latency_seconds_count 5",
+    ]
+
+
+def test_histogram_le_follows_the_other_labels(registry):
+    latency = registry.histogram("app_latency_seconds", "Latency", ("route",), buckets=(1,))
+    latency.labels("/items").observe(0.5)
+
+    assert 'app_latency_seconds_bucket{route="/items",le="1"} 1' in registry.render()
+
+
+def test_label_values_are_escaped(registry):
+    registry.counter("app_errors", "Errors", ("message",)).labels('bad "quote"\\path\nnext line').inc()
+
+    assert 'app_errors_total{message="bad \\"quote\\"\\\\path\\nnext line"} 1' in registry.render()
+
+
+def test_wrong_label_count_is_rejected(registry):
+    requests = registry.counter("app_requests", "Requests", ("method", "route"))
+
+    with pytest.raises(ValueError):
+        requests.labels("GET")
+
+
+def test_duplicate_name_is_rejected(registry):
+    registry.counter("app_requests", "Requests")
+
+    with pytest.raises(ValueError):
+        registry.histogram("app_requests", "Requests again")
+
+
+def test_callback_metrics_are_read_at_scrape_time(registry):
+    depth = {"value": 1}
+    registry.collect("app_queue_depth", "Queue depth", lambda: [({"queue": "email"}, depth["value"])])
+    registry.collect("app_cache_hits", "Cache hits", lambda: [({}, 7)], kind="counter")
+    depth["value"] = 4
+
+    output = registry.render()
+
+    assert "# TYPE app_queue_depth gauge\n" in output
+    assert 'app_queue_depth{queue="email"} 4\n' in output
+    assert "# TYPE app_cache_hits counter\napp_cache_hits_total 7\n" in output
+
+
+def test_failing_collector_does_not_hide_other_metrics(registry):
+    def unavailable():
+        raise ConnectionError("database is down")
+
+    registry.collect("app_pending", "Pending rows", unavailable)
+    registry.counter("app_starts", "Starts").inc()
+
+    output = registry.render()
+
+    assert "# app_pending unavailable: ConnectionError\n" in output
+    assert "app_starts_total 1\n" in output
+
+
+@pytest.fixture
+def scrape(monkeypatch):
+    """GET /metrics from a client address, with only 10.0.0.0/8 allowed."""
+    monkeypatch.setattr(settings, "METRICS_ALLOWED_NETWORKS", "10.0.0.0/8, ::1")
+    # Keeps the outbox depth collector off the database
+    monkeypatch.setattr(settings, "EMAIL_DELIVERY_MODE", "inline")
+    app = FastAPI()
+    app.include_router(metrics_router)
+
+    def scrape(client_ip: str):
+        return TestClient(app, client=(client_ip, 50000)).get("/metrics")
+    return scrape
+
+
+@pytest.mark.parametrize("client_ip", ["10.1.2.3", "::1"])
+def test_allowed_client_is_served(scrape, client_ip):
+    response = scrape(client_ip)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE auth_http_requests counter" in response.text
+
+
+@pytest.mark.parametrize("client_ip", ["203.0.113.7", "127.0.0.1", "testclient"])
+def test_other_clients_get_not_found(scrape, client_ip):
+    response = scrape(client_ip)
+
+    assert response.status_code == 404
+    assert "auth_" not in response.text
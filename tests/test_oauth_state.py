@@ -0,0 +1,137 @@
+"""
+Tests for the stateless, HMAC-signed OAuth state and its replay set.
+"""
+
+import base64
+import secrets
+import time
+
+import pytest
+
+from core.config import settings
+from services.security_service import (
+    InMemoryReplaySet,
+    OAuthStateManager,
+    RedisReplaySet,
+    create_replay_set,
+)
+
+SECRET = "test-oauth-state-secret"
+
+
+@pytest.fixture
+def manager(fake_redis):
+    return OAuthStateManager(secret_key=SECRET, ttl_seconds=600, replay_set=RedisReplaySet(client=fake_redis))
+
+
+def forge(manager: OAuthStateManager, version: int = OAuthStateManager.VERSION, issued_at: float = None) -> str:
+    """A correctly signed state with chosen fields."""
+    payload = manager._PAYLOAD.pack(
+        version,
+        int(time.time() if issued_at is None else issued_at),
+        secrets.token_bytes(manager.NONCE_BYTES)
+    )
+    return base64.urlsafe_b64encode(payload + manager._mac(payload)).rstrip(b"=").decode("ascii")
+
+
+def flip_byte(state: str, index: int) -> str:
+    raw = bytearray(base64.urlsafe_b64decode(state + "=" * (-len(state) % 4)))
+    raw[index] ^= 0x01
+    return base64.urlsafe_b64encode(bytes(raw)).rstrip(b"=").decode("ascii")
+
+
+def test_valid_state_is_accepted_once(manager):
+    state = manager.create_state()
+
+    assert manager.validate_and_consume_state(state) is True
+    assert manager.validate_and_consume_state(state) is False
+
+
+def test_replay_is_rejected_by_another_worker(manager, fake_redis):
+    other_worker = OAuthStateManager(secret_key=SECRET, ttl_seconds=600, replay_set=RedisReplaySet(client=fake_redis))
+    state = manager.create_state()
+
+    assert other_worker.validate_and_consume_state(state) is True
+    assert manager.validate_and_consume_state(state) is False
+
+
+def test_replay_entry_expires_with_the_state(manager, fake_redis):
+    state = manager.create_state()
+    manager.validate_and_consume_state(state)
+
+    (key,) = fake_redis._data
+    assert 0 < fake_redis.ttl(key) <= 601
+
+
+def test_tampered_mac_is_rejected(manager):
+    state = manager.create_state()
+
+    assert manager.validate_and_consume_state(flip_byte(state, -1)) is False
+    # Rejected before it reaches the replay set, so the real state still works
+    assert manager.validate_and_consume_state(state) is True
+
+
+def test_tampered_payload_is_rejected(manager):
+    state = manager.create_state()
+
+    # Byte 1 is the start of issued_at
+    assert manager.validate_and_consume_state(flip_byte(state, 1)) is False
+
+
+def test_state_signed_with_another_secret_is_rejected(manager, fake_redis):
+    other = OAuthStateManager(secret_key="another-secret", ttl_seconds=600, replay_set=RedisReplaySet(client=fake_redis))
+
+    assert manager.validate_and_consume_state(other.create_state()) is False
+
+
+def test_expired_state_is_rejected(manager):
+    assert manager.validate_and_consume_state(forge(manager, issued_at=time.time() - 601)) is False
+    assert manager.validate_and_consume_state(forge(manager, issued_at=time.time() - 590)) is True
+
+
+def test_state_from_the_future_is_rejected(manager):
+    future = time.time() + OAuthStateManager.MAX_CLOCK_SKEW_SECONDS + 10
+
+    assert manager.validate_and_consume_state(forge(manager, issued_at=future)) is False
+
+
+def test_wrong_version_is_rejected(manager):
+    assert manager.validate_and_consume_state(forge(manager, version=OAuthStateManager.VERSION + 1)) is False
+
+
+@pytest.mark.parametrize("state", ["", "not-base64!!", "abc", "A" * 65, base64.urlsafe_b64encode(b"x" * 33).decode()])
+def test_malformed_state_is_rejected(manager, state):
+    assert manager.validate_and_consume_state(state) is False
+
+
+def test_memory_replay_set_refuses_multiple_workers(monkeypatch):
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+
+    with pytest.raises(RuntimeError, match="WEB_CONCURRENCY"):
+        create_replay_set("memory")
+
+
+def test_memory_replay_set_with_one_worker(monkeypatch):
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 1)
+
+    assert isinstance(create_replay_set("memory"), InMemoryReplaySet)
+
+
+def test_redis_replay_set_requires_redis_url(monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_URL", None)
+
+    with pytest.raises(RuntimeError, match="REDIS_URL"):
+        create_replay_set("redis")
+
+
+def test_replay_set_is_built_on_startup_only_with_google_sign_in(monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_URL", None)
+    manager = OAuthStateManager(secret_key=SECRET)
+
+    monkeypatch.setattr(settings, "GOOGLE_CLIENT_ID", None)
+    manager.start()
+
+    monkeypatch.setattr(settings, "GOOGLE_CLIENT_ID", "client-id")
+    monkeypatch.setattr(settings, "OAUTH_STATE_REPLAY_BACKEND", "redis")
+    with pytest.raises(RuntimeError, match="REDIS_URL"):
+        manager.start()
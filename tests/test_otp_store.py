@@ -0,0 +1,158 @@
+"""
+Tests for the OTP store backends and single-use verification.
+"""
+
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.user_model import User
+from services.otp_service import OTPService
+from services.otp_store import DatabaseOTPStore, InMemoryOTPStore, RedisOTPStore, StoredOTP
+
+
+def make_otp(user_id: int = 1, code_hash: str = "hash-1", minutes: int = 10) -> StoredOTP:
+    return StoredOTP(
+        user_id=user_id,
+        email="user@example.com",
+        otp_code=code_hash,
+        purpose="verification",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=minutes)
+    )
+
+
+@pytest.fixture(params=["memory", "redis", "database"])
+def otp_store(request, fake_redis):
+    if request.param == "memory":
+        yield InMemoryOTPStore()
+    elif request.param == "redis":
+        yield RedisOTPStore(client=fake_redis)
+    else:
+        db = request.getfixturevalue("test_db")
+        db.add(User(id=1, email="user@example.com", full_name="User"))
+        db.commit()
+        yield DatabaseOTPStore(db)
+
+
+def test_save_and_get(otp_store):
+    otp_store.save(make_otp())
+
+    stored = otp_store.get(1, "verification")
+
+    assert stored is not None
+    assert stored.otp_code == "hash-1"
+    assert stored.email == "user@example.com"
+    assert stored.expires_at > datetime.now(timezone.utc)
+
+
+def test_save_replaces_previous_otp(otp_store):
+    otp_store.save(make_otp(code_hash="hash-1"))
+    otp_store.save(make_otp(code_hash="hash-2"))
+
+    assert otp_store.get(1, "verification").otp_code == "hash-2"
+
+
+def test_get_missing_returns_none(otp_store):
+    assert otp_store.get(1, "login") is None
+
+
+def test_delete(otp_store):
+    otp_store.save(make_otp())
+
+    assert otp_store.delete(1, "verification") is True
+    assert otp_store.get(1, "verification") is None
+    assert otp_store.delete(1, "verification") is False
+
+
+def test_consume_succeeds_once(otp_store):
+    otp_store.save(make_otp())
+    stored = otp_store.get(1, "verification")
+
+    assert otp_store.consume(stored) is True
+    assert otp_store.consume(stored) is False
+    assert otp_store.get(1, "verification") is None
+
+
+def test_consume_keeps_a_newer_otp(otp_store):
+    otp_store.save(make_otp(code_hash="hash-1"))
+    stale = otp_store.get(1, "verification")
+    otp_store.save(make_otp(code_hash="hash-2"))
+
+    assert otp_store.consume(stale) is False
+    assert otp_store.get(1, "verification").otp_code == "hash-2"
+
+
+def test_redis_store_sets_expiry(fake_redis):
+    store = RedisOTPStore(client=fake_redis)
+    store.save(make_otp(minutes=10))
+
+    assert 0 < fake_redis.ttl("otp:1:verification") <= 600
+
+
+def test_verify_otp_rejects_expired_code(redis_otp_service, fake_redis):
+    service = redis_otp_service
+    service.store_otp(db=None, user_id=1, email="user@example.com", otp_code="123456", purpose="verification")
+    stored = service._store.get(1, "verification")
+    stored.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    fake_redis.set("otp:1:verification", json.dumps(stored.to_dict()), ex=60)
+
+    assert service.verify_otp(db=None, user_id=1, otp_code="123456", purpose="verification") is False
+    assert service._store.get(1, "verification") is None
+
+
+def test_expired_code_cleanup_keeps_a_newer_otp(redis_otp_service, fake_redis):
+    service = redis_otp_service
+    service.store_otp(db=None, user_id=1, email="user@example.com", otp_code="123456", purpose="verification")
+    expired = service._store.get(1, "verification")
+    expired.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    store = service._store
+
+    class RacingStore:
+        """Hands out the expired OTP while /auth/request-otp has just replaced it."""
+
+        def get(self, user_id, purpose):
+            service.store_otp(db=None, user_id=1, email="user@example.com", otp_code="654321", purpose="verification")
+            return expired
+
+        def __getattr__(self, name):
+            return getattr(store, name)
+
+    service._store = RacingStore()
+    assert service.verify_otp(db=None, user_id=1, otp_code="123456", purpose="verification") is False
+
+    service._store = store
+    assert service.verify_otp(db=None, user_id=1, otp_code="654321", purpose="verification") is True
+
+
+def test_verify_otp_wrong_code_keeps_otp(redis_otp_service):
+    service = redis_otp_service
+    service.store_otp(db=None, user_id=1, email="user@example.com", otp_code="123456", purpose="verification")
+
+    assert service.verify_otp(db=None, user_id=1, otp_code="654321", purpose="verification") is False
+    assert service.verify_otp(db=None, user_id=1, otp_code="123456", purpose="verification") is True
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_concurrent_verifications_accept_code_once(backend, fake_redis):
+    store = InMemoryOTPStore() if backend == "memory" else RedisOTPStore(client=fake_redis)
+    service = OTPService(store=store)
+    service.store_otp(db=None, user_id=1, email="user@example.com", otp_code="123456", purpose="verification")
+
+    callers = 8
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def verify():
+        barrier.wait()
+        results.append(service.verify_otp(db=None, user_id=1, otp_code="123456", purpose="verification"))
+
+    threads = [threading.Thread(target=verify) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert results.count(False) == callers - 1
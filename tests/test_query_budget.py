@@ -0,0 +1,117 @@
+"""
+SQL statement budgets for the auth endpoints, so a new round trip on a hot
+path fails the suite instead of showing up as production latency.
+"""
+
+import pytest
+
+from core.config import settings
+from services.email_service import email_service
+from services.rate_limit_service import rate_limit_service
+from services.security_service import oauth_state_manager
+
+EMAIL = "budget@example.com"
+PASSWORD = "Passw0rd!"
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits(monkeypatch):
+    # Attempts are counted per email for the life of the process
+    monkeypatch.setattr(rate_limit_service, "_attempts", {})
+
+
+@pytest.fixture
+def sent_otps(monkeypatch):
+    """OTP emails captured instead of sent, by recipient."""
+    sent = {}
+
+    async def capture_otp_email(email, otp_code, user_name=None, purpose="verification", locale=None):
+        sent[email] = otp_code
+
+    monkeypatch.setattr(email_service, "send_otp_email", capture_otp_email)
+    monkeypatch.setattr(settings, "EMAIL_DELIVERY_MODE", "inline")
+    return sent
+
+
+@pytest.fixture
+def registered(test_client_with_db, sent_otps):
+    """A verified account; returns its access token."""
+    client = test_client_with_db
+    response = client.post("/auth/register", json={"email": EMAIL, "password": PASSWORD, "full_name": "Budget"})
+    assert response.status_code == 201
+    client.post("/auth/request-otp", json={"email": EMAIL, "purpose": "verification"})
+    response = client.post(
+        "/auth/verify-otp", json={"email": EMAIL, "otp_code": sent_otps[EMAIL], "purpose": "verification"}
+    )
+    return response.json()["access_token"]
+
+
+def test_me(test_client_with_db, registered, query_budget):
+    headers = {"Authorization": f"Bearer {registered}"}
+
+    with query_budget(1, route="/auth/me"):
+        assert test_client_with_db.get("/auth/me", headers=headers).status_code == 200
+    # Served from the user cache once warm
+    with query_budget(0, route="/auth/me"):
+        assert test_client_with_db.get("/auth/me", headers=headers).status_code == 200
+
+
+def test_login(test_client_with_db, registered, query_budget):
+    with query_budget(1, route="/auth/login"):
+        response = test_client_with_db.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+    assert response.status_code == 200
+
+
+def test_login_unknown_email(test_client_with_db, query_budget):
+    with query_budget(1, route="/auth/login"):
+        response = test_client_with_db.post("/auth/login", json={"email": "nobody@example.com", "password": PASSWORD})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("delivery_mode, budget", [("inline", 3), ("outbox", 4)])
+def test_request_otp(test_client_with_db, registered, query_budget, monkeypatch, delivery_mode, budget):
+    # User lookup, replace the OTP (delete + insert), and the outbox row when queued
+    monkeypatch.setattr(settings, "EMAIL_DELIVERY_MODE", delivery_mode)
+
+    with query_budget(budget, route="/auth/request-otp"):
+        response = test_client_with_db.post("/auth/request-otp", json={"email": EMAIL, "purpose": "login"})
+    assert response.status_code == 200
+
+
+def test_verify_otp(test_client_with_db, sent_otps, query_budget):
+    client = test_client_with_db
+    client.post("/auth/register", json={"email": EMAIL, "password": PASSWORD, "full_name": "Budget"})
+    client.post("/auth/request-otp", json={"email": EMAIL, "purpose": "verification"})
+
+    # User lookup, OTP read, single-use delete, and marking the user verified
+    with query_budget(4, route="/auth/verify-otp"):
+        response = client.post(
+            "/auth/verify-otp", json={"email": EMAIL, "otp_code": sent_otps[EMAIL], "purpose": "verification"}
+        )
+    assert response.status_code == 200
+
+
+def test_google_callback(test_client_with_db, google_token_endpoint, query_budget):
+    def callback():
+        code = google_token_endpoint.authorize(sub="google-budget", email="google-budget@example.com", name="Google")
+        return test_client_with_db.get(
+            "/auth/google/callback", params={"code": code, "state": oauth_state_manager.create_state()}
+        )
+
+    # New account: one lookup by Google ID or email, one insert
+    with query_budget(2, route="/auth/google/callback"):
+        assert callback().status_code == 302
+    # Returning user: the lookup only
+    with query_budget(1, route="/auth/google/callback"):
+        assert callback().status_code == 302
+
+
+def test_google_callback_links_existing_account(test_client_with_db, registered, google_token_endpoint, query_budget):
+    code = google_token_endpoint.authorize(sub="google-budget", email=EMAIL, name="Budget")
+
+    # Lookup finds the password account by email; one UPDATE ... RETURNING links it
+    with query_budget(2, route="/auth/google/callback"):
+        response = test_client_with_db.get(
+            "/auth/google/callback", params={"code": code, "state": oauth_state_manager.create_state()}
+        )
+    assert response.status_code == 302
@@ -0,0 +1,182 @@
+"""
+Tests for per-recipient-domain send shaping and how deferrals reach callers.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from core.config import settings
+from services import send_shaper as send_shaper_module
+from services.email_service import email_service
+from services.rate_limit_service import rate_limit_service
+from services.send_shaper import DomainDeferred, DomainSendShaper, TemporarySendFailure
+
+EMAIL = "student@district.example.org"
+
+
+class Clock:
+    """Stands in for time.monotonic in the shaper module."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(send_shaper_module, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def send(shaper: DomainSendShaper, email: str = EMAIL):
+    async def reserve():
+        async with shaper.slot(email):
+            pass
+    asyncio.run(reserve())
+
+
+def tokens(shaper: DomainSendShaper, email: str = EMAIL) -> float:
+    return shaper._domains[shaper.domain_of(email)].tokens
+
+
+def test_burst_then_rate_limited(clock):
+    shaper = DomainSendShaper(rate_per_second=0.25, burst=3, max_wait_seconds=2.0)
+    for _ in range(3):
+        send(shaper)
+    # The next token is four seconds away, longer than a send may wait
+    with pytest.raises(DomainDeferred, match="rate limited") as deferred:
+        send(shaper)
+
+    assert deferred.value.retry_after == pytest.approx(4.0)
+    assert shaper.stats()["deferred"] == 1
+    assert tokens(shaper) == pytest.approx(0.0)
+
+
+def test_short_wait_is_slept_off(clock):
+    shaper = DomainSendShaper(rate_per_second=100.0, burst=1, max_wait_seconds=2.0)
+
+    send(shaper)
+    send(shaper)
+
+    # Both sends went through; the second borrowed against the next refill
+    assert tokens(shaper) == pytest.approx(-1.0)
+    assert shaper.stats()["deferred"] == 0
+
+
+def test_domains_have_separate_buckets(clock):
+    shaper = DomainSendShaper(rate_per_second=0.01, burst=1, max_wait_seconds=1.0)
+
+    send(shaper, "a@busy.example.com")
+    send(shaper, "b@Other.Example.com")
+
+    with pytest.raises(DomainDeferred):
+        send(shaper, "c@BUSY.example.com")
+    assert shaper.stats()["domains"] == 2
+
+
+def test_overrides_apply_per_domain(clock):
+    shaper = DomainSendShaper(
+        rate_per_second=0.01, burst=1, max_wait_seconds=1.0, overrides={"Bulk.Example.com": {"burst": 3}}
+    )
+
+    for _ in range(3):
+        send(shaper, "user@bulk.example.com")
+    with pytest.raises(DomainDeferred):
+        send(shaper, "user@bulk.example.com")
+
+
+def test_busy_connections_defer_and_refund_the_token():
+    shaper = DomainSendShaper(rate_per_second=1.0, burst=5, max_concurrency=1, max_wait_seconds=0.05)
+
+    async def second_send_while_first_holds_the_connection():
+        async with shaper.slot(EMAIL):
+            before = tokens(shaper)
+            with pytest.raises(DomainDeferred, match="all connections busy"):
+                async with shaper.slot(EMAIL):
+                    pass
+            return before, tokens(shaper)
+
+    before, after = asyncio.run(second_send_while_first_holds_the_connection())
+
+    assert after == pytest.approx(before, abs=0.2)
+    # The connection was released on the way out
+    send(shaper)
+
+
+def test_cancelled_wait_refunds_the_token(clock):
+    shaper = DomainSendShaper(rate_per_second=1.0, burst=1, max_wait_seconds=5.0)
+    send(shaper)
+
+    async def cancel_while_waiting_for_a_token():
+        task = asyncio.create_task(send_slot())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async def send_slot():
+        async with shaper.slot(EMAIL):
+            pass
+
+    asyncio.run(cancel_while_waiting_for_a_token())
+
+    assert tokens(shaper) == pytest.approx(0.0)
+
+
+def test_temporary_failure_pauses_the_domain(clock):
+    shaper = DomainSendShaper(backoff_base_seconds=30, backoff_max_seconds=100)
+
+    assert shaper.record_temporary_failure(EMAIL) == 30
+    with pytest.raises(DomainDeferred, match="backing off") as deferred:
+        send(shaper)
+    assert deferred.value.retry_after == pytest.approx(30)
+    assert shaper.stats()["paused"] == ["district.example.org"]
+
+    clock.now += 30
+    send(shaper)
+    assert shaper.stats()["paused"] == []
+
+
+def test_backoff_doubles_up_to_the_cap_and_resets_on_success(clock):
+    shaper = DomainSendShaper(backoff_base_seconds=30, backoff_max_seconds=100)
+
+    assert [shaper.record_temporary_failure(EMAIL) for _ in range(4)] == [30, 60, 100, 100]
+    shaper.record_success(EMAIL)
+    assert shaper.record_temporary_failure(EMAIL) == 30
+
+
+def test_least_recently_used_domain_is_dropped(clock):
+    shaper = DomainSendShaper(max_domains=2)
+
+    send(shaper, "a@one.example.com")
+    send(shaper, "a@two.example.com")
+    send(shaper, "a@one.example.com")
+    send(shaper, "a@three.example.com")
+
+    assert list(shaper._domains) == ["one.example.com", "three.example.com"]
+
+
+@pytest.mark.parametrize("failure, retry_after", [
+    (DomainDeferred("Sending to example.com deferred: rate limited", 4.2), "5"),
+    (TemporarySendFailure("Failed to send email: 451 try again", 30), "30"),
+])
+def test_inline_deferral_returns_503_with_retry_after(test_client_with_db, monkeypatch, failure, retry_after):
+    monkeypatch.setattr(rate_limit_service, "_attempts", {})
+    monkeypatch.setattr(settings, "EMAIL_DELIVERY_MODE", "inline")
+
+    async def deferred_send(email, otp_code, user_name=None, purpose="verification", locale=None):
+        raise failure
+
+    monkeypatch.setattr(email_service, "send_otp_email", deferred_send)
+    client = test_client_with_db
+    client.post("/auth/register", json={"email": "shaped@example.com", "password": "Passw0rd!", "full_name": "Shaped"})
+
+    response = client.post("/auth/request-otp", json={"email": "shaped@example.com", "purpose": "verification"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == retry_after
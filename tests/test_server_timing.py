@@ -0,0 +1,68 @@
+"""
+Tests for the Server-Timing header and who receives it.
+"""
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from core.server_timing import HASH, record
+from middleware.server_timing_middleware import ServerTimingMiddleware
+from middleware.tracing_middleware import TracedRoute
+
+
+def make_client(client_ip: str, allowed_networks: str = "10.0.0.0/8,::1/128") -> TestClient:
+    router = APIRouter(route_class=TracedRoute)
+
+    @router.post("/login")
+    async def login():
+        record(HASH, 0.25)
+        return {}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(ServerTimingMiddleware, allowed_networks=allowed_networks)
+    return TestClient(app, client=(client_ip, 50000))
+
+
+@pytest.mark.parametrize("client_ip", ["10.1.2.3", "::1"])
+def test_allowed_client_gets_breakdown(client_ip):
+    response = make_client(client_ip).post("/login")
+
+    metrics = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+    assert metrics == ["hash", "middleware", "total"]
+    assert "hash;dur=250.0" in response.headers["server-timing"]
+
+
+@pytest.mark.parametrize("client_ip", ["203.0.113.7", "testclient"])
+def test_other_clients_get_no_header(client_ip):
+    response = make_client(client_ip).post("/login")
+
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+
+
+def test_no_allowed_networks_disables_the_header():
+    assert "server-timing" not in make_client("10.1.2.3", allowed_networks="").post("/login").headers
+
+
+def test_login_breakdown_only_reaches_allowed_clients(test_client_with_db):
+    from main import app
+
+    test_client_with_db.post(
+        "/auth/register", json={"email": "known@example.com", "password": "Passw0rd!", "full_name": "Known"}
+    )
+    # The app only installs the middleware when SERVER_TIMING_ENABLED is set;
+    # the lifespan is already running under test_client_with_db
+    timed = ServerTimingMiddleware(app, allowed_networks="10.0.0.0/8")
+    internal = TestClient(timed, client=("10.1.2.3", 50000))
+    public = TestClient(timed, client=("203.0.113.7", 50000))
+
+    def login(client: TestClient, email: str):
+        return client.post("/auth/login", json={"email": email, "password": "Wrong-passw0rd"})
+
+    # Why it is restricted: the breakdown differs between known and unknown emails
+    assert "hash;" in login(internal, "known@example.com").headers["server-timing"]
+    assert "hash;" not in login(internal, "unknown@example.com").headers["server-timing"]
+    assert "server-timing" not in login(public, "known@example.com").headers
+    assert "server-timing" not in login(public, "unknown@example.com").headers
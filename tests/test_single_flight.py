@@ -0,0 +1,137 @@
+"""
+Tests for single-flight coalescing and its use by /auth/request-otp.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from core.config import settings
+from models.email_outbox_model import EmailOutbox
+from services.email_outbox import email_outbox
+from services.email_service import email_service
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_run_once():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["result"] * 10
+    assert calls == 1
+    assert flight.executed == 1
+    assert flight.coalesced == 9
+    assert flight.in_flight == 0
+
+
+def test_exception_is_shared():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.executed == 1
+
+
+def test_cancelled_follower_does_not_cancel_the_call():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        return await leader, await asyncio.gather(follower, return_exceptions=True)
+
+    result, (follower_result,) = asyncio.run(main())
+    assert result == "result"
+    assert isinstance(follower_result, asyncio.CancelledError)
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("key", work)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader, results
+
+    leader, results = asyncio.run(main())
+    assert leader.cancelled()
+    assert results == ["result"] * 3
+    # The cancelled call, then one rerun shared by all three followers
+    assert calls == 2
+    assert flight.in_flight == 0
+
+
+@pytest.mark.parametrize("delivery_mode", ["outbox", "inline"])
+def test_concurrent_otp_requests_send_one_email(test_client_with_db, monkeypatch, delivery_mode):
+    client = test_client_with_db
+    monkeypatch.setattr(settings, "EMAIL_DELIVERY_MODE", delivery_mode)
+    sent = []
+
+    async def capture_otp_email(email, otp_code, user_name=None, purpose="verification", locale=None):
+        await asyncio.sleep(0.05)
+        sent.append(otp_code)
+
+    monkeypatch.setattr(email_service, "send_otp_email", capture_otp_email)
+    response = client.post(
+        "/auth/register",
+        json={"email": "flight@example.com", "password": "Passw0rd!", "full_name": "Flight"}
+    )
+    assert response.status_code == 201
+
+    callers = 5
+    barrier = threading.Barrier(callers)
+    statuses = []
+
+    def request_otp():
+        barrier.wait()
+        response = client.post("/auth/request-otp", json={"email": "flight@example.com", "purpose": "verification"})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=request_otp) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * callers
+    if delivery_mode == "inline":
+        assert len(sent) == 1
+    else:
+        # The fixture points the outbox at the test database
+        with email_outbox.session_factory() as db:
+            assert db.query(EmailOutbox).filter(EmailOutbox.recipient == "flight@example.com").count() == 1
@@ -0,0 +1,215 @@
+"""
+Tests for the pooled SMTP connections, against the local SMTP sink.
+"""
+
+import asyncio
+from email.message import EmailMessage
+
+import aiosmtplib
+import pytest
+
+from services.email_service import email_service
+from services.smtp_pool import SMTPConnectionPool
+
+
+def make_message(number: int = 1) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "noreply@example.com"
+    message["To"] = f"user{number}@example.com"
+    message["Subject"] = f"Message {number}"
+    message.set_content("Hello")
+    return message
+
+
+@pytest.fixture
+def make_pool(smtp_sink):
+    def make_pool(**options) -> SMTPConnectionPool:
+        options.setdefault("max_size", 1)
+        return SMTPConnectionPool(hostname=smtp_sink.sink.host, port=smtp_sink.sink.port, start_tls=False, **options)
+    return make_pool
+
+
+def run(pool: SMTPConnectionPool, *steps):
+    """Run async steps on one event loop (connections are bound to it), then close the pool."""
+    async def main():
+        try:
+            for step in steps:
+                await step()
+        finally:
+            await pool.close()
+    asyncio.run(main())
+
+
+def idle_for(pool: SMTPConnectionPool, seconds: float):
+    for conn in pool._idle:
+        conn.last_used -= seconds
+
+
+def test_connection_is_reused(smtp_sink, make_pool):
+    pool = make_pool()
+
+    run(pool, lambda: pool.send_message(make_message(1)), lambda: pool.send_message(make_message(2)))
+
+    assert len(smtp_sink.sink.messages) == 2
+    assert smtp_sink.sink.connections == 1
+    assert pool.stats()["connections_opened"] == 1
+
+
+def test_server_disconnect_is_retried_on_a_new_connection(smtp_sink, make_pool):
+    pool = make_pool()
+
+    async def drop_then_send():
+        # The pool hasn't seen the drop yet, so the send hits a dead session
+        smtp_sink.drop_connections()
+        await pool.send_message(make_message(2))
+
+    run(pool, lambda: pool.send_message(make_message(1)), drop_then_send)
+
+    assert [message["To"] for message in smtp_sink.sink.messages] == ["user1@example.com", "user2@example.com"]
+    assert pool.stats()["reconnects"] == 1
+    assert smtp_sink.sink.connections == 2
+
+
+def test_connection_dropped_while_idle_is_replaced(smtp_sink, make_pool):
+    pool = make_pool()
+
+    async def drop_and_wait():
+        smtp_sink.drop_connections()
+        # Let the client notice the closed socket
+        for _ in range(50):
+            if not pool._idle[0].smtp.is_connected:
+                break
+            await asyncio.sleep(0.01)
+
+    run(
+        pool,
+        lambda: pool.send_message(make_message(1)),
+        drop_and_wait,
+        lambda: pool.send_message(make_message(2))
+    )
+
+    assert len(smtp_sink.sink.messages) == 2
+    assert pool.stats()["reconnects"] == 0
+    assert pool.stats()["connections_opened"] == 2
+
+
+def test_keepalive_noop_before_reusing_an_idle_connection(smtp_sink, make_pool):
+    pool = make_pool(keepalive_seconds=30)
+
+    async def wait_past_keepalive():
+        idle_for(pool, 31)
+
+    run(
+        pool,
+        lambda: pool.send_message(make_message(1)),
+        lambda: pool.send_message(make_message(2)),
+        wait_past_keepalive,
+        lambda: pool.send_message(make_message(3))
+    )
+
+    # Only the reuse after the keepalive interval is checked
+    assert smtp_sink.sink.noops == 1
+    assert smtp_sink.sink.connections == 1
+    assert len(smtp_sink.sink.messages) == 3
+
+
+def test_failed_keepalive_opens_a_new_connection(smtp_sink, make_pool):
+    pool = make_pool(keepalive_seconds=30)
+
+    async def drop_past_keepalive():
+        idle_for(pool, 31)
+        smtp_sink.drop_connections()
+
+    run(
+        pool,
+        lambda: pool.send_message(make_message(1)),
+        drop_past_keepalive,
+        lambda: pool.send_message(make_message(2))
+    )
+
+    assert pool.stats()["keepalive_failures"] == 1
+    assert pool.stats()["reconnects"] == 0
+    assert smtp_sink.sink.connections == 2
+    assert len(smtp_sink.sink.messages) == 2
+
+
+def test_connection_idle_past_timeout_is_closed(smtp_sink, make_pool):
+    pool = make_pool(keepalive_seconds=30, idle_timeout_seconds=240)
+
+    async def wait_past_idle_timeout():
+        idle_for(pool, 241)
+
+    run(
+        pool,
+        lambda: pool.send_message(make_message(1)),
+        wait_past_idle_timeout,
+        lambda: pool.send_message(make_message(2))
+    )
+
+    # Closed without a NOOP round trip, and a fresh session sent the message
+    assert smtp_sink.sink.noops == 0
+    assert smtp_sink.sink.connections == 2
+    assert pool.stats()["connections_opened"] == 2
+
+
+def test_connection_is_recycled_after_max_messages(smtp_sink, make_pool):
+    pool = make_pool(max_messages_per_connection=2)
+
+    run(pool, *[lambda number=number: pool.send_message(make_message(number)) for number in range(5)])
+
+    assert len(smtp_sink.sink.messages) == 5
+    assert smtp_sink.sink.connections == 3
+    assert pool.stats()["messages_sent"] == 5
+
+
+def test_refused_message_keeps_the_connection(smtp_sink, make_pool):
+    smtp_sink.sink.fail_every = 1
+    pool = make_pool()
+
+    async def send_refused():
+        with pytest.raises(aiosmtplib.SMTPResponseException):
+            await pool.send_message(make_message(1))
+        smtp_sink.sink.fail_every = 0
+
+    run(pool, send_refused, lambda: pool.send_message(make_message(2)))
+
+    assert smtp_sink.sink.rejected == 1
+    assert len(smtp_sink.sink.messages) == 1
+    assert smtp_sink.sink.connections == 1
+
+
+def test_broken_connection_is_closed_and_its_slot_released(smtp_sink, make_pool):
+    pool = make_pool(timeout=0.2)
+
+    async def send_timing_out():
+        smtp_sink.sink.command_delay = 0.5
+        with pytest.raises(aiosmtplib.SMTPTimeoutError):
+            await pool.send_message(make_message(2))
+        smtp_sink.sink.command_delay = 0.0
+        assert pool.stats()["idle"] == 0
+
+    run(
+        pool,
+        lambda: pool.send_message(make_message(1)),
+        send_timing_out,
+        # With one slot, this would wait forever if the failed send kept it
+        lambda: asyncio.wait_for(pool.send_message(make_message(3)), 5)
+    )
+
+    assert [message["To"] for message in smtp_sink.sink.messages] == ["user1@example.com", "user3@example.com"]
+    assert smtp_sink.sink.connections == 2
+
+
+def test_email_service_delivers_through_the_pool(smtp_sink):
+    async def send_twice():
+        try:
+            await email_service.send_otp_email("first@example.com", "123456", user_name="First")
+            await email_service.send_otp_email("second@example.com", "654321", user_name="Second")
+        finally:
+            await email_service.close()
+
+    asyncio.run(send_twice())
+
+    assert len(smtp_sink.sink.messages_to("first@example.com")) == 1
+    assert len(smtp_sink.sink.messages_to("second@example.com")) == 1
+    assert smtp_sink.sink.connections == 1
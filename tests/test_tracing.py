@@ -0,0 +1,252 @@
+"""
+Tests for request tracing: traceparent handling, sampling and span parenting.
+"""
+
+import json
+
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from core.tracing import (
+    InMemorySpanExporter,
+    OTLPSpanExporter,
+    StatusCode,
+    TracerProvider,
+    format_traceparent,
+    parse_traceparent,
+    tracer_provider,
+)
+from middleware.tracing_middleware import TracedRoute, TracingMiddleware
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def provider():
+    return TracerProvider(enabled=True, exporter=InMemorySpanExporter())
+
+
+@pytest.fixture
+def traced_app(monkeypatch):
+    """A small app behind TracingMiddleware, recording into a fresh exporter."""
+    exporter = InMemorySpanExporter()
+    monkeypatch.setattr(tracer_provider, "enabled", True)
+    monkeypatch.setattr(tracer_provider, "sample_rate", 1.0)
+    monkeypatch.setattr(tracer_provider, "exporter", exporter)
+
+    router = APIRouter(route_class=TracedRoute)
+    inner = tracer_provider.get_tracer("tests")
+
+    @router.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        with inner.start_as_current_span("load item"):
+            return {"id": item_id}
+
+    @router.get("/fail")
+    async def fail():
+        raise RuntimeError("boom")
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(TracingMiddleware)
+    with TestClient(app, raise_server_exceptions=False) as client:
+        yield client, exporter
+
+
+def test_parse_sampled_traceparent():
+    context = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")
+
+    assert context.trace_id_hex == TRACE_ID
+    assert context.span_id_hex == PARENT_ID
+    assert context.sampled is True
+
+
+def test_parse_unsampled_traceparent():
+    context = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")
+
+    assert context.sampled is False
+
+
+def test_later_versions_may_append_fields():
+    assert parse_traceparent(f"01-{TRACE_ID}-{PARENT_ID}-01-extra").sampled is True
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    f"00-{TRACE_ID}-{PARENT_ID}",
+    f"00-{TRACE_ID}-{PARENT_ID}-01-extra",
+    f"ff-{TRACE_ID}-{PARENT_ID}-01",
+    f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+    f"00-{'0' * 32}-{PARENT_ID}-01",
+    f"00-{TRACE_ID}-{'0' * 16}-01",
+    f"00-{TRACE_ID}-{PARENT_ID}-1",
+    f"00-{TRACE_ID[:-1]}g-{PARENT_ID}-01",
+    f"00-{TRACE_ID}-{PARENT_ID}-+1",
+])
+def test_malformed_traceparent_is_ignored(header):
+    assert parse_traceparent(header) is None
+
+
+@pytest.mark.parametrize("flags", ["00", "01"])
+def test_format_round_trips(flags):
+    header = f"00-{TRACE_ID}-{PARENT_ID}-{flags}"
+
+    assert format_traceparent(parse_traceparent(header)) == header
+
+
+def test_remote_parent_is_continued(provider):
+    tracer = provider.get_tracer("tests")
+
+    with tracer.start_as_current_span("request", parent=parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")) as root:
+        with tracer.start_as_current_span("child") as child:
+            pass
+
+    assert root.context.trace_id_hex == TRACE_ID
+    assert root.parent_span_id == int(PARENT_ID, 16)
+    assert child.context.trace_id_hex == TRACE_ID
+    assert child.parent_span_id == root.context.span_id
+    assert [span.name for span in provider.exporter.get_finished_spans()] == ["child", "request"]
+
+
+def test_sampled_remote_parent_overrides_sample_rate():
+    provider = TracerProvider(enabled=True, sample_rate=0.0, exporter=InMemorySpanExporter())
+    tracer = provider.get_tracer("tests")
+
+    with tracer.start_as_current_span("request", parent=parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")):
+        pass
+    with tracer.start_as_current_span("local root"):
+        pass
+
+    assert [span.name for span in provider.exporter.get_finished_spans()] == ["request"]
+
+
+def test_unsampled_remote_parent_is_not_recorded(provider):
+    tracer = provider.get_tracer("tests")
+    parent = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")
+
+    with tracer.start_as_current_span("request", parent=parent) as root:
+        with tracer.start_as_current_span("child") as child:
+            pass
+
+    assert not root.is_recording()
+    assert child is root
+    # The decision is carried on, not replaced by a new trace
+    assert format_traceparent(root.get_span_context()) == f"00-{TRACE_ID}-{PARENT_ID}-00"
+    assert provider.exporter.get_finished_spans() == []
+
+
+def test_exception_sets_error_status(provider):
+    tracer = provider.get_tracer("tests")
+
+    with pytest.raises(ValueError):
+        with tracer.start_as_current_span("work"):
+            raise ValueError("bad input")
+
+    (span,) = provider.exporter.get_finished_spans()
+    assert span.status is StatusCode.ERROR
+    assert span.status_description == "ValueError: bad input"
+    assert span.events[0]["name"] == "exception"
+    assert span.to_dict()["status"] == "ERROR"
+
+
+def test_ok_status_drops_description(provider):
+    with provider.get_tracer("tests").start_as_current_span("work") as span:
+        span.set_status(StatusCode.OK, "ignored")
+
+    assert span.status is StatusCode.OK
+    assert span.status_description is None
+
+
+def test_request_continues_incoming_trace(traced_app):
+    client, exporter = traced_app
+
+    response = client.get("/items/7", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    assert response.status_code == 200
+    assert response.headers["x-trace-id"] == TRACE_ID
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    request, handler, inner = spans["GET /items/{item_id}"], spans["handler /items/{item_id}"], spans["load item"]
+    assert {span.context.trace_id_hex for span in spans.values()} == {TRACE_ID}
+    assert request.parent_span_id == int(PARENT_ID, 16)
+    assert handler.parent_span_id == request.context.span_id
+    assert inner.parent_span_id == handler.context.span_id
+    assert request.attributes["http.route"] == "/items/{item_id}"
+    assert request.attributes["http.status_code"] == 200
+
+
+def test_request_without_traceparent_starts_a_trace(traced_app):
+    client, exporter = traced_app
+
+    response = client.get("/items/7")
+
+    (trace_id,) = {span.context.trace_id_hex for span in exporter.get_finished_spans()}
+    assert response.headers["x-trace-id"] == trace_id
+    request = next(span for span in exporter.get_finished_spans() if span.name.startswith("GET"))
+    assert request.parent_span_id is None
+
+
+def test_unsampled_request_records_nothing(traced_app):
+    client, exporter = traced_app
+
+    response = client.get("/items/7", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+
+    assert response.status_code == 200
+    assert "x-trace-id" not in response.headers
+    assert exporter.get_finished_spans() == []
+
+
+def test_server_error_marks_request_span(traced_app):
+    client, exporter = traced_app
+
+    assert client.get("/fail").status_code == 500
+
+    statuses = {span.name: span.status for span in exporter.get_finished_spans()}
+    assert statuses["GET /fail"] is StatusCode.ERROR
+    assert statuses["handler /fail"] is StatusCode.ERROR
+
+
+def test_otlp_exporter_sends_spans(provider):
+    requests = []
+
+    def collector(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={})
+
+    exporter = OTLPSpanExporter(
+        "http://collector:4318/v1/traces",
+        service_name="auth-service-test",
+        client=httpx.Client(transport=httpx.MockTransport(collector))
+    )
+    provider.exporter = exporter
+    tracer = provider.get_tracer("tests")
+    with tracer.start_as_current_span("request", attributes={"http.method": "GET"}) as root:
+        with tracer.start_as_current_span("child", attributes={"db.rows": 1, "cached": True}):
+            pass
+    exporter.shutdown()
+
+    spans = [
+        span
+        for body in requests
+        for resource in body["resourceSpans"]
+        for scope in resource["scopeSpans"]
+        for span in scope["spans"]
+    ]
+    assert requests[0]["resourceSpans"][0]["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": "auth-service-test"}}
+    ]
+    assert requests[0]["resourceSpans"][0]["scopeSpans"][0]["scope"] == {"name": "tests"}
+    encoded = {span["name"]: span for span in spans}
+    assert encoded["request"]["kind"] == 2
+    assert encoded["request"]["parentSpanId"] == ""
+    assert encoded["child"]["kind"] == 1
+    assert encoded["child"]["traceId"] == root.context.trace_id_hex
+    assert encoded["child"]["parentSpanId"] == root.context.span_id_hex
+    assert encoded["child"]["attributes"] == [
+        {"key": "db.rows", "value": {"intValue": "1"}},
+        {"key": "cached", "value": {"boolValue": True}},
+    ]
+    assert encoded["child"]["status"] == {"code": 0}
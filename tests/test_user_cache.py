@@ -0,0 +1,254 @@
+"""
+Tests for the in-process user and negative email caches and their invalidation.
+"""
+
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from core.config import settings
+from crud.user_crud import UserCRUD
+from schemas.user_schema import CurrentUser, UserCreate
+from services import user_cache as user_cache_module
+from services.user_cache import (
+    NegativeEmailCache,
+    RedisInvalidationChannel,
+    UserCache,
+    negative_email_cache,
+    user_cache,
+)
+
+
+def make_user(user_id: int, full_name: str = "User") -> CurrentUser:
+    return CurrentUser(
+        id=user_id,
+        email=f"user{user_id}@example.com",
+        full_name=full_name,
+        is_active=True,
+        is_verified=True,
+        created_at=datetime.now(timezone.utc)
+    )
+
+
+class Clock:
+    """Stands in for time.monotonic in the cache module."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(user_cache_module, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def cache():
+    return UserCache(max_size=2, ttl_seconds=30)
+
+
+@pytest.fixture
+def fresh_user_cache():
+    user_cache.clear()
+    yield user_cache
+    user_cache.clear()
+
+
+def test_get_returns_cached_user(cache):
+    cache.set(make_user(1), cache.version)
+
+    assert cache.get(1).full_name == "User"
+    assert cache.get(2) is None
+
+
+def test_least_recently_used_is_evicted(cache):
+    cache.set(make_user(1), cache.version)
+    cache.set(make_user(2), cache.version)
+    # Reading 1 makes 2 the least recently used
+    cache.get(1)
+    cache.set(make_user(3), cache.version)
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.get(3) is not None
+    assert cache.evictions == 1
+
+
+def test_entry_expires_after_ttl(cache, clock):
+    cache.set(make_user(1), cache.version)
+
+    clock.now += 29.9
+    assert cache.get(1) is not None
+    clock.now += 0.2
+    assert cache.get(1) is None
+    assert cache.expirations == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_stale_fill_after_update_is_dropped(cache):
+    # A reader takes the version, then a write invalidates before it fills
+    version = cache.version
+    cache.invalidate(1)
+    cache.set(make_user(1, full_name="Before update"), version)
+
+    assert cache.get(1) is None
+    cache.set(make_user(1, full_name="After update"), cache.version)
+    assert cache.get(1).full_name == "After update"
+
+
+def test_clear_also_drops_in_flight_fills(cache):
+    version = cache.version
+    cache.clear()
+    cache.set(make_user(1), version)
+
+    assert cache.get(1) is None
+
+
+@pytest.mark.parametrize("ttl_seconds, max_size", [(0, 10), (30, 0)])
+def test_disabled_cache_stores_nothing(ttl_seconds, max_size):
+    cache = UserCache(max_size=max_size, ttl_seconds=ttl_seconds)
+    cache.set(make_user(1), cache.version)
+
+    assert cache.get(1) is None
+    assert cache.stats()["misses"] == 0
+
+
+def test_stats(cache):
+    cache.set(make_user(1), cache.version)
+    cache.get(1)
+    cache.get(1)
+    cache.get(2)
+    cache.invalidate(1)
+
+    assert cache.stats() == {
+        "size": 0,
+        "max_size": 2,
+        "hits": 2,
+        "misses": 1,
+        "hit_ratio": 2 / 3,
+        "evictions": 0,
+        "expirations": 0,
+        "invalidations": 1,
+    }
+
+
+def test_get_current_user_is_served_from_cache(test_db, fresh_user_cache):
+    crud = UserCRUD(test_db)
+    user = crud.create_google_user(google_id="g-1", email="cached@example.com", full_name="Cached")
+
+    assert crud.get_current_user(user.id).full_name == "Cached"
+    assert fresh_user_cache.get(user.id) is not None
+
+
+def test_update_invalidates_cached_user(test_db, fresh_user_cache):
+    crud = UserCRUD(test_db)
+    user = crud.create_google_user(google_id="g-1", email="cached@example.com", full_name="Before")
+    crud.get_current_user(user.id)
+
+    crud.update(user.id, {"full_name": "After", "is_active": False})
+
+    assert fresh_user_cache.get(user.id) is None
+    current = crud.get_current_user(user.id)
+    assert current.full_name == "After"
+    assert current.is_active is False
+
+
+def test_delete_invalidates_cached_user(test_db, fresh_user_cache):
+    crud = UserCRUD(test_db)
+    user = crud.create_google_user(google_id="g-1", email="cached@example.com", full_name="Deleted")
+    crud.get_current_user(user.id)
+
+    assert crud.delete(user.id) is True
+
+    assert fresh_user_cache.get(user.id) is None
+    assert crud.get_current_user(user.id) is None
+
+
+@pytest.fixture
+def fresh_negative_cache():
+    negative_email_cache.clear()
+    yield negative_email_cache
+    negative_email_cache.clear()
+
+
+def test_create_drops_negative_entry(test_db, fresh_negative_cache):
+    crud = UserCRUD(test_db)
+    assert crud.get_by_email("new@example.com") is None
+    assert fresh_negative_cache.is_known_absent("new@example.com")
+
+    crud.create(UserCreate(email="New@Example.com", password="Passw0rd!", full_name="New"))
+
+    assert not fresh_negative_cache.is_known_absent("new@example.com")
+    assert crud.get_by_email("new@example.com") is not None
+
+
+def test_create_google_user_drops_negative_entry(test_db, fresh_negative_cache):
+    crud = UserCRUD(test_db)
+    assert crud.get_by_email("google@example.com") is None
+
+    crud.create_google_user(google_id="g-1", email="google@example.com", full_name="Google")
+
+    assert not fresh_negative_cache.is_known_absent("google@example.com")
+    assert crud.get_by_email("google@example.com") is not None
+
+
+def test_absence_read_before_create_is_not_cached(fresh_negative_cache):
+    version = fresh_negative_cache.version
+    fresh_negative_cache.discard("raced@example.com")
+    fresh_negative_cache.add("raced@example.com", version)
+
+    assert not fresh_negative_cache.is_known_absent("raced@example.com")
+
+
+def test_pubsub_message_invalidates_both_caches(fake_redis, fresh_user_cache, fresh_negative_cache):
+    # Two workers on one Redis: B listens, A publishes its writes
+    worker_a = RedisInvalidationChannel(client=fake_redis)
+    worker_b = RedisInvalidationChannel(client=fake_redis)
+    worker_b.start(user_cache_module._apply_invalidation)
+    try:
+        fresh_user_cache.set(make_user(5), fresh_user_cache.version)
+        fresh_negative_cache.add("joined@example.com", fresh_negative_cache.version)
+
+        worker_a.publish("user:5")
+        worker_a.publish("email:joined@example.com")
+
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and (
+            fresh_user_cache.stats()["size"] or fresh_negative_cache.stats()["size"]
+        ):
+            time.sleep(0.01)
+    finally:
+        worker_b.stop()
+
+    assert fresh_user_cache.get(5) is None
+    assert not fresh_negative_cache.is_known_absent("joined@example.com")
+
+
+def test_invalidation_is_broadcast(fake_redis):
+    channel = RedisInvalidationChannel(client=fake_redis)
+    listener = fake_redis.pubsub()
+    listener.subscribe("auth_service:user_cache:invalidate")
+    cache = UserCache(max_size=10, ttl_seconds=30, channel=channel)
+    negative = NegativeEmailCache(max_size=10, ttl_seconds=60, channel=channel)
+
+    cache.invalidate(7)
+    negative.discard("joined@example.com")
+    listener.close()
+
+    assert [message["data"] for message in listener.listen()] == [b"user:7", b"email:joined@example.com"]
+
+
+@pytest.mark.parametrize("workers, channel, expected_ttl", [(1, False, 60), (4, False, 0), (4, True, 60)])
+def test_negative_cache_needs_a_channel_with_several_workers(monkeypatch, fake_redis, workers, channel, expected_ttl):
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", workers)
+    monkeypatch.setattr(settings, "NEGATIVE_EMAIL_CACHE_TTL_SECONDS", 60)
+
+    channel = RedisInvalidationChannel(client=fake_redis) if channel else None
+    assert user_cache_module._negative_email_cache_ttl(channel) == expected_ttl